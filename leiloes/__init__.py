@@ -0,0 +1 @@
+"""Rotinas de busca, sincronização e consulta dos leilões judiciais do TJDFT."""
@@ -0,0 +1,268 @@
+"""Linha de comando: python -m leiloes sync [--status STATUS] [--todas] [--intervalo MINUTOS]."""
+import argparse
+import json
+import os
+import sys
+import time
+
+# Códigos de saída, para que o cron/agendador saiba o que aconteceu
+EXIT_OK = 0
+EXIT_FALHA = 1
+EXIT_EM_ANDAMENTO = 2
+
+
+def executar_sync(status="", enviar_email=True, arquivo_metricas=None, forcar=False):
+    """Executa uma sincronização completa e devolve o código de saída."""
+    from leiloes.notificacao import aguardar_envios, notificar
+    from leiloes.storage import get_storage
+    from leiloes.sync import SyncEmAndamento, SyncLock, sincronizar
+
+    try:
+        storage = get_storage()
+        # Sem a página do Streamlit, é aqui que os índices dos lotes são criados
+        storage.ensure_indexes()
+        with SyncLock(storage):
+            resultado = sincronizar(status, storage=storage, forcar=forcar)
+            if enviar_email:
+                notificar(
+                    resultado.new_data, resultado.changes, resultado.eventos,
+                    resultado.total_novos, resultado.total_alterados
+                )
+    except SyncEmAndamento as e:
+        print(e)
+        return EXIT_EM_ANDAMENTO
+    except Exception as e:
+        print(f"Erro na sincronização: {e}", file=sys.stderr)
+        return EXIT_FALHA
+
+    print(resultado.resumo())
+
+    # Os e-mails saem em segundo plano; espera a entrega antes de encerrar
+    aguardar_envios()
+
+    if arquivo_metricas:
+        salvar_metricas(arquivo_metricas)
+    return EXIT_OK if resultado.ok else EXIT_FALHA
+
+
+def salvar_metricas(caminho):
+    """Grava as métricas no formato do Prometheus (para o textfile collector do node_exporter)."""
+    from leiloes.metricas import metricas
+
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(metricas.exportar_prometheus())
+    os.replace(temporario, caminho)
+
+
+def comando_sync(args):
+    if not args.intervalo:
+        return executar_sync(args.status, not args.sem_email, args.metricas, args.todas)
+
+    # Agendador simples: uma execução a cada `intervalo` minutos, contados do início
+    codigo = EXIT_OK
+    try:
+        while True:
+            inicio = time.monotonic()
+            codigo = executar_sync(args.status, not args.sem_email, args.metricas, args.todas)
+            espera = args.intervalo * 60 - (time.monotonic() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+    except KeyboardInterrupt:
+        return codigo
+
+
+def comando_importar_json(args):
+    """Importa o antigo arquivo leiloes_data.json para o armazenamento configurado."""
+    from leiloes.agregados import recalcular_agregados
+    from leiloes.historico import migrar_historico
+    from leiloes.storage import get_storage
+
+    with open(args.arquivo, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    lotes = dados.get("lotes", []) if isinstance(dados, dict) else dados
+    if isinstance(lotes, dict):  # Formato antigo: {"lotes": {"lotes": [...]}}
+        lotes = lotes.get("lotes", [])
+
+    storage = get_storage()
+    totais = storage.save(lotes)
+    print(f"{len(lotes)} lotes importados ({totais['falhas']} falhas).")
+
+    # O arquivo antigo traz o histórico embutido em cada lote
+    migrados, eventos = migrar_historico(storage)
+    print(f"Histórico de {migrados} lotes movido para o change-log ({eventos} alterações).")
+
+    recalcular_agregados(storage)
+    return EXIT_OK if not totais["falhas"] else EXIT_FALHA
+
+
+def comando_migrar_historico(args):
+    """Move o historico_alteracoes embutido nos lotes para o change-log."""
+    from leiloes.historico import migrar_historico
+
+    migrados, eventos = migrar_historico()
+    print(f"Histórico de {migrados} lotes movido para o change-log ({eventos} alterações).")
+    return EXIT_OK
+
+
+def comando_recalcular_agregados(args):
+    """Refaz os totais por status e por mês a partir de todos os lotes."""
+    from leiloes.agregados import recalcular_agregados
+
+    agregados = recalcular_agregados()
+    print(f"Agregados recalculados: {agregados['total']} lotes em {len(agregados['por_status'])} status.")
+    return EXIT_OK
+
+
+def comando_assinaturas(args):
+    """Lista, adiciona ou remove buscas salvas (alertas por e-mail)."""
+    from leiloes.assinaturas import listar_assinaturas, nova_assinatura, remover_assinatura, salvar_assinatura
+
+    if args.acao == "adicionar":
+        try:
+            assinatura = nova_assinatura(
+                args.email, args.nome, args.status or (), args.de, args.ate, args.termo or (),
+                args.valor_min, args.valor_max,
+            )
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return EXIT_FALHA
+        salvar_assinatura(assinatura)
+        print(f"Assinatura {assinatura['id']} criada para {assinatura['email']}.")
+    elif args.acao == "remover":
+        if not remover_assinatura(args.id):
+            print(f"Assinatura {args.id} não encontrada.", file=sys.stderr)
+            return EXIT_FALHA
+        print(f"Assinatura {args.id} removida.")
+    else:
+        for assinatura in listar_assinaturas(somente_ativas=False):
+            print(json.dumps(assinatura, ensure_ascii=False))
+    return EXIT_OK
+
+
+def comando_exportar(args):
+    """Exporta os lotes filtrados em CSV ou Parquet, lendo e escrevendo em blocos."""
+    from datetime import date
+
+    from leiloes.consulta import SORT_OPTIONS
+    from leiloes.exportacao import PROJECAO_EXPORTACAO, exportar
+    from leiloes.storage import get_storage
+
+    if args.ordenar not in SORT_OPTIONS:
+        print(f"Ordenação inválida; use uma de: {', '.join(SORT_OPTIONS)}", file=sys.stderr)
+        return EXIT_FALHA
+    filtros = {
+        "status": args.status,
+        "data_inicio": date.fromisoformat(args.de) if args.de else None,
+        "data_fim": date.fromisoformat(args.ate) if args.ate else None,
+        "endereco": args.endereco,
+    }
+    storage = get_storage()
+    # Prepara a base para as consultas (índices e texto de busca dos lotes antigos)
+    storage.ensure_indexes()
+    lotes = storage.iter_filtrados(filtros, args.ordenar, PROJECAO_EXPORTACAO)
+
+    inicio = time.monotonic()
+    if args.saida == "-":
+        if args.formato != "csv":
+            print("A saída padrão só aceita CSV.", file=sys.stderr)
+            return EXIT_FALHA
+        exportar(lotes, args.formato, sys.stdout.buffer, args.por_bem)
+    else:
+        with open(args.saida, "wb") as destino:
+            exportar(lotes, args.formato, destino, args.por_bem)
+        print(f"Exportado para {args.saida} em {time.monotonic() - inicio:.1f}s.", file=sys.stderr)
+    return EXIT_OK
+
+
+def comando_bench(args):
+    """Executa o benchmark, salva os resultados e, se pedido, compara com uma execução anterior."""
+    from leiloes import bench
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    execucao = bench.executar(
+        tamanhos,
+        backend=args.backend,
+        taxa_alteracao=args.taxa_alteracao,
+        taxa_novos=args.taxa_novos,
+        seed=args.seed,
+        memoria=not args.sem_memoria,
+    )
+    print(f"Resultados salvos em {bench.salvar(execucao, args.saida)}")
+
+    if args.comparar:
+        print(bench.comparar(execucao, bench.carregar(args.comparar)))
+    return EXIT_OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m leiloes", description="Rotinas dos Leilões Judiciais DF.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    sync = subparsers.add_parser("sync", help="Busca novos leilões e alterações, grava e envia o e-mail.")
+    sync.add_argument("--status", default="", help="Sincroniza apenas os leilões com este status.")
+    sync.add_argument("--sem-email", action="store_true", help="Não envia o e-mail de alerta.")
+    sync.add_argument("--todas", action="store_true",
+                      help="Busca todas as partições, inclusive as que ainda estão dentro do intervalo.")
+    sync.add_argument("--intervalo", type=float, default=0,
+                      help="Repete a sincronização a cada N minutos (0 = executa uma vez).")
+    sync.add_argument("--metricas", help="Grava as métricas da execução neste arquivo, no formato do Prometheus.")
+    sync.set_defaults(func=comando_sync)
+
+    importar = subparsers.add_parser("importar-json", help="Importa um arquivo JSON salvo pela versão antiga.")
+    importar.add_argument("arquivo", help="Caminho do arquivo (ex.: leiloes_data.json).")
+    importar.set_defaults(func=comando_importar_json)
+
+    migrar = subparsers.add_parser("migrar-historico",
+                                   help="Move o histórico embutido nos lotes para o change-log de alterações.")
+    migrar.set_defaults(func=comando_migrar_historico)
+
+    agregados = subparsers.add_parser("recalcular-agregados",
+                                      help="Refaz os totais por status e por mês a partir de todos os lotes.")
+    agregados.set_defaults(func=comando_recalcular_agregados)
+
+    assinaturas = subparsers.add_parser("assinaturas", help="Gerencia as buscas salvas que recebem alertas por e-mail.")
+    acoes = assinaturas.add_subparsers(dest="acao", required=True)
+    acoes.add_parser("listar", help="Mostra todas as assinaturas, uma por linha em JSON.")
+    adicionar = acoes.add_parser("adicionar", help="Cria uma busca salva.")
+    adicionar.add_argument("--email", required=True)
+    adicionar.add_argument("--nome", default="")
+    adicionar.add_argument("--status", action="append", help="Status aceito (pode repetir).")
+    adicionar.add_argument("--de", help="Data mínima do 1º leilão (AAAA-MM-DD).")
+    adicionar.add_argument("--ate", help="Data máxima do 1º leilão (AAAA-MM-DD).")
+    adicionar.add_argument("--termo", action="append", help="Termo buscado no endereço dos bens (pode repetir).")
+    adicionar.add_argument("--valor-min", type=float)
+    adicionar.add_argument("--valor-max", type=float)
+    remover = acoes.add_parser("remover", help="Apaga uma busca salva.")
+    remover.add_argument("id")
+    assinaturas.set_defaults(func=comando_assinaturas)
+
+    exportar = subparsers.add_parser("exportar", help="Exporta os lotes filtrados em CSV ou Parquet.")
+    exportar.add_argument("--formato", choices=["csv", "parquet"], default="csv")
+    exportar.add_argument("--saida", default="-", help="Arquivo de saída ('-' = saída padrão, só CSV).")
+    exportar.add_argument("--por-bem", action="store_true", help="Uma linha por bem em vez de uma por lote.")
+    exportar.add_argument("--status", default="")
+    exportar.add_argument("--de", help="Data mínima do 1º leilão (AAAA-MM-DD).")
+    exportar.add_argument("--ate", help="Data máxima do 1º leilão (AAAA-MM-DD).")
+    exportar.add_argument("--endereco", default="", help="Termo buscado no endereço dos bens.")
+    exportar.add_argument("--ordenar", default="Data 1º Leilão, Crescente", help="Mesma ordenação do menu lateral.")
+    exportar.set_defaults(func=comando_exportar)
+
+    bench = subparsers.add_parser("bench", help="Mede sincronização, diff, consultas e e-mail com dados sintéticos.")
+    bench.add_argument("--tamanhos", default="1000,10000", help="Quantidades de lotes, separadas por vírgula.")
+    bench.add_argument("--backend", choices=["auto", "mongomock", "sqlite"], default="auto",
+                       help="Armazenamento em processo (auto = mongomock se instalado, senão SQLite).")
+    bench.add_argument("--taxa-alteracao", type=float, default=0.05, help="Fração de lotes alterados entre snapshots.")
+    bench.add_argument("--taxa-novos", type=float, default=0.01, help="Fração de lotes novos no segundo snapshot.")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (tempos mais precisos).")
+    bench.add_argument("--saida", default="bench_resultados", help="Diretório dos resultados em JSON.")
+    bench.add_argument("--comparar", help="Arquivo de uma execução anterior para comparar.")
+    bench.set_defaults(func=comando_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
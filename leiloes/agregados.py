@@ -0,0 +1,108 @@
+"""Totais por status e por mês do 1º leilão, mantidos por deltas a cada sincronização.
+
+O documento de agregados fica no armazenamento, ao lado dos dados gerais:
+
+    {"total": 10, "valor_total": 1500.0,
+     "por_status": {"AGENDADO": {"n": 7, "valor": 1000.0}, ...},
+     "por_mes": {"2024-05": 3, ...}}
+
+A sincronização acumula, para cada lote novo ou alterado, a diferença entre
+a versão nova e a anterior e aplica tudo de uma vez ao final (um $inc no
+MongoDB), sem percorrer a base. Os lotes marcados como ausentes da API não
+entram nos totais.
+"""
+from leiloes.diff import AUSENTE_FIELD
+from leiloes.storage import get_storage
+
+SEM_STATUS = "SEM_STATUS"
+SEM_DATA = "sem_data"
+
+# Campos lidos quando os agregados são recalculados do zero
+PROJECAO_AGREGADOS = {"_id": 0, "status": 1, "primeiraHasta": 1, "valorTotalBens": 1, AUSENTE_FIELD: 1}
+
+
+def _status(lote):
+    return lote.get("status") or SEM_STATUS
+
+
+def _mes(lote):
+    hasta = lote.get("primeiraHasta")
+    return hasta[:7] if hasta else SEM_DATA
+
+
+def _valor(lote):
+    valor = lote.get("valorTotalBens")
+    return float(valor) if isinstance(valor, (int, float)) else 0.0
+
+
+class DeltaAgregados:
+    """Incrementos acumulados numa sincronização, por caminho ("por_status.AGENDADO.n")."""
+
+    def __init__(self):
+        self.incrementos = {}
+
+    def _somar(self, caminho, valor):
+        self.incrementos[caminho] = self.incrementos.get(caminho, 0) + valor
+
+    def adicionar(self, lote, sinal=1):
+        status, valor = _status(lote), _valor(lote)
+        self._somar("total", sinal)
+        self._somar("valor_total", sinal * valor)
+        self._somar(f"por_status.{status}.n", sinal)
+        self._somar(f"por_status.{status}.valor", sinal * valor)
+        self._somar(f"por_mes.{_mes(lote)}", sinal)
+
+    def remover(self, lote):
+        self.adicionar(lote, -1)
+
+    def alterar(self, antigo, novo):
+        self.remover(antigo)
+        self.adicionar(novo)
+
+    def compactar(self):
+        """Incrementos sem os caminhos que se anularam."""
+        return {caminho: valor for caminho, valor in self.incrementos.items() if valor}
+
+
+def aplicar_incrementos(doc, incrementos):
+    """Aplica incrementos com caminhos separados por ponto a um documento (como o $inc)."""
+    for caminho, valor in incrementos.items():
+        partes = caminho.split(".")
+        destino = doc
+        for parte in partes[:-1]:
+            destino = destino.setdefault(parte, {})
+        destino[partes[-1]] = destino.get(partes[-1], 0) + valor
+    return doc
+
+
+def calcular_agregados(lotes):
+    delta = DeltaAgregados()
+    for lote in lotes:
+        if not lote.get(AUSENTE_FIELD):
+            delta.adicionar(lote)
+    return aplicar_incrementos({"total": 0, "valor_total": 0.0, "por_status": {}, "por_mes": {}}, delta.incrementos)
+
+
+def recalcular_agregados(storage=None):
+    """Refaz os agregados percorrendo todos os lotes (carga inicial ou após falhas de gravação)."""
+    storage = storage or get_storage()
+    agregados = calcular_agregados(storage.iter_lotes(PROJECAO_AGREGADOS))
+    storage.salvar_agregados(agregados)
+    return agregados
+
+
+def carregar_agregados(storage=None):
+    """Agregados salvos; na primeira vez são calculados a partir dos lotes."""
+    storage = storage or get_storage()
+    agregados = storage.carregar_agregados()
+    if agregados is None:
+        agregados = recalcular_agregados(storage)
+    return agregados
+
+
+def contagem_por_status(agregados):
+    return {status: dados["n"] for status, dados in agregados.get("por_status", {}).items() if dados.get("n")}
+
+
+def contagem_por_mes(agregados):
+    return {mes: n for mes, n in sorted(agregados.get("por_mes", {}).items()) if n}
@@ -0,0 +1,289 @@
+"""Buscas salvas (assinaturas) e o casamento dos lotes novos e alterados com elas.
+
+Uma assinatura guarda os mesmos critérios do menu lateral:
+
+    {"id": "3f2a...", "email": "ana@exemplo.com", "nome": "Casas no Guará",
+     "status": ["AGENDADO"], "data_inicio": "2024-05-01", "data_fim": None,
+     "termos": ["guara"], "valor_min": None, "valor_max": 500000.0, "ativa": True}
+
+Critérios vazios aceitam qualquer lote. Os termos são buscados nas
+descrições dos bens sem diferenciar acentos, e todos precisam aparecer.
+"""
+import uuid
+from collections import defaultdict
+from datetime import date
+
+from leiloes.busca import TAMANHO_NGRAMA, ngramas, normalizar, texto_do_lote
+from leiloes.config import agora_formatado
+from leiloes.storage import get_storage
+
+INFINITO = float("inf")
+
+# Acima de 1/LIMIAR_ARVORE das assinaturas como candidatas, datas e valores são
+# filtrados pelas árvores de intervalos em vez de conferidos um a um
+LIMIAR_ARVORE = 4
+
+
+def _data_iso(valor):
+    if not valor:
+        return None
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return date.fromisoformat(str(valor)[:10]).isoformat()
+
+
+def _numero(valor):
+    return float(valor) if valor not in (None, "") else None
+
+
+def nova_assinatura(email, nome="", status=(), data_inicio=None, data_fim=None, termos=(), valor_min=None,
+                    valor_max=None):
+    """Valida os critérios e monta o documento de uma assinatura."""
+    email = (email or "").strip()
+    if "@" not in email:
+        raise ValueError(f"E-mail inválido: {email!r}")
+    if isinstance(status, str):
+        status = [status]
+    if isinstance(termos, str):
+        termos = [termos]
+
+    assinatura = {
+        "id": uuid.uuid4().hex,
+        "email": email,
+        "nome": (nome or "").strip() or "Busca salva",
+        "status": sorted({s for s in status if s}),
+        "data_inicio": _data_iso(data_inicio),
+        "data_fim": _data_iso(data_fim),
+        "termos": [termo for termo in dict.fromkeys(normalizar(t).strip() for t in termos) if termo],
+        "valor_min": _numero(valor_min),
+        "valor_max": _numero(valor_max),
+        "ativa": True,
+        "criada_em": agora_formatado(),
+    }
+    if assinatura["data_inicio"] and assinatura["data_fim"] and assinatura["data_inicio"] > assinatura["data_fim"]:
+        raise ValueError("A data de início é posterior à data de fim.")
+    if assinatura["valor_min"] is not None and assinatura["valor_max"] is not None \
+            and assinatura["valor_min"] > assinatura["valor_max"]:
+        raise ValueError("O valor mínimo é maior que o valor máximo.")
+    return assinatura
+
+
+class ArvoreIntervalos:
+    """Árvore de intervalos centrada e estática.
+
+    `contendo(x)` devolve as chaves dos intervalos fechados [início, fim]
+    que contêm o ponto, em O(log n + k), sem testar todos os intervalos.
+    """
+
+    def __init__(self, intervalos):
+        self._raiz = self._construir(list(intervalos))
+
+    def _construir(self, intervalos):
+        if not intervalos:
+            return None
+        pontos = sorted(p for inicio, fim, _ in intervalos for p in (inicio, fim))
+        centro = pontos[len(pontos) // 2]
+
+        esquerda, direita, no_centro = [], [], []
+        for intervalo in intervalos:
+            if intervalo[1] < centro:
+                esquerda.append(intervalo)
+            elif intervalo[0] > centro:
+                direita.append(intervalo)
+            else:
+                no_centro.append(intervalo)
+
+        return (
+            centro,
+            sorted(no_centro, key=lambda i: i[0]),                # por início, crescente
+            sorted(no_centro, key=lambda i: i[1], reverse=True),  # por fim, decrescente
+            self._construir(esquerda),
+            self._construir(direita),
+        )
+
+    def contendo(self, ponto):
+        chaves = []
+        no = self._raiz
+        while no is not None:
+            centro, por_inicio, por_fim, esquerda, direita = no
+            if ponto < centro:
+                for inicio, _, chave in por_inicio:
+                    if inicio > ponto:
+                        break
+                    chaves.append(chave)
+                no = esquerda
+            elif ponto > centro:
+                for _, fim, chave in por_fim:
+                    if fim < ponto:
+                        break
+                    chaves.append(chave)
+                no = direita
+            else:
+                chaves.extend(chave for _, _, chave in por_inicio)
+                break
+        return chaves
+
+
+def _intersectar(candidatos, partes):
+    """candidatos ∩ (união das partes), sem montar a união (cada & percorre o menor set)."""
+    resultado = set()
+    for parte in partes:
+        resultado |= candidatos & parte
+    return resultado
+
+
+def _data_do_lote(lote):
+    hasta = lote.get("primeiraHasta")
+    return date.fromisoformat(hasta[:10]).toordinal() if hasta else None
+
+
+def _valor_do_lote(lote):
+    valor = lote.get("valorTotalBens")
+    return float(valor) if isinstance(valor, (int, float)) else None
+
+
+class IndiceAssinaturas:
+    """Índice das assinaturas ativas para casar lotes sem percorrer todas elas.
+
+    Cada critério gera candidatos por um índice próprio: status num índice
+    invertido, termos pelo trigrama mais raro de cada assinatura, e datas e
+    valores em árvores de intervalos. As assinaturas sem o critério ficam
+    num conjunto à parte, que aceita qualquer lote. Para cada lote, os
+    candidatos de status e termos são intersectados e depois filtrados por
+    data e valor, sem visitar as assinaturas que já ficaram de fora.
+    """
+
+    def __init__(self, assinaturas):
+        self.assinaturas = {a["id"]: a for a in assinaturas if a.get("ativa", True)}
+        self.termos = {}
+        self.periodo_de = {}
+        self.faixa_de = {}
+
+        self.por_status = defaultdict(set)
+        self.sem_status = set()
+        self.por_trigrama = defaultdict(set)
+        self.termos_curtos = set()
+        self.sem_termos = set()
+        self.sem_periodo = set()
+        self.sem_faixa_valor = set()
+        periodos, faixas = [], []
+
+        for assinatura_id, assinatura in self.assinaturas.items():
+            for status in assinatura.get("status") or ():
+                self.por_status[status].add(assinatura_id)
+            if not assinatura.get("status"):
+                self.sem_status.add(assinatura_id)
+
+            self.termos[assinatura_id] = tuple(assinatura.get("termos") or ())
+            self._indexar_termos(assinatura_id, self.termos[assinatura_id])
+
+            if assinatura.get("data_inicio") or assinatura.get("data_fim"):
+                self.periodo_de[assinatura_id] = (
+                    date.fromisoformat(assinatura["data_inicio"]).toordinal() if assinatura.get("data_inicio") else -INFINITO,
+                    date.fromisoformat(assinatura["data_fim"]).toordinal() if assinatura.get("data_fim") else INFINITO,
+                )
+                periodos.append((*self.periodo_de[assinatura_id], assinatura_id))
+            else:
+                self.sem_periodo.add(assinatura_id)
+
+            if assinatura.get("valor_min") is not None or assinatura.get("valor_max") is not None:
+                self.faixa_de[assinatura_id] = (
+                    assinatura["valor_min"] if assinatura.get("valor_min") is not None else -INFINITO,
+                    assinatura["valor_max"] if assinatura.get("valor_max") is not None else INFINITO,
+                )
+                faixas.append((*self.faixa_de[assinatura_id], assinatura_id))
+            else:
+                self.sem_faixa_valor.add(assinatura_id)
+
+        self.periodos = ArvoreIntervalos(periodos)
+        self.faixas_valor = ArvoreIntervalos(faixas)
+
+    def __len__(self):
+        return len(self.assinaturas)
+
+    def _indexar_termos(self, assinatura_id, termos):
+        if not termos:
+            self.sem_termos.add(assinatura_id)
+            return
+        # Basta um trigrama para gerar o candidato: usa o que tem menos assinaturas
+        # até agora, entre todos os termos (que precisam aparecer todos)
+        gramas = set().union(*(ngramas(termo) for termo in termos))
+        if not gramas:
+            self.termos_curtos.add(assinatura_id)
+            return
+        ancora = min(sorted(gramas), key=lambda grama: len(self.por_trigrama.get(grama, ())))
+        self.por_trigrama[ancora].add(assinatura_id)
+
+    def _candidatos_termos(self, texto):
+        candidatos = set()
+        for grama in ngramas(texto, TAMANHO_NGRAMA):
+            assinaturas = self.por_trigrama.get(grama)
+            if assinaturas:
+                candidatos |= assinaturas
+        return candidatos
+
+    def casar(self, lote):
+        """Ids das assinaturas que aceitam o lote."""
+        if not self.assinaturas:
+            return set()
+        texto = texto_do_lote(lote)
+
+        # Status e termos são baratos de montar: o menor dos dois é o ponto de partida
+        fontes = sorted(
+            [
+                (self.por_status.get(lote.get("status"), set()), self.sem_status),
+                (self._candidatos_termos(texto) if self.por_trigrama else set(), self.sem_termos, self.termos_curtos),
+            ],
+            key=lambda partes: sum(len(parte) for parte in partes),
+        )
+        candidatos = set().union(*fontes[0])
+        candidatos = _intersectar(candidatos, fontes[1])
+
+        # Datas e valores: com muitos candidatos a árvore de intervalos filtra de
+        # uma vez; com poucos, é mais barato conferir os limites de cada um
+        for ponto, arvore, limites, sem_criterio in (
+            (_data_do_lote(lote), self.periodos, self.periodo_de, self.sem_periodo),
+            (_valor_do_lote(lote), self.faixas_valor, self.faixa_de, self.sem_faixa_valor),
+        ):
+            if not candidatos:
+                return candidatos
+            if len(candidatos) * LIMIAR_ARVORE > len(self.assinaturas):
+                contendo = set(arvore.contendo(ponto)) if ponto is not None else set()
+                candidatos = _intersectar(candidatos, (contendo, sem_criterio))
+            else:
+                candidatos = {
+                    assinatura_id for assinatura_id in candidatos
+                    if assinatura_id in sem_criterio
+                    or (ponto is not None and limites[assinatura_id][0] <= ponto <= limites[assinatura_id][1])
+                }
+
+        # O trigrama âncora só indica o candidato: confere os termos inteiros
+        return {
+            assinatura_id for assinatura_id in candidatos
+            if all(termo in texto for termo in self.termos[assinatura_id])
+        }
+
+    def distribuir(self, new_data, changes):
+        """Agrupa os lotes por e-mail: {email: (novos, alterados)} só com o que cada um assina."""
+        por_email = defaultdict(lambda: ([], []))
+        for posicao, lotes in enumerate((new_data, changes)):
+            for lote in lotes:
+                for email in {self.assinaturas[a]["email"] for a in self.casar(lote)}:
+                    por_email[email][posicao].append(lote)
+        return dict(por_email)
+
+
+def listar_assinaturas(storage=None, somente_ativas=True):
+    storage = storage or get_storage()
+    return storage.listar_assinaturas(somente_ativas)
+
+
+def salvar_assinatura(assinatura, storage=None):
+    storage = storage or get_storage()
+    storage.salvar_assinatura(assinatura)
+    return assinatura
+
+
+def remover_assinatura(assinatura_id, storage=None):
+    storage = storage or get_storage()
+    return storage.remover_assinatura(assinatura_id)
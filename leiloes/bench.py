@@ -0,0 +1,396 @@
+"""Benchmark reprodutível da sincronização, do diff, da consulta e do e-mail.
+
+Gera lotes sintéticos com o formato da API, serve-os por um endpoint HTTP
+local paginado e grava num armazenamento em processo (mongomock, quando
+instalado, ou um SQLite temporário). Os tempos e picos de memória de cada
+fase são salvos em JSON para comparar execuções.
+"""
+import contextlib
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from leiloes.config import DEFAULT_PARAMS, agora_formatado
+from leiloes.consulta import PROJECAO_LISTAGEM, SORT_OPTIONS
+from leiloes.dataset import LotesDataset, RegistroLote
+from leiloes.diff import IGNORE_FIELDS, add_fingerprints, check_for_changes
+from leiloes.fetch import PageFetcher
+from leiloes.notificacao import montar_mensagens
+from leiloes.sync import sincronizar
+
+TAMANHOS_PADRAO = (1000, 10000)
+
+STATUS = [
+    ("AGENDADO", 40), ("ENCERRADO", 25), ("HASTA2_REPORTADA", 8), ("HASTA3_REPORTADA", 4),
+    ("SUSPENSO", 8), ("CANCELADO", 7), ("HASTA1_NAO_REALIZADA", 5), ("ANALISAR_SUSPENSAO_CANCELAMENTO", 3),
+]
+REGIOES = [
+    "Águas Claras", "Asa Norte", "Asa Sul", "Ceilândia", "Gama", "Guará", "Lago Sul", "Samambaia",
+    "Sobradinho", "Taguatinga", "Vicente Pires", "Sudoeste", "Noroeste", "Riacho Fundo", "Planaltina",
+]
+TIPOS_BEM = ["Apartamento", "Casa", "Lote", "Sala comercial", "Loja", "Vaga de garagem", "Terreno"]
+VARAS = [f"{n}ª Vara Cível de {cidade}" for n in range(1, 8) for cidade in ("Brasília", "Taguatinga", "Ceilândia")]
+LEILOEIROS = ["www.leiloesjudiciaisdf.com.br", "www.dfleiloes.com.br", "www.leilaobrasilia.com.br", "www.hastapublica.com.br"]
+NOMES = ["Banco do Brasil S.A.", "Caixa Econômica Federal", "Condomínio do Edifício Central", "Fazenda Pública do DF",
+         "João da Silva", "Maria Souza", "Construtora Planalto Ltda.", "José Pereira"]
+
+_DATA_BASE = datetime(2022, 1, 1)
+
+
+# -------------------- Gerador de dados sintéticos --------------------
+def _iso(data):
+    return data.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _bem(rng, bem_id):
+    regiao = rng.choice(REGIOES)
+    descricao = (
+        f"{rng.choice(TIPOS_BEM)} localizado na Quadra {rng.randint(1, 60)}, Conjunto {rng.choice('ABCDEFGH')}, "
+        f"Lote {rng.randint(1, 40)}, {regiao}/DF, com área privativa de {rng.randint(25, 600)} m², "
+        f"matrícula nº {rng.randint(10000, 999999)} do {rng.randint(1, 9)}º Ofício de Registro de Imóveis do DF."
+    )
+    return {"id": bem_id, "tipo": "IMOVEL", "descricao": descricao, "valor": round(rng.uniform(40e3, 3e6), 2)}
+
+
+def _historico(rng, criacao, quantidade):
+    historico = []
+    for i in range(quantidade):
+        data = criacao + timedelta(days=30 * (i + 1), hours=rng.randint(0, 23))
+        historico.append({
+            "dataAlteracao": data.isoformat() + "-03:00",
+            "alteracoes": {"status": {"old": "AGENDADO", "new": rng.choice(STATUS)[0]}},
+        })
+    return historico
+
+
+def gerar_lote(rng, lote_id, com_historico=True):
+    """Um lote com o formato devolvido pela API (e, opcionalmente, histórico embutido)."""
+    status = rng.choices([s for s, _ in STATUS], weights=[p for _, p in STATUS])[0]
+    criacao = _DATA_BASE + timedelta(days=rng.randint(0, 900), seconds=rng.randint(0, 86399))
+    primeira = criacao + timedelta(days=rng.randint(30, 240), hours=rng.choice([10, 13, 14, 15]))
+    bens = [_bem(rng, lote_id * 10 + i) for i in range(rng.choices([1, 2, 3, 4], weights=[70, 18, 8, 4])[0])]
+
+    lote = {
+        "id": lote_id,
+        "tipoDeLeilao": rng.choice(["ELETRONICO", "PRESENCIAL", "HIBRIDO"]),
+        "primeiraHasta": _iso(primeira),
+        "segundaHasta": _iso(primeira + timedelta(days=rng.choice([7, 14, 15]))) if rng.random() < 0.8 else None,
+        "status": status,
+        "valorTotalBens": round(sum(bem["valor"] for bem in bens), 2),
+        "processo": {
+            "numeroProcessoFormatado": (
+                f"{rng.randint(0, 9999999):07d}-{rng.randint(0, 99):02d}.{criacao.year}.8.07.{rng.randint(1, 20):04d}"
+            ),
+            "dataCriacao": _iso(criacao),
+            "poloAtivo": rng.choice(NOMES),
+            "poloPassivo": rng.choice(NOMES),
+            "orgaoJulgador": {"id": rng.randint(1, 200), "nome": rng.choice(VARAS)},
+        },
+        "leiloeiro": {"id": rng.randint(1, 40), "nome": rng.choice(NOMES), "localRealizacao": rng.choice(LEILOEIROS)},
+        "bensALeiloar": bens,
+    }
+    if status in ("SUSPENSO", "CANCELADO"):
+        lote["justificativaCancelamentoSuspensao"] = "Acordo entre as partes noticiado nos autos."
+    if com_historico and rng.random() < 0.2:
+        lote["historico_alteracoes"] = _historico(rng, criacao, rng.randint(1, 3))
+    return lote
+
+
+def gerar_snapshot(tamanho, seed=0, com_historico=True):
+    rng = random.Random(seed)
+    return [gerar_lote(rng, lote_id, com_historico) for lote_id in range(1, tamanho + 1)]
+
+
+def _mutar(rng, lote):
+    lote = copy.deepcopy(lote)
+    tipo = rng.randrange(5)
+    if tipo == 0:
+        lote["status"] = rng.choice([s for s, _ in STATUS if s != lote["status"]])
+    elif tipo == 1:
+        bem = rng.choice(lote["bensALeiloar"])
+        bem["valor"] = round(bem["valor"] * rng.uniform(0.5, 0.9), 2)
+        lote["valorTotalBens"] = round(sum(b["valor"] for b in lote["bensALeiloar"]), 2)
+    elif tipo == 2:
+        lote["segundaHasta"] = _iso(datetime.fromisoformat(lote["primeiraHasta"]) + timedelta(days=21))
+    elif tipo == 3:
+        lote["justificativaCancelamentoSuspensao"] = "Suspenso por decisão judicial."
+    else:
+        # Só a ordem dos bens muda: não deve gerar alteração
+        lote["bensALeiloar"].reverse()
+    return lote
+
+
+def mutar_snapshot(lotes, taxa_alteracao=0.05, taxa_novos=0.01, taxa_removidos=0.0, seed=1):
+    """Próximo snapshot: uma fração dos lotes alterada, removida e novos lotes no fim."""
+    rng = random.Random(seed)
+    proximo = []
+    for lote in lotes:
+        sorteio = rng.random()
+        if sorteio < taxa_removidos:
+            continue
+        proximo.append(_mutar(rng, lote) if sorteio < taxa_removidos + taxa_alteracao else lote)
+
+    proximo_id = max((lote["id"] for lote in lotes), default=0) + 1
+    for lote_id in range(proximo_id, proximo_id + int(len(lotes) * taxa_novos)):
+        proximo.append(gerar_lote(rng, lote_id, com_historico=False))
+    return proximo
+
+
+def _formato_api(lote):
+    return {chave: valor for chave, valor in lote.items() if chave != "historico_alteracoes"}
+
+
+# -------------------- Endpoint e armazenamento locais --------------------
+class ServidorFake:
+    """Endpoint HTTP local com a paginação da API (page, size, status)."""
+
+    def __init__(self, lotes=()):
+        self.lotes = [_formato_api(lote) for lote in lotes]
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                page = int(query.get("page", ["0"])[0])
+                size = int(query.get("size", [str(DEFAULT_PARAMS["size"])])[0])
+                status = query.get("status", [""])[0]
+                lotes = servidor.lotes if not status else [l for l in servidor.lotes if l["status"] == status]
+                corpo = json.dumps(lotes[page * size:(page + 1) * size], ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/leiloes"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def servir(self, lotes):
+        self.lotes = [_formato_api(lote) for lote in lotes]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+
+def criar_storage(backend, diretorio):
+    """Armazenamento em processo: mongomock (se instalado) ou SQLite em arquivo temporário."""
+    if backend in ("auto", "mongomock"):
+        try:
+            import mongomock
+        except ImportError:
+            if backend == "mongomock":
+                raise
+        else:
+            from leiloes.db import MongoStorage
+            return MongoStorage(mongomock.MongoClient()["leiloes_bench"])
+
+    from leiloes.sqlite_storage import SQLiteStorage
+    return SQLiteStorage(os.path.join(diretorio, "bench.db"))
+
+
+# -------------------- Medição --------------------
+def medir(funcao, memoria=True):
+    """Executa `funcao` com a saída descartada e devolve (resultado, métricas)."""
+    gc.collect()
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        resultado = funcao()
+    tempo = time.perf_counter() - inicio
+
+    metricas = {"tempo_s": round(tempo, 4)}
+    if memoria:
+        # O que continua alocado ao final é o que o resultado ocupa
+        retida, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        metricas["memoria_pico_mb"] = round(pico / 2 ** 20, 2)
+        metricas["memoria_retida_mb"] = round(retida / 2 ** 20, 2)
+    return resultado, metricas
+
+
+def _bytes_por_lote(metricas, quantidade):
+    if "memoria_retida_mb" in metricas and quantidade:
+        metricas["bytes_por_lote"] = round(metricas["memoria_retida_mb"] * 2 ** 20 / quantidade)
+
+
+CONSULTAS = [
+    {},
+    {"status": "AGENDADO"},
+    {"data_inicio": datetime(2023, 1, 1).date(), "data_fim": datetime(2023, 12, 31).date()},
+    {"endereco": "aguas claras"},
+]
+
+
+def _consultas_memoria(dataset):
+    total = 0
+    for filtros in CONSULTAS:
+        for selected_sort in SORT_OPTIONS:
+            with dataset.lock:
+                total += len(dataset.ordenar(dataset.filtrar(**filtros), selected_sort)[:20])
+    return total
+
+
+def _consultas_banco(storage):
+    total = 0
+    for consulta in CONSULTAS:
+        filtros = {"status": None, "data_inicio": None, "data_fim": None, "endereco": None, **consulta}
+        for selected_sort in SORT_OPTIONS:
+            storage.contar_lotes(filtros)
+            total += len(storage.buscar_pagina(filtros, selected_sort, 20, 1))
+    return total
+
+
+def executar_tamanho(tamanho, backend="auto", taxa_alteracao=0.05, taxa_novos=0.01, seed=0,
+                     memoria=True, rate_limit=0, workers=4):
+    """Executa todas as fases para um tamanho de base e devolve as métricas de cada uma."""
+    anterior = gerar_snapshot(tamanho, seed)
+    atual = mutar_snapshot(anterior, taxa_alteracao, taxa_novos, seed=seed + 1)
+    resultados = {}
+
+    with tempfile.TemporaryDirectory() as diretorio, ServidorFake(anterior) as servidor:
+        storage = criar_storage(backend, diretorio)
+        storage.ensure_indexes()
+        fetcher = PageFetcher(max_workers=workers, rate_limit=rate_limit, api_url=servidor.url)
+
+        def sync():
+            return sincronizar(storage=storage, fetcher=fetcher, forcar=True)
+
+        _, resultados["sync_inicial"] = medir(sync, memoria)
+
+        servidor.servir(atual)
+        sincronizacao, resultados["sync_incremental"] = medir(sync, memoria)
+        resultados["sync_incremental"]["alterados"] = sincronizacao.total_alterados
+        resultados["sync_incremental"]["novos"] = sincronizacao.total_novos
+
+        _, resultados["sync_sem_alteracoes"] = medir(sync, memoria)
+
+        existentes = add_fingerprints([dict(lote) for lote in anterior], IGNORE_FIELDS)
+        novos = [_formato_api(lote) for lote in atual]
+
+        def diff():
+            add_fingerprints(novos, IGNORE_FIELDS)
+            return check_for_changes(existentes, novos, IGNORE_FIELDS, [], eventos=[])
+
+        _, resultados["diff"] = medir(diff, memoria)
+
+        # Memória por lote dos documentos da listagem (como o conjunto os guardava)
+        # e dos registros compactos que os substituem, lidos do armazenamento
+        documentos, resultados["documentos_listagem"] = medir(
+            lambda: list(storage.iter_lotes(PROJECAO_LISTAGEM)), memoria
+        )
+        _bytes_por_lote(resultados["documentos_listagem"], len(documentos))
+        del documentos
+
+        registros, resultados["registros_compactos"] = medir(
+            lambda: [RegistroLote(lote) for lote in storage.iter_lotes(PROJECAO_LISTAGEM)], memoria
+        )
+        _bytes_por_lote(resultados["registros_compactos"], len(registros))
+        del registros
+
+        dataset, resultados["dataset_carga"] = medir(lambda: LotesDataset(storage.iter_lotes(PROJECAO_LISTAGEM)), memoria)
+        _bytes_por_lote(resultados["dataset_carga"], len(dataset))
+        _, resultados["filtro_ordenacao_memoria"] = medir(lambda: _consultas_memoria(dataset), memoria)
+        _, resultados["filtro_ordenacao_banco"] = medir(lambda: _consultas_banco(storage), memoria)
+
+        mensagens, resultados["email"] = medir(
+            lambda: montar_mensagens(sincronizacao.new_data, sincronizacao.changes, sincronizacao.eventos),
+            memoria
+        )
+        resultados["email"]["mensagens"] = len(mensagens)
+        resultados["backend"] = storage.nome
+
+    return resultados
+
+
+def executar(tamanhos=TAMANHOS_PADRAO, backend="auto", taxa_alteracao=0.05, taxa_novos=0.01, seed=0,
+             memoria=True, rate_limit=0, workers=4, progresso=print):
+    execucao = {
+        "data": agora_formatado(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "seed": seed,
+        "taxa_alteracao": taxa_alteracao,
+        "taxa_novos": taxa_novos,
+        "memoria": memoria,
+        "resultados": {},
+    }
+    for tamanho in tamanhos:
+        progresso(f"Executando benchmark com {tamanho} lotes...")
+        resultado = executar_tamanho(tamanho, backend, taxa_alteracao, taxa_novos, seed, memoria, rate_limit, workers)
+        execucao["backend"] = resultado.pop("backend")
+        execucao["resultados"][str(tamanho)] = resultado
+        progresso(formatar_tabela({str(tamanho): resultado}))
+    return execucao
+
+
+# -------------------- Relatórios --------------------
+def salvar(execucao, diretorio="bench_resultados"):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(execucao, f, ensure_ascii=False, indent=2)
+    return caminho
+
+
+def carregar(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def formatar_tabela(resultados):
+    linhas = [f"{'lotes':>9}  {'fase':<26} {'tempo (s)':>10} {'pico (MB)':>10} {'bytes/lote':>10}"]
+    for tamanho, fases in resultados.items():
+        for fase, metricas in fases.items():
+            pico = metricas.get("memoria_pico_mb")
+            linhas.append(
+                f"{tamanho:>9}  {fase:<26} {metricas['tempo_s']:>10.4f} {pico if pico is not None else '-':>10} "
+                f"{metricas.get('bytes_por_lote', '-'):>10}"
+            )
+    return "\n".join(linhas)
+
+
+def comparar(atual, anterior):
+    """Tabela com a variação de tempo e memória de cada fase em relação a uma execução anterior."""
+    linhas = []
+    if atual.get("backend") != anterior.get("backend"):
+        linhas.append(f"Atenção: backends diferentes ({anterior.get('backend')} -> {atual.get('backend')}).")
+    linhas.append(f"{'lotes':>9}  {'fase':<26} {'antes (s)':>10} {'agora (s)':>10} {'tempo':>8} {'memória':>8}")
+    for tamanho, fases in atual["resultados"].items():
+        fases_antes = anterior.get("resultados", {}).get(tamanho, {})
+        for fase, metricas in fases.items():
+            antes = fases_antes.get(fase)
+            if not antes:
+                continue
+            linhas.append(
+                f"{tamanho:>9}  {fase:<26} {antes['tempo_s']:>10.4f} {metricas['tempo_s']:>10.4f} "
+                f"{_variacao(antes.get('tempo_s'), metricas.get('tempo_s')):>8} "
+                f"{_variacao(antes.get('memoria_pico_mb'), metricas.get('memoria_pico_mb')):>8}"
+            )
+    return "\n".join(linhas)
+
+
+def _variacao(antes, agora):
+    if not antes or agora is None:
+        return "-"
+    return f"{(agora - antes) / antes:+.0%}"
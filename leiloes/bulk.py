@@ -0,0 +1,112 @@
+"""Escrita em lote no MongoDB com bulk_write não ordenado."""
+from collections import namedtuple
+
+from leiloes.config import BULK_BATCH_SIZE
+from leiloes.metricas import metricas
+
+BatchResult = namedtuple(
+    "BatchResult",
+    ["lote", "operacoes", "inseridos", "upserts", "modificados", "falhas", "erros"],
+)
+
+
+class BulkWriter:
+    """Agrupa inserts, upserts, $set e $unset em chamadas bulk_write(ordered=False).
+
+    Cada lote enviado gera um BatchResult com as contagens de inseridos,
+    modificados e falhas. Um erro em um lote é registrado e não interrompe os
+    demais, de modo que uma falha parcial não descarta o restante da sincronização.
+    """
+
+    def __init__(self, collection, batch_size=BULK_BATCH_SIZE, on_batch=None):
+        self.collection = collection
+        self.batch_size = max(int(batch_size), 1)
+        self.on_batch = on_batch
+        self.batches = []
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def add(self, operation):
+        self._pending.append(operation)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    # O pymongo só é importado por quem grava no MongoDB (o SQLite também usa este módulo)
+    def insert(self, document):
+        from pymongo import InsertOne
+        self.add(InsertOne(document))
+
+    def update(self, filtro, update_query, upsert=False):
+        from pymongo import UpdateOne
+        if update_query:  # Garante que não será feita uma operação vazia
+            self.add(UpdateOne(filtro, update_query, upsert=upsert))
+
+    def flush(self):
+        from pymongo.errors import BulkWriteError, PyMongoError
+
+        if not self._pending:
+            return None
+
+        operations, self._pending = self._pending, []
+        numero = len(self.batches) + 1
+        try:
+            with metricas.span("gravacao.lote"):
+                result = self.collection.bulk_write(operations, ordered=False)
+            batch = BatchResult(
+                numero, len(operations), result.inserted_count, result.upserted_count,
+                result.modified_count, 0, [],
+            )
+        except BulkWriteError as e:
+            details = e.details or {}
+            erros = details.get("writeErrors", [])
+            batch = BatchResult(
+                numero, len(operations), details.get("nInserted", 0), details.get("nUpserted", 0),
+                details.get("nModified", 0), len(erros), [erro.get("errmsg") for erro in erros],
+            )
+        except PyMongoError as e:
+            # Falha do lote inteiro (conexão, timeout): segue com os próximos
+            batch = BatchResult(numero, len(operations), 0, 0, 0, len(operations), [str(e)])
+
+        registrar_batch(batch)
+        self.batches.append(batch)
+        if self.on_batch:
+            self.on_batch(batch)
+        return batch
+
+    def totals(self):
+        """Soma as contagens de todos os lotes já enviados."""
+        return somar_batches(self.batches)
+
+
+def somar_batches(batches):
+    """Soma as contagens de uma lista de BatchResult."""
+    return {
+        "lotes": len(batches),
+        "operacoes": sum(b.operacoes for b in batches),
+        "inseridos": sum(b.inseridos for b in batches),
+        "upserts": sum(b.upserts for b in batches),
+        "modificados": sum(b.modificados for b in batches),
+        "falhas": sum(b.falhas for b in batches),
+    }
+
+
+def registrar_batch(batch):
+    metricas.contar("gravacoes", batch.operacoes)
+    if batch.falhas:
+        metricas.contar("falhas_gravacao", batch.falhas)
+
+
+def print_batch(batch):
+    """Relatório simples de cada lote enviado, para os logs da aplicação."""
+    print(
+        f"Lote {batch.lote}: {batch.operacoes} operações, {batch.inseridos} inseridos, "
+        f"{batch.upserts} upserts, {batch.modificados} modificados, {batch.falhas} falhas"
+    )
+    for erro in batch.erros[:5]:
+        print(f"  Erro: {erro}")
@@ -0,0 +1,171 @@
+"""Índice invertido de trigramas para a busca por endereço nas descrições dos bens."""
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+TAMANHO_NGRAMA = 3
+
+# Ids indexados fora dos arrays a partir dos quais eles são compactados
+# (ou 1/4 das entradas já compactadas, o que for maior)
+MIN_PENDENTES = 50000
+
+# Separa as descrições de bens diferentes; nunca aparece em um termo buscado,
+# então nenhum trigrama da busca atravessa dois bens
+SEPARADOR = "\x00"
+
+
+def normalizar(texto):
+    """Remove acentos e converte para minúsculas ("Águas Claras" -> "aguas claras")."""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def ngramas(texto, n=TAMANHO_NGRAMA):
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+def texto_do_lote(lote):
+    """Texto normalizado com as descrições de todos os bens do lote."""
+    return SEPARADOR.join(normalizar(bem.get("descricao")) for bem in lote.get("bensALeiloar") or [])
+
+
+def _cabe_no_array(lote_id):
+    return isinstance(lote_id, int) and not isinstance(lote_id, bool) and -2 ** 63 <= lote_id < 2 ** 63
+
+
+def _contem(ids, lote_id):
+    """Busca binária num array ordenado de ids."""
+    posicao = bisect_left(ids, lote_id)
+    return posicao < len(ids) and ids[posicao] == lote_id
+
+
+class IndiceEndereco:
+    """Mapeia trigramas normalizados para os ids (inteiros) dos lotes que os contêm.
+
+    As listas de cada trigrama ficam em arrays ordenados, com 8 bytes por id
+    em vez das dezenas que um set gasta. Os lotes indexados depois da última
+    compactação ficam em sets à parte, fundidos aos arrays quando crescem.
+    Um lote removido ou reindexado não é apagado dos arrays: toda busca
+    confirma o termo no texto do lote, então essas entradas só ocupam espaço
+    até a próxima reconstrução. Ids que não são inteiros (a API não os usa)
+    ficam sempre em sets, em `avulsos`.
+    """
+
+    def __init__(self, lotes=()):
+        self.postings = {}
+        self.pendentes = defaultdict(set)
+        self.avulsos = defaultdict(set)
+        self.textos = {}
+        self._compactadas = 0
+        self._pendentes = 0
+        self._obsoletos = 0
+        for lote in lotes:
+            self.atualizar(lote)
+        self.compactar()
+
+    def __len__(self):
+        return len(self.textos)
+
+    def atualizar(self, lote):
+        """Indexa um lote novo ou apenas os trigramas novos de um lote alterado."""
+        lote_id = lote["id"]
+        texto = texto_do_lote(lote)
+        anterior = self.textos.get(lote_id)
+        if anterior == texto:
+            return
+
+        novos = ngramas(texto)
+        if anterior is not None:
+            novos -= ngramas(anterior)
+            self._obsoletos += 1
+        if not _cabe_no_array(lote_id):
+            for grama in novos:
+                self.avulsos[grama].add(lote_id)
+            self.textos[lote_id] = texto
+            return
+        for grama in novos:
+            self.pendentes[grama].add(lote_id)
+        self._pendentes += len(novos)
+        self.textos[lote_id] = texto
+        self._manter()
+
+    def remover(self, lote_id):
+        if self.textos.pop(lote_id, None) is not None:
+            self._obsoletos += 1
+            self._manter()
+
+    def _manter(self):
+        if self._obsoletos > max(len(self.textos) // 4, 1000):
+            self.reconstruir()
+        elif self._pendentes > max(self._compactadas // 4, MIN_PENDENTES):
+            self.compactar()
+
+    def compactar(self):
+        """Funde os ids pendentes aos arrays ordenados."""
+        for grama, ids in self.pendentes.items():
+            atuais = self.postings.get(grama)
+            if atuais is not None:
+                self._compactadas -= len(atuais)
+                ids = ids.union(atuais)
+            self.postings[grama] = array("q", sorted(ids))
+            self._compactadas += len(self.postings[grama])
+        self.pendentes.clear()
+        self._pendentes = 0
+
+    def reconstruir(self):
+        """Refaz os arrays a partir dos textos, descartando as entradas obsoletas."""
+        listas = defaultdict(list)
+        self.avulsos.clear()
+        for lote_id, texto in self.textos.items():
+            if _cabe_no_array(lote_id):
+                for grama in ngramas(texto):
+                    listas[grama].append(lote_id)
+            else:
+                for grama in ngramas(texto):
+                    self.avulsos[grama].add(lote_id)
+        self.postings = {grama: array("q", sorted(ids)) for grama, ids in listas.items()}
+        self.pendentes.clear()
+        self._compactadas = sum(len(ids) for ids in self.postings.values())
+        self._pendentes = self._obsoletos = 0
+
+    def _tamanho(self, grama):
+        return sum(len(ids.get(grama, ())) for ids in (self.postings, self.pendentes, self.avulsos))
+
+    def memoria_estimada(self):
+        tamanho = sum(sys.getsizeof(ids) for ids in self.postings.values())
+        tamanho += sum(sys.getsizeof(ids) for ids in self.pendentes.values())
+        tamanho += sum(sys.getsizeof(ids) for ids in self.avulsos.values())
+        return tamanho + sum(sys.getsizeof(texto) for texto in self.textos.values())
+
+    def buscar(self, termo):
+        """Ids dos lotes em que algum bem contém o termo (sem diferenciar acentos)."""
+        termo = normalizar(termo)
+        if not termo:
+            return set(self.textos)
+
+        gramas = sorted(ngramas(termo), key=self._tamanho)
+        if not gramas:
+            # Termos menores que um trigrama são conferidos em todos os lotes
+            candidatos = self.textos.keys()
+        else:
+            # Parte da menor lista e confere os demais trigramas só nos candidatos restantes
+            candidatos = set(self.postings.get(gramas[0], ())).union(
+                self.pendentes.get(gramas[0], ()), self.avulsos.get(gramas[0], ())
+            )
+            for grama in gramas[1:]:
+                if not candidatos:
+                    break
+                compactados = self.postings.get(grama, ())
+                pendentes, avulsos = self.pendentes.get(grama, ()), self.avulsos.get(grama, ())
+                candidatos = {
+                    lote_id for lote_id in candidatos
+                    if lote_id in pendentes or lote_id in avulsos
+                    or (isinstance(lote_id, int) and _contem(compactados, lote_id))
+                }
+
+        return {
+            lote_id for lote_id in candidatos
+            if termo in self.textos.get(lote_id, "")
+        }
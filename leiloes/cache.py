@@ -0,0 +1,109 @@
+"""Cache de dados compartilhado por todas as sessões do processo."""
+import threading
+from collections import OrderedDict
+
+from leiloes.config import CACHE_MAX_ENTRADAS, CACHE_MAX_MB
+
+
+# Padrão de `atualizar`: aplica sobre qualquer versão em cache
+_QUALQUER_VERSAO = object()
+
+
+def _tamanho(valor):
+    medir = getattr(valor, "memoria_estimada", None)
+    return medir() if medir else 0
+
+
+class CacheVersionado:
+    """Cache LRU de valores identificados por (chave, versão), limitado em memória.
+
+    Cada chave guarda apenas a versão mais recente: carregar uma versão nova
+    descarta as anteriores. Sessões que pedem a mesma chave ao mesmo tempo
+    esperam um único carregamento em vez de cada uma montar sua própria cópia.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_MB * 1024 * 1024, max_entradas=CACHE_MAX_ENTRADAS):
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # (chave, versao) -> (valor, tamanho)
+        self._lock = threading.Lock()
+        self._carregando = {}  # chave -> Lock do carregamento em andamento
+
+    def _lock_da_chave(self, chave):
+        with self._lock:
+            return self._carregando.setdefault(chave, threading.Lock())
+
+    def _buscar(self, chave, versao):
+        with self._lock:
+            entrada = self._entradas.get((chave, versao))
+            if entrada is not None:
+                self._entradas.move_to_end((chave, versao))
+                return entrada[0]
+        return None
+
+    def obter(self, chave, versao, carregar):
+        """Devolve o valor da versão pedida, chamando `carregar()` apenas se não estiver em cache."""
+        valor = self._buscar(chave, versao)
+        if valor is not None:
+            return valor
+
+        with self._lock_da_chave(chave):
+            valor = self._buscar(chave, versao)
+            if valor is None:
+                valor = carregar()
+                self._guardar(chave, versao, valor)
+        return valor
+
+    def _guardar(self, chave, versao, valor):
+        with self._lock:
+            for antiga in [k for k in self._entradas if k[0] == chave]:
+                del self._entradas[antiga]
+            self._entradas[(chave, versao)] = (valor, _tamanho(valor))
+            self._evict()
+
+    def _evict(self):
+        # Remove as entradas usadas há mais tempo, mas nunca a mais recente
+        while len(self._entradas) > 1 and (
+            len(self._entradas) > self.max_entradas or self._memoria_usada() > self.max_bytes
+        ):
+            self._entradas.popitem(last=False)
+
+    def atualizar(self, chave, versao, funcao, versao_base=_QUALQUER_VERSAO):
+        """Aplica `funcao` ao valor em cache da chave e o registra na nova versão.
+
+        Com `versao_base`, a função só é aplicada se o valor em cache é dessa
+        versão; um valor de outra versão (ex.: outro processo gravou no meio
+        tempo) é descartado. Devolve False quando nada foi aplicado; nesse caso
+        a próxima leitura carrega a nova versão do zero.
+        """
+        with self._lock_da_chave(chave):
+            with self._lock:
+                atual = next((k for k in reversed(self._entradas) if k[0] == chave), None)
+                if atual is None:
+                    return False
+                if versao_base is not _QUALQUER_VERSAO and atual[1] != versao_base:
+                    del self._entradas[atual]
+                    return False
+                valor = self._entradas[atual][0]
+            funcao(valor)
+            self._guardar(chave, versao, valor)
+        return True
+
+    def invalidar(self, chave=None):
+        """Descarta a chave informada, ou todo o cache."""
+        with self._lock:
+            for k in [k for k in self._entradas if chave is None or k[0] == chave]:
+                del self._entradas[k]
+
+    def _memoria_usada(self):
+        return sum(tamanho for _, tamanho in self._entradas.values())
+
+    def memoria_usada(self):
+        """Memória estimada (bytes) de todas as entradas em cache."""
+        with self._lock:
+            return self._memoria_usada()
+
+
+# Instância única do processo: o Streamlit reexecuta o main.py a cada interação,
+# mas os módulos importados (e este cache) são compartilhados entre as sessões
+cache_dados = CacheVersionado()
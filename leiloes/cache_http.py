@@ -0,0 +1,224 @@
+"""Cache em disco das respostas da API, endereçado pelo conteúdo.
+
+Cada requisição (URL + parâmetros) tem uma entrada com os validadores HTTP
+(ETag/Last-Modified), o hash do corpo e os ids e hashes dos registros da
+página. Os corpos ficam em arquivos nomeados pelo próprio hash, então
+páginas idênticas compartilham o mesmo arquivo. O tamanho total é somado a
+cada gravação; quando passa do limite, as entradas usadas há mais tempo são
+descartadas até sobrar uma folga.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+from leiloes.config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB, HTTP_CACHE_MODO, HTTP_CACHE_TTL
+
+MODOS = ("desligado", "ativo", "replay")
+
+# Fração do limite que sobra ocupada depois de uma limpeza
+FRACAO_APOS_LIMPEZA = 0.9
+
+
+def hash_conteudo(corpo):
+    return hashlib.sha256(corpo).hexdigest()
+
+
+def _gravar_atomico(caminho, dados):
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+
+def _remover(caminho):
+    # Outro processo que usa o mesmo diretório pode ter apagado o arquivo antes
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(caminho)
+
+
+class CacheHTTP:
+    """Respostas das páginas gravadas em disco, com TTL e limite de tamanho."""
+
+    def __init__(self, diretorio=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._dir_entradas = os.path.join(diretorio, "entradas")
+        self._dir_objetos = os.path.join(diretorio, "objetos")
+        os.makedirs(self._dir_entradas, exist_ok=True)
+        os.makedirs(self._dir_objetos, exist_ok=True)
+        self._lock = threading.Lock()
+        # chave -> (conteudo, bytes da entrada, bytes do corpo); medidos na primeira gravação
+        self._tamanhos = None
+        self._total = 0
+
+    @staticmethod
+    def chave(url, params):
+        canonica = json.dumps([url, params], sort_keys=True, default=str)
+        return hashlib.sha256(canonica.encode("utf-8")).hexdigest()
+
+    def _caminho_entrada(self, chave):
+        return os.path.join(self._dir_entradas, f"{chave}.json")
+
+    def _caminho_objeto(self, conteudo):
+        return os.path.join(self._dir_objetos, f"{conteudo}.json")
+
+    def _salvar_entrada(self, chave, entrada):
+        dados = json.dumps(entrada).encode("utf-8")
+        _gravar_atomico(self._caminho_entrada(chave), dados)
+        return len(dados)
+
+    def consultar(self, chave):
+        """Entrada da requisição, ou None se não existe ou o corpo já foi descartado."""
+        try:
+            with open(self._caminho_entrada(chave), "rb") as f:
+                entrada = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self._caminho_objeto(entrada["conteudo"])):
+            return None
+        return entrada
+
+    def fresca(self, entrada):
+        return time.time() - entrada["validado_em"] < self.ttl
+
+    def cabecalhos_condicionais(self, entrada):
+        cabecalhos = {}
+        if entrada is None:
+            return cabecalhos
+        if entrada.get("etag"):
+            cabecalhos["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = entrada["last_modified"]
+        return cabecalhos
+
+    def _entrada_vigente(self, entrada):
+        """Entrada gravada em disco para a mesma requisição e o mesmo corpo, ou None.
+
+        Deve ser chamada com `self._lock`: `_limpar` pode ter descartado a
+        entrada (ou o corpo) e `gravar` pode tê-la trocado por uma resposta nova.
+        """
+        atual = self.consultar(entrada["chave"])
+        if atual is None or atual["conteudo"] != entrada["conteudo"]:
+            return None
+        return atual
+
+    def ler(self, entrada):
+        """Corpo da resposta guardada, ou None se já foi descartado; marca a entrada como usada agora."""
+        with self._lock:
+            atual = self._entrada_vigente(entrada)
+            if atual is None:
+                return None
+            try:
+                with open(self._caminho_objeto(atual["conteudo"]), "rb") as f:
+                    corpo = f.read()
+            except OSError:
+                return None
+            atual["acessado_em"] = time.time()
+            self._salvar_entrada(atual["chave"], atual)
+        return corpo
+
+    def revalidar(self, entrada, headers=None):
+        """Registra que a API confirmou a resposta guardada (304 ou corpo idêntico).
+
+        Devolve a entrada atualizada, ou None se ela foi descartada nesse meio tempo.
+        """
+        with self._lock:
+            atual = self._entrada_vigente(entrada)
+            if atual is None:
+                return None
+            atual["validado_em"] = atual["acessado_em"] = time.time()
+            if headers is not None:
+                atual["etag"] = headers.get("ETag") or atual.get("etag")
+                atual["last_modified"] = headers.get("Last-Modified") or atual.get("last_modified")
+            self._salvar_entrada(atual["chave"], atual)
+        return atual
+
+    def gravar(self, chave, url, params, corpo, headers, registros):
+        """Guarda uma resposta nova; `registros` são os pares (id, hash) da página."""
+        conteudo = hash_conteudo(corpo)
+        agora = time.time()
+        entrada = {
+            "chave": chave,
+            "url": url,
+            "params": params,
+            "conteudo": conteudo,
+            "tamanho": len(corpo),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "gravado_em": agora,
+            "validado_em": agora,
+            "acessado_em": agora,
+            "registros": registros,
+        }
+        with self._lock:
+            if self._tamanhos is None:
+                self._limpar()
+            caminho = self._caminho_objeto(conteudo)
+            if not os.path.exists(caminho):
+                _gravar_atomico(caminho, corpo)
+            bytes_entrada = self._salvar_entrada(chave, entrada)
+
+            # Um corpo substituído pode ter ficado sem entrada: continua somado
+            # até a próxima limpeza, que o apaga
+            anterior = self._tamanhos.pop(chave, None)
+            if anterior is not None:
+                self._total -= anterior[1] + (anterior[2] if anterior[0] == conteudo else 0)
+            self._tamanhos[chave] = (conteudo, bytes_entrada, len(corpo))
+            self._total += bytes_entrada + len(corpo)
+            if self._total > self.max_bytes:
+                self._limpar()
+        return entrada
+
+    def _limpar(self):
+        """Mede o diretório, apaga os corpos sem entrada e, acima do limite, as entradas menos usadas.
+
+        Acima do limite, as entradas saem até o total ficar em FRACAO_APOS_LIMPEZA
+        dele, para que as gravações seguintes não precisem de outra limpeza.
+        """
+        entradas = []
+        for nome in os.listdir(self._dir_entradas):
+            if not nome.endswith(".json"):
+                continue
+            caminho = os.path.join(self._dir_entradas, nome)
+            try:
+                with open(caminho, "rb") as f:
+                    dados = f.read()
+                entrada = json.loads(dados)
+                entradas.append((
+                    entrada["acessado_em"], caminho, entrada["chave"], entrada["conteudo"], len(dados),
+                    entrada["tamanho"],
+                ))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        total = sum(bytes_entrada + bytes_corpo for *_, bytes_entrada, bytes_corpo in entradas)
+        if total > self.max_bytes:
+            entradas.sort(key=lambda item: item[0])
+            descartadas = 0
+            while descartadas < len(entradas) and total > self.max_bytes * FRACAO_APOS_LIMPEZA:
+                _, caminho, _, _, bytes_entrada, bytes_corpo = entradas[descartadas]
+                total -= bytes_entrada + bytes_corpo
+                _remover(caminho)
+                descartadas += 1
+            del entradas[:descartadas]
+
+        referenciados = {f"{conteudo}.json" for _, _, _, conteudo, _, _ in entradas}
+        for nome in os.listdir(self._dir_objetos):
+            if nome.endswith(".json") and nome not in referenciados:
+                _remover(os.path.join(self._dir_objetos, nome))
+
+        self._tamanhos = {chave: (conteudo, entrada, corpo) for _, _, chave, conteudo, entrada, corpo in entradas}
+        self._total = total
+
+
+def criar_cache_http(modo=HTTP_CACHE_MODO):
+    """CacheHTTP do diretório configurado, ou None com o cache desligado."""
+    if modo not in MODOS:
+        raise ValueError(f"HTTP_CACHE_MODO inválido: {modo!r} (use {', '.join(MODOS)})")
+    if modo == "desligado":
+        return None
+    return CacheHTTP()
@@ -0,0 +1,115 @@
+"""Configurações compartilhadas entre a aplicação e as rotinas de sincronização."""
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dotenv import load_dotenv
+
+try:
+    fuso_horario_brasil = ZoneInfo('America/Sao_Paulo')
+except ZoneInfoNotFoundError:
+    # Sistemas sem a base de fusos (ex.: Windows sem tzdata) usam a do pytz
+    import pytz
+    fuso_horario_brasil = pytz.timezone('America/Sao_Paulo')
+
+
+def agora_formatado():
+    """Data e hora atuais de Brasília no formato gravado em 'data_atualizacao'."""
+    return datetime.now(fuso_horario_brasil).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# Obter variáveis de ambiente
+MONGO_URI = os.getenv('MONGO_URI')
+COURIER_API_TOKEN = os.getenv('COURIER_API_TOKEN')
+EMAIL_DESTINATARIOS = os.getenv('EMAIL_DESTINATARIOS', '').split(',')
+
+# -------------------- Cliente MongoDB --------------------
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))  # Conexões por servidor
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))  # Fecha conexões ociosas
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "60000"))
+
+# -------------------- API do Leilojus --------------------
+API_URL = "https://leilojus-api.tjdft.jus.br/public/leiloes"
+DEFAULT_PARAMS = {
+    "tiposDeBemALeiloar": "IMOVEL",
+    "size": 1000,  # Página inicial com 10 itens por página
+    "sort": "primeiraHasta,asc",
+}
+
+# -------------------- Busca concorrente --------------------
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "4"))  # Páginas buscadas em paralelo
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))  # Novas tentativas por página
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", "0.5"))  # Espera inicial entre tentativas (s)
+FETCH_RATE_LIMIT = float(os.getenv("FETCH_RATE_LIMIT", "5"))  # Requisições por segundo (0 = sem limite)
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))  # Timeout de cada requisição (s)
+
+# -------------------- Partições da busca --------------------
+# Cada combinação tipo de bem × status (× janela de datas) é uma busca à parte;
+# sem status configurado, cada tipo de bem é buscado com todos os status juntos
+CRAWL_TIPOS_BEM = [t.strip() for t in os.getenv("CRAWL_TIPOS_BEM", "IMOVEL").split(",") if t.strip()]
+CRAWL_STATUS = [s.strip() for s in os.getenv("CRAWL_STATUS", "").split(",") if s.strip()]
+CRAWL_PARTICOES_PARALELAS = int(os.getenv("CRAWL_PARTICOES_PARALELAS", "2"))  # Dividem os FETCH_MAX_WORKERS
+# Minutos entre as buscas de cada status, ex.: "AGENDADO=15,ENCERRADO=1440"
+CRAWL_INTERVALOS = os.getenv("CRAWL_INTERVALOS", "")
+CRAWL_INTERVALO_PADRAO = float(os.getenv("CRAWL_INTERVALO_PADRAO", "0"))  # Demais status (0 = toda execução)
+# Janelas da data do 1º leilão entre INICIO e FIM (AAAA-MM-DD); 0 dias = sem janelas
+CRAWL_JANELA_DIAS = int(os.getenv("CRAWL_JANELA_DIAS", "0"))
+CRAWL_JANELA_INICIO = os.getenv("CRAWL_JANELA_INICIO", "")
+CRAWL_JANELA_FIM = os.getenv("CRAWL_JANELA_FIM", "")
+CRAWL_PARAM_DATA_INICIO = os.getenv("CRAWL_PARAM_DATA_INICIO", "dataInicio")  # Nomes dos parâmetros na API
+CRAWL_PARAM_DATA_FIM = os.getenv("CRAWL_PARAM_DATA_FIM", "dataFim")
+
+# -------------------- Cache HTTP das páginas --------------------
+# "desligado", "ativo" (grava as respostas e revalida com a API) ou
+# "replay" (serve só as respostas gravadas, sem acessar a rede)
+HTTP_CACHE_MODO = os.getenv("HTTP_CACHE_MODO", "desligado")
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".cache_http")
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", "60"))  # Segundos em que a resposta é usada sem revalidar
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))  # Limite do cache em disco
+
+# -------------------- Escrita no MongoDB --------------------
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))  # Operações por bulk_write
+
+# -------------------- Consulta da listagem --------------------
+# "banco": filtros e paginação executados no armazenamento a cada interação
+# "memoria": lotes carregados uma vez por versão dos dados e filtrados em memória
+MODO_CONSULTA = os.getenv("MODO_CONSULTA", "banco")
+
+# -------------------- Exportação --------------------
+EXPORTACAO_BLOCO = int(os.getenv("EXPORTACAO_BLOCO", "2000"))  # Linhas por bloco do CSV/Parquet
+
+# -------------------- Cache compartilhado --------------------
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "512"))  # Limite de memória dos dados em cache
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "4"))
+RENDER_CACHE_MAX = int(os.getenv("RENDER_CACHE_MAX", "20000"))  # Fragmentos HTML de cards guardados
+
+# -------------------- Sincronização --------------------
+SYNC_LOCK_TTL_MIN = float(os.getenv("SYNC_LOCK_TTL_MIN", "30"))  # Validade da trava de sincronização
+# Lotes novos e alterados guardados por completo para o e-mail (dos demais, só o id);
+# numa carga grande o digest e as buscas salvas recebem só essa amostra
+SYNC_AMOSTRA_MAX = int(os.getenv("SYNC_AMOSTRA_MAX", "1000"))
+# Minutos que um lote fica marcado como ausente da API antes de ser arquivado
+# (nunca menos que o maior intervalo entre buscas das partições)
+RECONCILIACAO_CARENCIA_MIN = float(os.getenv("RECONCILIACAO_CARENCIA_MIN", "1440"))
+SITE_URL = "https://leiloesjusdf.streamlit.app/"
+
+# -------------------- E-mail de alerta --------------------
+EMAIL_MAX_CHARS = int(os.getenv("EMAIL_MAX_CHARS", "100000"))  # Tamanho máximo do corpo de cada mensagem
+EMAIL_MAX_DESTINATARIOS = int(os.getenv("EMAIL_MAX_DESTINATARIOS", "50"))  # Destinatários por envio
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))  # Novas tentativas por mensagem
+EMAIL_BACKOFF = float(os.getenv("EMAIL_BACKOFF", "2"))  # Espera inicial entre tentativas (s)
+
+# -------------------- Métricas --------------------
+# Arquivo JSON-lines que recebe uma linha por execução (sincronização); vazio = desativado
+METRICAS_JSONL = os.getenv("METRICAS_JSONL", "")
+
+# -------------------- Armazenamento --------------------
+# "mongo" (padrão) ou "sqlite" para rodar sem um cluster MongoDB
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "leiloes.db")
@@ -0,0 +1,194 @@
+"""Filtros, ordenação e paginação dos lotes executados no próprio MongoDB."""
+import re
+
+from leiloes.config import DEFAULT_PARAMS
+from leiloes.busca import normalizar
+from leiloes.diff import AUSENTE_FIELD, BUSCA_FIELD, FINGERPRINT_FIELD, LAST_CHANGE_FIELD, TIPO_BEM_FIELD
+
+# Mesmos valores de pymongo.ASCENDING/DESCENDING, sem carregar o driver
+# quando o armazenamento é o SQLite
+ASCENDING = 1
+DESCENDING = -1
+
+# O id no fim de cada ordenação desempata registros com a mesma data, para
+# que a paginação com skip/limit seja estável entre as execuções
+SORT_OPTIONS = {
+    "Data 1º Leilão, Crescente": [("primeiraHasta", ASCENDING), ("id", ASCENDING)],
+    "Data 1º Leilão, Decrescente": [("primeiraHasta", DESCENDING), ("id", DESCENDING)],
+    "Data de Criação, Crescente": [("processo.dataCriacao", ASCENDING), ("id", ASCENDING)],
+    "Data de Criação, Decrescente": [("processo.dataCriacao", DESCENDING), ("id", DESCENDING)],
+    # Lotes que nunca foram alterados (sem ultima_alteracao) ficam por último
+    "Data de Atualização, Decrescente": [
+        (LAST_CHANGE_FIELD, DESCENDING),
+        ("processo.dataCriacao", DESCENDING),
+        ("id", DESCENDING),
+    ],
+}
+DEFAULT_SORT = SORT_OPTIONS["Data 1º Leilão, Crescente"]
+
+# Apenas os campos usados pelos cards de resultado (o hash identifica a versão
+# de cada lote no cache de renderização)
+PROJECAO_LISTAGEM = {
+    "_id": 0,
+    "id": 1,
+    "status": 1,
+    "primeiraHasta": 1,
+    "segundaHasta": 1,
+    "valorTotalBens": 1,
+    "processo.numeroProcessoFormatado": 1,
+    "processo.dataCriacao": 1,
+    "leiloeiro.localRealizacao": 1,
+    "bensALeiloar.descricao": 1,
+    "bensALeiloar.valor": 1,
+    LAST_CHANGE_FIELD: 1,
+    FINGERPRINT_FIELD: 1,
+    AUSENTE_FIELD: 1,
+}
+
+# Lotes sem a marca de tipo de bem vieram da busca antiga, feita só com este tipo
+TIPO_BEM_LEGADO = DEFAULT_PARAMS["tiposDeBemALeiloar"]
+
+# Os lotes marcados como ausentes da API ficam fora da listagem durante a carência
+FILTRO_PRESENTES = {AUSENTE_FIELD: {"$exists": False}}
+
+# Índices que atendem os filtros e as ordenações acima sem ordenar em memória
+INDICES_LOTES = [
+    [("id", ASCENDING)],
+    [("primeiraHasta", ASCENDING), ("id", ASCENDING)],
+    [("status", ASCENDING), ("primeiraHasta", ASCENDING), ("id", ASCENDING)],
+    [("processo.dataCriacao", ASCENDING), ("id", ASCENDING)],
+    [("status", ASCENDING), ("processo.dataCriacao", ASCENDING), ("id", ASCENDING)],
+    [(LAST_CHANGE_FIELD, DESCENDING), ("processo.dataCriacao", DESCENDING), ("id", DESCENDING)],
+    [(AUSENTE_FIELD, ASCENDING)],
+]
+
+# Os arquivados só são lidos por id
+INDICES_ARQUIVADOS = [
+    [("id", ASCENDING)],
+]
+
+# O change-log é sempre consultado pelos lotes de uma página, do mais recente ao mais antigo
+INDICES_ALTERACOES = [
+    [("lote_id", ASCENDING), ("dataAlteracao", DESCENDING)],
+]
+
+INDICES_ASSINATURAS = [
+    [("id", ASCENDING)],
+    [("ativa", ASCENDING)],
+]
+
+_colecoes_indexadas = set()
+
+
+def ensure_indexes(collection, indices=INDICES_LOTES):
+    """Cria (uma vez por processo) os índices usados pelas consultas da listagem."""
+    if collection.full_name in _colecoes_indexadas:
+        return
+    for keys in indices:
+        collection.create_index(keys)
+    _colecoes_indexadas.add(collection.full_name)
+
+
+def montar_filtro(status=None, data_inicio=None, data_fim=None, endereco=None):
+    """Converte as seleções do menu lateral em um filtro do MongoDB (só com os lotes presentes)."""
+    filtro = dict(FILTRO_PRESENTES)
+    if status:
+        filtro["status"] = status
+
+    # As datas são strings ISO, então a comparação lexicográfica equivale à cronológica
+    intervalo = {}
+    if data_inicio:
+        intervalo["$gte"] = data_inicio.isoformat()
+    if data_fim:
+        intervalo["$lte"] = f"{data_fim.isoformat()}T00:00:00"
+    if intervalo:
+        filtro["primeiraHasta"] = intervalo
+
+    if endereco:
+        # Mesma normalização do índice em memória: "aguas claras" encontra "Águas Claras"
+        filtro[BUSCA_FIELD] = {"$regex": re.escape(normalizar(endereco))}
+    return filtro
+
+
+def filtro_tipos_bem(tipos_bem):
+    """Filtro dos lotes buscados em algum dos tipos de bem informados."""
+    tipos_bem = list(tipos_bem)
+    if TIPO_BEM_LEGADO not in tipos_bem:
+        return {TIPO_BEM_FIELD: {"$in": tipos_bem}}
+    return {"$or": [{TIPO_BEM_FIELD: {"$in": tipos_bem}}, {TIPO_BEM_FIELD: {"$exists": False}}]}
+
+
+def contar_lotes(collection, filtro):
+    if filtro == FILTRO_PRESENTES:
+        # Sem filtros do menu: total estimado menos os ausentes, contados pelo índice
+        ausentes = collection.count_documents({AUSENTE_FIELD: {"$exists": True}})
+        return collection.estimated_document_count() - ausentes
+    return collection.count_documents(filtro)
+
+
+def buscar_pagina(collection, filtro, selected_sort, page_size=None, current_page=1):
+    """Busca apenas a página pedida, já ordenada, com a projeção da listagem.
+
+    `page_size` None (opção "Todos") devolve todos os lotes filtrados.
+    """
+    cursor = collection.find(filtro, PROJECAO_LISTAGEM).sort(SORT_OPTIONS.get(selected_sort, DEFAULT_SORT))
+    if page_size:
+        cursor = cursor.skip((current_page - 1) * page_size).limit(page_size)
+    return list(cursor)
+
+
+def iter_filtrados(collection, filtro, selected_sort, projecao=None, tamanho_bloco=1000):
+    """Percorre todos os lotes filtrados na ordem escolhida, buscando-os em blocos do cursor."""
+    return collection.find(filtro, projecao).sort(SORT_OPTIONS.get(selected_sort, DEFAULT_SORT)).batch_size(tamanho_bloco)
+
+
+def carregar_historico(collection, ids):
+    """Eventos do change-log dos lotes informados, do mais recente ao mais antigo."""
+    historico = {lote_id: [] for lote_id in ids}
+    if not historico:
+        return historico
+    cursor = collection.find({"lote_id": {"$in": list(historico)}}, {"_id": 0}).sort(INDICES_ALTERACOES[0])
+    for evento in cursor:
+        historico[evento["lote_id"]].append(evento)
+    return historico
+
+
+def aplicar_projecao(documento, projecao):
+    """Aplica uma projeção do MongoDB ({"a.b": 1, "_id": 0}) a um documento já carregado."""
+    if not projecao:
+        return documento
+
+    incluidos = [campo.split(".") for campo, incluir in projecao.items() if incluir]
+    if not incluidos:
+        excluidos = {campo for campo, incluir in projecao.items() if not incluir}
+        return {chave: valor for chave, valor in documento.items() if chave not in excluidos}
+
+    resultado = {}
+    for partes in incluidos:
+        parcial = _projetar(documento, partes)
+        if parcial is not None:
+            _mesclar(resultado, parcial)
+    return resultado
+
+
+def _projetar(valor, partes):
+    if isinstance(valor, list):
+        # Como no MongoDB, cada subdocumento da lista é projetado (e mantém sua posição)
+        return [_projetar(item, partes) or {} for item in valor if isinstance(item, dict)]
+    if not isinstance(valor, dict) or partes[0] not in valor:
+        return None
+    if len(partes) == 1:
+        return {partes[0]: valor[partes[0]]}
+    interno = _projetar(valor[partes[0]], partes[1:])
+    return {partes[0]: interno} if interno is not None else None
+
+
+def _mesclar(destino, origem):
+    for chave, valor in origem.items():
+        if isinstance(valor, dict) and isinstance(destino.get(chave), dict):
+            _mesclar(destino[chave], valor)
+        elif isinstance(valor, list) and isinstance(destino.get(chave), list):
+            for item_destino, item_origem in zip(destino[chave], valor):
+                _mesclar(item_destino, item_origem)
+        else:
+            destino[chave] = valor
@@ -0,0 +1,341 @@
+"""Representação colunar dos lotes carregados, para filtrar e ordenar em memória."""
+import sys
+import threading
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from leiloes.busca import IndiceEndereco
+from leiloes.diff import AUSENTE_FIELD, FINGERPRINT_FIELD, LAST_CHANGE_FIELD
+
+# Sufixo de fuso horário das datas ISO; é descartado (como no tz_localize(None))
+# para comparar todas as datas no horário local em que foram registradas
+_SUFIXO_FUSO = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+# Chave usada para posicionar datas ausentes sempre no fim da ordenação
+_SEM_DATA = np.iinfo(np.int64).max
+
+# Lotes convertidos por vez na carga, para não manter todos os documentos em memória
+TAMANHO_BLOCO = 5000
+
+
+def _to_datetime64(values):
+    """Converte uma sequência de strings ISO em um array datetime64 (NaT quando ausente)."""
+    serie = pd.Series(values, dtype=object)
+    serie = serie.where(serie.notna(), None).astype("string").str.replace(_SUFIXO_FUSO, "", regex=True)
+    datas = pd.to_datetime(serie, errors="coerce", format="ISO8601")
+    return datas.to_numpy(dtype="datetime64[ns]")
+
+
+def _chave_ordenacao(datas, decrescente=False):
+    """Transforma datas em inteiros ordenáveis, com datas ausentes no fim."""
+    chave = datas.view("i8").copy()
+    ausentes = np.isnat(datas)
+    if decrescente:
+        chave = -chave
+    chave[ausentes] = _SEM_DATA
+    return chave
+
+
+def _ultima_alteracao(lote):
+    if lote.get("ultima_alteracao"):
+        return lote["ultima_alteracao"]
+    # Lotes ainda não migrados para o change-log guardam o histórico embutido
+    datas = [h.get("dataAlteracao") for h in lote.get("historico_alteracoes") or [] if h.get("dataAlteracao")]
+    return max(datas) if datas else None
+
+
+def _tamanho_profundo(valor):
+    """Tamanho aproximado em bytes de um registro aninhado (dicts, listas e escalares)."""
+    tamanho = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        tamanho += sum(_tamanho_profundo(k) + _tamanho_profundo(v) for k, v in valor.items())
+    elif isinstance(valor, (list, tuple)):
+        tamanho += sum(_tamanho_profundo(item) for item in valor)
+    elif hasattr(valor, "__slots__"):
+        tamanho += sum(_tamanho_profundo(getattr(valor, campo)) for campo in valor.__slots__)
+    return tamanho
+
+
+def _valor(lote):
+    valor = lote.get("valorTotalBens")
+    return valor if valor is not None else np.nan
+
+
+def _internar(texto):
+    return sys.intern(texto) if isinstance(texto, str) else texto
+
+
+def _iso(datas):
+    """Strings ISO (ou None) das datas de uma coluna datetime64."""
+    textos = np.datetime_as_string(datas, unit="s")
+    return [None if ausente else texto for texto, ausente in zip(textos.tolist(), np.isnat(datas))]
+
+
+class RegistroLote:
+    """Campos do card que não estão nas colunas do LotesDataset.
+
+    Status, datas e valor já ficam nas colunas; aqui sobram o número do
+    processo, o leiloeiro (internado, pois se repete entre os lotes), os bens
+    como tuplas (descrição, valor) e as versões usadas pelo cache de
+    renderização. Com __slots__ e sem os dicts aninhados do documento, ocupa
+    uma fração dele; o documento completo continua no armazenamento
+    (storage.carregar_docs).
+    """
+
+    __slots__ = ("numero_processo", "local", "bens", "hash", "ultima_alteracao")
+
+    def __init__(self, lote):
+        processo = lote.get("processo") or {}
+        self.numero_processo = processo.get("numeroProcessoFormatado")
+        self.local = _internar((lote.get("leiloeiro") or {}).get("localRealizacao"))
+        self.bens = tuple((bem.get("descricao"), bem.get("valor")) for bem in lote.get("bensALeiloar") or ())
+        self.hash = lote.get(FINGERPRINT_FIELD)
+        self.ultima_alteracao = lote.get(LAST_CHANGE_FIELD)
+
+    def documento(self, lote_id, status, primeira_hasta, segunda_hasta, data_criacao, valor):
+        """Monta o lote no formato da PROJECAO_LISTAGEM, que os cards esperam."""
+        return {
+            "id": lote_id,
+            "status": status,
+            "primeiraHasta": primeira_hasta,
+            "segundaHasta": segunda_hasta,
+            "valorTotalBens": valor,
+            "processo": {"numeroProcessoFormatado": self.numero_processo, "dataCriacao": data_criacao},
+            "leiloeiro": {"localRealizacao": self.local},
+            "bensALeiloar": [{"descricao": descricao, "valor": valor_bem} for descricao, valor_bem in self.bens],
+            LAST_CHANGE_FIELD: self.ultima_alteracao,
+            FINGERPRINT_FIELD: self.hash,
+        }
+
+
+def _colunas(lotes):
+    """Calcula as colunas pré-processadas de uma lista de lotes."""
+    return {
+        "primeira_hasta": _to_datetime64([lote.get("primeiraHasta") for lote in lotes]),
+        "segunda_hasta": _to_datetime64([lote.get("segundaHasta") for lote in lotes]),
+        "data_criacao": _to_datetime64([(lote.get("processo") or {}).get("dataCriacao") for lote in lotes]),
+        "ultima_alteracao": _to_datetime64([_ultima_alteracao(lote) for lote in lotes]),
+        "valor_total": np.array([_valor(lote) for lote in lotes], dtype=float),
+        "status": np.array([lote.get("status") or "" for lote in lotes], dtype=object),
+    }
+
+
+class LotesDataset:
+    """Colunas pré-processadas dos lotes de uma versão dos dados.
+
+    As datas são convertidas uma única vez para datetime64, de modo que os
+    filtros viram máscaras vetorizadas e as ordenações um argsort estável,
+    que preserva a ordem de carregamento entre registros empatados. A busca
+    por endereço usa um índice de trigramas mantido junto com as colunas.
+    Os documentos não são guardados: o restante de cada lote fica num
+    RegistroLote, e os dicts só são montados para as linhas exibidas.
+    """
+
+    COLUNAS = ("primeira_hasta", "segunda_hasta", "data_criacao", "ultima_alteracao", "valor_total")
+
+    def __init__(self, lotes):
+        """`lotes` pode ser qualquer iterável (um cursor, por exemplo), lido em blocos.
+
+        Os lotes marcados como ausentes da API ficam de fora, como na listagem do banco.
+        """
+        ids, self.registros, blocos = [], [], []
+        self.indice = IndiceEndereco()
+        lotes = iter(lotes)
+        while True:
+            bloco = list(islice(lotes, TAMANHO_BLOCO))
+            if not bloco:
+                break
+            bloco = [lote for lote in bloco if not lote.get(AUSENTE_FIELD)]
+            blocos.append(_colunas(bloco))
+            for lote in bloco:
+                ids.append(lote.get("id"))
+                self.registros.append(RegistroLote(lote))
+                self.indice.atualizar(lote)
+        self.indice.compactar()
+
+        self.ids = np.array(ids, dtype=object)
+        self.posicoes = {lote_id: i for i, lote_id in enumerate(ids)}
+
+        if blocos:
+            colunas = {nome: np.concatenate([bloco[nome] for bloco in blocos]) for nome in blocos[0]}
+        else:
+            colunas = _colunas([])
+        for nome in self.COLUNAS:
+            setattr(self, nome, colunas[nome])
+        self._codificar_status(colunas["status"])
+
+        # Sessões diferentes leem o mesmo conjunto; aplicar() altera as colunas
+        # no lugar, então leituras e atualizações passam por este lock
+        self.lock = threading.RLock()
+
+    def _codificar_status(self, status):
+        self.status_categorias, self.status_codigos = np.unique(status, return_inverse=True)
+
+    def __len__(self):
+        return len(self.registros)
+
+    def memoria_estimada(self, amostra=200):
+        """Estimativa em bytes das colunas, do índice e dos registros (por amostragem)."""
+        colunas = sum(getattr(self, nome).nbytes for nome in self.COLUNAS)
+        colunas += self.ids.nbytes + self.status_codigos.nbytes + sys.getsizeof(self.posicoes)
+
+        indice = self.indice.memoria_estimada()
+
+        registros = sys.getsizeof(self.registros)
+        if self.registros:
+            passo = max(len(self.registros) // amostra, 1)
+            amostrados = self.registros[::passo]
+            registros += sum(_tamanho_profundo(registro) for registro in amostrados) * len(self) // len(amostrados)
+        return colunas + indice + registros
+
+    def aplicar(self, novos=(), alterados=(), removidos=()):
+        """Atualiza as colunas e o índice com os lotes inseridos, alterados ou retirados numa busca."""
+        lotes = list(alterados) + list(novos)
+        removidos = [lote_id for lote_id in removidos if lote_id in self.posicoes]
+        if not lotes and not removidos:
+            return
+
+        with self.lock:
+            if removidos:
+                self._remover(removidos)
+            if lotes:
+                self._aplicar(lotes)
+
+    def _remover(self, ids):
+        manter = np.ones(len(self), dtype=bool)
+        manter[[self.posicoes[lote_id] for lote_id in ids]] = False
+        for nome in self.COLUNAS:
+            setattr(self, nome, getattr(self, nome)[manter])
+        status = self.status_categorias[self.status_codigos][manter]
+        self.ids = self.ids[manter]
+        self.registros = [registro for registro, fica in zip(self.registros, manter) if fica]
+        self.posicoes = {lote_id: i for i, lote_id in enumerate(self.ids)}
+        self._codificar_status(status)
+        for lote_id in ids:
+            self.indice.remover(lote_id)
+
+    def _aplicar(self, lotes):
+        existentes = [lote for lote in lotes if lote["id"] in self.posicoes]
+        adicionados = [lote for lote in lotes if lote["id"] not in self.posicoes]
+        status = self.status_categorias[self.status_codigos]
+
+        if existentes:
+            posicoes = np.array([self.posicoes[lote["id"]] for lote in existentes], dtype=np.intp)
+            colunas = _colunas(existentes)
+            for nome in self.COLUNAS:
+                getattr(self, nome)[posicoes] = colunas[nome]
+            status[posicoes] = colunas["status"]
+            for posicao, lote in zip(posicoes, existentes):
+                self.registros[posicao] = RegistroLote(lote)
+
+        if adicionados:
+            colunas = _colunas(adicionados)
+            for nome in self.COLUNAS:
+                setattr(self, nome, np.concatenate([getattr(self, nome), colunas[nome]]))
+            status = np.concatenate([status, colunas["status"]])
+            inicio = len(self)
+            self.registros.extend(RegistroLote(lote) for lote in adicionados)
+            self.ids = np.concatenate([self.ids, np.array([lote["id"] for lote in adicionados], dtype=object)])
+            for deslocamento, lote in enumerate(adicionados):
+                self.posicoes[lote["id"]] = inicio + deslocamento
+
+        self._codificar_status(status)
+        for lote in lotes:
+            self.indice.atualizar(lote)
+
+    def _mascara_status(self, status):
+        codigo = np.searchsorted(self.status_categorias, status)
+        if codigo < len(self.status_categorias) and self.status_categorias[codigo] == status:
+            return self.status_codigos == codigo
+        return np.zeros(len(self), dtype=bool)
+
+    def _mascara_periodo(self, data_inicio, data_fim):
+        mascara = np.ones(len(self), dtype=bool)
+        if data_inicio:
+            mascara &= self.primeira_hasta >= np.datetime64(data_inicio, "ns")
+        if data_fim:
+            mascara &= self.primeira_hasta <= np.datetime64(data_fim, "ns")
+        return mascara
+
+    def _mascara_endereco(self, endereco):
+        encontrados = np.zeros(len(self), dtype=bool)
+        posicoes = [self.posicoes[lote_id] for lote_id in self.indice.buscar(endereco)]
+        encontrados[posicoes] = True
+        return encontrados
+
+    def mascara(self, status=None, data_inicio=None, data_fim=None, endereco=None):
+        """Máscara booleana dos lotes que atendem aos filtros do menu lateral."""
+        mascara = self._mascara_periodo(data_inicio, data_fim)
+        if status:
+            mascara &= self._mascara_status(status)
+        if endereco:
+            mascara &= self._mascara_endereco(endereco)
+        return mascara
+
+    def facetas(self, status=None, data_inicio=None, data_fim=None, endereco=None):
+        """Contagens por status e por mês do 1º leilão para os filtros informados.
+
+        Cada faceta desconsidera o próprio filtro: a de status mostra quantos
+        lotes cada opção traria com os demais filtros, e a de meses ignora o
+        período. As contagens saem de um bincount sobre os códigos já
+        calculados, sem percorrer os registros.
+        """
+        periodo = self._mascara_periodo(data_inicio, data_fim)
+        outros = self._mascara_endereco(endereco) if endereco else np.ones(len(self), dtype=bool)
+        if status:
+            com_status = outros & self._mascara_status(status)
+        else:
+            com_status = outros
+
+        contagens = np.bincount(self.status_codigos[periodo & outros], minlength=len(self.status_categorias))
+        por_status = {str(s): int(n) for s, n in zip(self.status_categorias, contagens) if n}
+
+        meses = self.primeira_hasta[com_status].astype("datetime64[M]")
+        meses, contagens = np.unique(meses[~np.isnat(meses)], return_counts=True)
+        por_mes = dict(zip(np.datetime_as_string(meses, unit="M").tolist(), contagens.tolist()))
+
+        return {"status": por_status, "mes": por_mes}
+
+    def filtrar(self, status=None, data_inicio=None, data_fim=None, endereco=None):
+        """Posições dos lotes filtrados, na ordem de carregamento."""
+        return np.flatnonzero(self.mascara(status, data_inicio, data_fim, endereco))
+
+    def ordenar(self, indices, selected_sort):
+        """Ordena as posições filtradas conforme a opção "Ordenar por"."""
+        if selected_sort == "Data 1º Leilão, Decrescente":
+            chaves = (_chave_ordenacao(self.primeira_hasta[indices], decrescente=True),)
+        elif selected_sort == "Data de Criação, Crescente":
+            chaves = (_chave_ordenacao(self.data_criacao[indices]),)
+        elif selected_sort == "Data de Criação, Decrescente":
+            chaves = (_chave_ordenacao(self.data_criacao[indices], decrescente=True),)
+        elif selected_sort == "Data de Atualização, Decrescente":
+            # Lotes sem alteração ficam depois, ordenados pela data de criação
+            chaves = (
+                _chave_ordenacao(self.data_criacao[indices], decrescente=True),
+                _chave_ordenacao(self.ultima_alteracao[indices], decrescente=True),
+            )
+        else:
+            chaves = (_chave_ordenacao(self.primeira_hasta[indices]),)
+
+        # lexsort é estável e usa a última chave como a principal
+        return indices[np.lexsort(chaves)]
+
+    def linhas(self, indices):
+        """Lotes das posições informadas, no formato da listagem (montados só para essas linhas)."""
+        indices = np.asarray(indices, dtype=np.intp)
+        valores = self.valor_total[indices]
+        return [
+            self.registros[posicao].documento(
+                self.ids[posicao], str(status), primeira, segunda, criacao, None if np.isnan(valor) else float(valor)
+            )
+            for posicao, status, primeira, segunda, criacao, valor in zip(
+                indices.tolist(),
+                self.status_categorias[self.status_codigos[indices]],
+                _iso(self.primeira_hasta[indices]),
+                _iso(self.segunda_hasta[indices]),
+                _iso(self.data_criacao[indices]),
+                valores.tolist(),
+            )
+        ]
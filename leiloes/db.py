@@ -0,0 +1,303 @@
+"""Conexão com o MongoDB e gravação/leitura dos lotes."""
+import threading
+
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.mongo_client import MongoClient
+from pymongo.server_api import ServerApi
+
+from leiloes.bulk import BulkWriter, print_batch
+from leiloes.config import (
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_URI,
+    agora_formatado,
+)
+from leiloes.consulta import (
+    INDICES_ALTERACOES,
+    INDICES_ARQUIVADOS,
+    INDICES_ASSINATURAS,
+    buscar_pagina,
+    carregar_historico,
+    contar_lotes,
+    ensure_indexes,
+    filtro_tipos_bem,
+    iter_filtrados,
+    montar_filtro,
+)
+from leiloes.busca import texto_do_lote
+from leiloes.diff import AUSENTE_FIELD, BUSCA_FIELD, FINGERPRINT_FIELD, IGNORE_FIELDS, add_fingerprints
+
+DATABASE = "leiloes_judiciais"
+
+_client = None
+_client_lock = threading.Lock()
+
+# Collections cujos lotes antigos já receberam o texto de busca neste processo
+_texto_busca_preenchido = set()
+
+
+def get_client():
+    """Cliente MongoDB compartilhado pelo processo, criado no primeiro uso.
+
+    O MongoClient já mantém um pool de conexões thread-safe; criá-lo uma
+    única vez evita refazer a descoberta do cluster a cada sessão ou rerun.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(
+                MONGO_URI,
+                server_api=ServerApi('1'),
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                retryWrites=True,
+                appname="leiloesjusdf",
+            )
+        return _client
+
+
+class MongoStorage:
+    """Armazenamento dos lotes nas collections 'dados_gerais', 'lotes' e 'alteracoes' do MongoDB.
+
+    Sem `database`, usa o cliente compartilhado, conectado só na primeira operação.
+    """
+
+    nome = "mongo"
+
+    def __init__(self, database=None):
+        self._database = database
+
+    @property
+    def db(self):
+        if self._database is None:
+            self._database = get_client()[DATABASE]
+        return self._database
+
+    @property
+    def dados_gerais_collection(self):
+        return self.db["dados_gerais"]
+
+    @property
+    def lotes_collection(self):
+        return self.db["lotes"]
+
+    @property
+    def alteracoes_collection(self):
+        return self.db["alteracoes"]
+
+    @property
+    def arquivados_collection(self):
+        return self.db["lotes_arquivados"]
+
+    @property
+    def assinaturas_collection(self):
+        return self.db["assinaturas"]
+
+    # -------------------- Dados gerais --------------------
+    def load_dados_gerais(self):
+        return self.dados_gerais_collection.find_one({"_id": "dados_gerais"}) or {}
+
+    def marcar_atualizacao(self):
+        """Registra a data da última atualização e a devolve."""
+        dados_gerais = {"data_atualizacao": agora_formatado()}
+
+        self.dados_gerais_collection.update_one(
+            {"_id": "dados_gerais"},
+            {"$set": dados_gerais},
+            upsert=True
+        )
+        return dados_gerais["data_atualizacao"]
+
+    # -------------------- Agregados --------------------
+    def carregar_agregados(self):
+        return self.dados_gerais_collection.find_one({"_id": "agregados"}, {"_id": 0})
+
+    def salvar_agregados(self, agregados):
+        self.dados_gerais_collection.replace_one({"_id": "agregados"}, dict(agregados), upsert=True)
+
+    def aplicar_agregados(self, incrementos):
+        """Soma os deltas de uma sincronização ao documento de agregados."""
+        if incrementos:
+            self.dados_gerais_collection.update_one({"_id": "agregados"}, {"$inc": incrementos}, upsert=True)
+
+    # -------------------- Partições da busca --------------------
+    def carregar_particoes(self):
+        return self.dados_gerais_collection.find_one({"_id": "particoes"}, {"_id": 0}) or {}
+
+    def salvar_particoes(self, estados):
+        """Atualiza o estado das partições informadas, mantendo o das demais."""
+        if estados:
+            self.dados_gerais_collection.update_one({"_id": "particoes"}, {"$set": estados}, upsert=True)
+
+    # -------------------- Lotes --------------------
+    def save(self, data):
+        """Grava (upsert) todos os lotes informados."""
+        self.marcar_atualizacao()
+
+        add_fingerprints(data, IGNORE_FIELDS)
+        with self.writer(on_batch=print_batch) as writer:
+            for item in data:
+                item[BUSCA_FIELD] = texto_do_lote(item)
+                writer.update({"id": item["id"]}, {"$set": item}, upsert=True)
+
+        return writer.totals()
+
+    def load(self, projecao=None):
+        """Carrega os dados gerais e todos os lotes."""
+        return {
+            "dados_gerais": self.load_dados_gerais(),
+            "lotes": list(self.iter_lotes(projecao))
+        }
+
+    def iter_lotes(self, projecao=None):
+        """Percorre os lotes sem carregar a collection inteira de uma vez."""
+        return self.lotes_collection.find({}, projecao)
+
+    def indice_hashes(self):
+        """Índice compacto id -> hash de conteúdo de todos os lotes salvos."""
+        cursor = self.lotes_collection.find({}, {"_id": 0, "id": 1, FINGERPRINT_FIELD: 1})
+        return {doc["id"]: doc.get(FINGERPRINT_FIELD) for doc in cursor}
+
+    def carregar_docs(self, ids):
+        """Documentos completos dos ids informados, indexados por id."""
+        return {doc["id"]: doc for doc in self.lotes_collection.find({"id": {"$in": list(ids)}})}
+
+    def writer(self, on_batch=None):
+        return BulkWriter(self.lotes_collection, on_batch=on_batch)
+
+    def total_lotes(self):
+        return self.lotes_collection.estimated_document_count()
+
+    # -------------------- Reconciliação --------------------
+    def ids_no_escopo(self, filtros):
+        """Ids dos lotes presentes que atendem aos filtros e foram buscados nos `tipos_bem` do escopo."""
+        filtros = dict(filtros)
+        tipos_bem = filtros.pop("tipos_bem")
+        filtro = {**montar_filtro(**filtros), **filtro_tipos_bem(tipos_bem)}
+        return (doc["id"] for doc in self.lotes_collection.find(filtro, {"_id": 0, "id": 1}))
+
+    def ids_ausentes(self):
+        cursor = self.lotes_collection.find({AUSENTE_FIELD: {"$exists": True}}, {"_id": 0, "id": 1})
+        return (doc["id"] for doc in cursor)
+
+    def marcar_ausentes(self, ids, quando):
+        if ids:
+            self.lotes_collection.update_many({"id": {"$in": list(ids)}}, {"$set": {AUSENTE_FIELD: quando}})
+
+    def limpar_ausentes(self, ids):
+        if ids:
+            self.lotes_collection.update_many({"id": {"$in": list(ids)}}, {"$unset": {AUSENTE_FIELD: ""}})
+
+    def arquivar_ausentes(self, limite):
+        """Move para 'lotes_arquivados' os lotes ausentes desde `limite` (ou antes) e os devolve."""
+        arquivados = list(self.lotes_collection.find({AUSENTE_FIELD: {"$lte": limite}}, {"_id": 0}))
+        if not arquivados:
+            return []
+        arquivado_em = agora_formatado()
+        self.arquivados_collection.bulk_write(
+            [ReplaceOne({"id": doc["id"]}, {**doc, "arquivado_em": arquivado_em}, upsert=True) for doc in arquivados],
+            ordered=False,
+        )
+        # Só sai da collection principal depois de copiado: uma falha no meio não perde o lote
+        self.lotes_collection.delete_many({"id": {"$in": [doc["id"] for doc in arquivados]}})
+        return arquivados
+
+    # -------------------- Change-log --------------------
+    def ids_com_historico_embutido(self):
+        """Ids dos lotes que ainda guardam o `historico_alteracoes` (não migrados)."""
+        cursor = self.lotes_collection.find({"historico_alteracoes": {"$exists": True}}, {"_id": 0, "id": 1})
+        return (doc["id"] for doc in cursor)
+
+    def registrar_alteracoes(self, eventos):
+        """Acrescenta eventos ao change-log; os registros existentes nunca são reescritos."""
+        if eventos:
+            self.alteracoes_collection.insert_many([dict(evento) for evento in eventos], ordered=False)
+
+    def carregar_historico(self, ids):
+        return carregar_historico(self.alteracoes_collection, ids)
+
+    # -------------------- Assinaturas --------------------
+    def listar_assinaturas(self, somente_ativas=True):
+        filtro = {"ativa": True} if somente_ativas else {}
+        return list(self.assinaturas_collection.find(filtro, {"_id": 0}))
+
+    def salvar_assinatura(self, assinatura):
+        self.assinaturas_collection.replace_one({"id": assinatura["id"]}, dict(assinatura), upsert=True)
+
+    def remover_assinatura(self, assinatura_id):
+        return self.assinaturas_collection.delete_one({"id": assinatura_id}).deleted_count > 0
+
+    # -------------------- Consulta da listagem --------------------
+    def ensure_indexes(self):
+        ensure_indexes(self.lotes_collection)
+        ensure_indexes(self.alteracoes_collection, INDICES_ALTERACOES)
+        ensure_indexes(self.assinaturas_collection, INDICES_ASSINATURAS)
+        ensure_indexes(self.arquivados_collection, INDICES_ARQUIVADOS)
+        self.preencher_texto_busca()
+
+    def preencher_texto_busca(self):
+        """Grava o texto de busca nos lotes salvos antes de ele existir (uma vez por processo)."""
+        if self.lotes_collection.full_name in _texto_busca_preenchido:
+            return
+        cursor = self.lotes_collection.find(
+            {BUSCA_FIELD: {"$exists": False}}, {"_id": 0, "id": 1, "bensALeiloar.descricao": 1}
+        )
+        with self.writer(on_batch=print_batch) as writer:
+            for lote in cursor:
+                writer.update({"id": lote["id"]}, {"$set": {BUSCA_FIELD: texto_do_lote(lote)}})
+        _texto_busca_preenchido.add(self.lotes_collection.full_name)
+
+    def contar_lotes(self, filtros):
+        return contar_lotes(self.lotes_collection, montar_filtro(**filtros))
+
+    def buscar_pagina(self, filtros, selected_sort, page_size=None, current_page=1):
+        return buscar_pagina(self.lotes_collection, montar_filtro(**filtros), selected_sort, page_size, current_page)
+
+    def iter_filtrados(self, filtros, selected_sort, projecao=None):
+        return iter_filtrados(self.lotes_collection, montar_filtro(**filtros), selected_sort, projecao)
+
+    # -------------------- Trava de sincronização --------------------
+    def adquirir_trava(self, nome, dono, agora, expira_em):
+        try:
+            self.dados_gerais_collection.find_one_and_update(
+                {"_id": nome, "expira_em": {"$lt": agora}},
+                {"$set": {"dono": dono, "adquirido_em": agora, "expira_em": expira_em}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # O documento existe e a trava ainda é válida
+            return False
+        return True
+
+    def liberar_trava(self, nome, dono):
+        self.dados_gerais_collection.delete_one({"_id": nome, "dono": dono})
+
+
+mongo_storage = MongoStorage()
+
+
+def marcar_atualizacao():
+    """Registra a data da última atualização em 'dados_gerais' e a devolve."""
+    return mongo_storage.marcar_atualizacao()
+
+
+def load_dados_gerais():
+    return mongo_storage.load_dados_gerais()
+
+
+def save_to_mongo(data):
+    return mongo_storage.save(data)
+
+
+def load_from_mongo(projecao=None):
+    """Carrega dados das collections 'dados_gerais' e 'lotes' do MongoDB."""
+    return mongo_storage.load(projecao)
@@ -0,0 +1,323 @@
+"""Detecção de alterações entre os lotes salvos e os lotes vindos da API."""
+import difflib
+import hashlib
+from datetime import datetime
+
+from leiloes.config import fuso_horario_brasil
+
+# Campo com a impressão digital do conteúdo de cada lote
+FINGERPRINT_FIELD = "hash_conteudo"
+
+# Campos que identificam os elementos de uma lista (ex.: o id de cada bem)
+LIST_KEYS = ("id",)
+
+# Data da alteração mais recente do lote, usada na ordenação da listagem
+LAST_CHANGE_FIELD = "ultima_alteracao"
+
+# Quando o lote deixou de aparecer na API (marca da reconciliação)
+AUSENTE_FIELD = "ausente_desde"
+
+# Tipo de bem da partição em que o lote foi buscado (escopo da reconciliação)
+TIPO_BEM_FIELD = "tipo_bem"
+
+# Descrições dos bens normalizadas (sem acentos, em minúsculas), onde a busca
+# por endereço é feita no banco, com o mesmo resultado do índice em memória
+BUSCA_FIELD = "texto_busca"
+
+# Hash estrutural de cada campo composto (dict ou lista) do lote, gravado com
+# ele para que a próxima comparação pule os campos iguais sem percorrê-los
+HASHES_FIELD = "hash_campos"
+
+# Campos que não representam alteração do leilão em si
+IGNORE_FIELDS = [
+    "_id", "data_atualizacao_api", "historico_alteracoes", FINGERPRINT_FIELD, LAST_CHANGE_FIELD, AUSENTE_FIELD,
+    HASHES_FIELD, TIPO_BEM_FIELD, BUSCA_FIELD,
+]
+
+
+def _hashes(item, ignore_fields):
+    """Hash do lote e de cada um dos seus campos compostos, numa única passada.
+
+    O hash do lote é o hash estrutural do dict, que combina os hashes dos
+    campos compostos com os valores simples; os dos campos compostos saem
+    do cache do comparador, sem percorrê-los de novo.
+    """
+    comparador = _Comparador(set(ignore_fields or ()) | {FINGERPRINT_FIELD, HASHES_FIELD})
+    conteudo = comparador.hash(item).hex()
+    campos = {
+        chave: comparador.hash(valor).hex()
+        for chave, valor in item.items()
+        if isinstance(valor, (dict, list)) and chave not in comparador.ignore_fields
+    }
+    return conteudo, campos
+
+
+def fingerprint(item, ignore_fields=None):
+    """Hash estrutural do lote, desconsiderando os campos ignorados em qualquer nível."""
+    return _hashes(item, ignore_fields)[0]
+
+
+def hashes_campos(item, ignore_fields=None):
+    """Hash estrutural (hex) de cada campo composto do lote, como o compare_dicts os calcula."""
+    return _hashes(item, ignore_fields)[1]
+
+
+def add_fingerprints(items, ignore_fields=None):
+    """Grava em cada lote vindo da API o hash do conteúdo e os hashes dos campos."""
+    for item in items:
+        item[FINGERPRINT_FIELD], item[HASHES_FIELD] = _hashes(item, ignore_fields)
+    return items
+
+
+class _Comparador:
+    """Diff estrutural que só desce nos ramos que mudaram.
+
+    Os campos compostos cujos hashes gravados (HASHES_FIELD) coincidem nos
+    dois registros são pulados em O(1); os hashes vêm do add_fingerprints e
+    ficam no documento entre uma sincronização e outra. As demais subárvores
+    iguais são descartadas pela comparação nativa (em C, sem recursão em
+    Python). Nas listas sem chave, o hash de cada elemento é calculado uma
+    única vez por comparação (e guardado por id do objeto) e alimenta o diff
+    de sequência.
+    """
+
+    def __init__(self, ignore_fields):
+        self.ignore_fields = set(ignore_fields or ())
+        self._hashes = {}
+        # Mantém os objetos vivos enquanto seus ids servem de chave do cache
+        self._objetos = []
+
+    def hash(self, valor):
+        if not isinstance(valor, (dict, list)):
+            return _dumps_escalar(valor)
+
+        cached = self._hashes.get(id(valor))
+        if cached is not None:
+            return cached
+
+        if isinstance(valor, dict):
+            h = hashlib.blake2b(b"d", digest_size=16)
+            for chave in sorted(valor, key=str):
+                if chave in self.ignore_fields:
+                    continue
+                h.update(str(chave).encode("utf-8") + b"\x00")
+                h.update(self.hash(valor[chave]) + b"\x01")
+        else:
+            h = hashlib.blake2b(b"l", digest_size=16)
+            for item in valor:
+                h.update(self.hash(item) + b"\x01")
+
+        digest = h.digest()
+        self._hashes[id(valor)] = digest
+        self._objetos.append(valor)
+        return digest
+
+    def dicts(self, dict1, dict2):
+        changes = {}
+        iguais = _campos_iguais(dict1, dict2)
+        for key in dict1:
+            if key not in self.ignore_fields and key not in iguais:
+                self.valor(changes, key, dict1[key], dict2.get(key, None))
+
+        # Campos que só existem no registro novo
+        for key in dict2:
+            if key not in dict1 and key not in self.ignore_fields:
+                self.valor(changes, key, None, dict2[key])
+        return changes
+
+    def valor(self, changes, key, value1, value2):
+        """Registra em `changes[key]` a diferença entre dois valores, se houver."""
+        if value1 is value2 or value1 == value2:
+            return
+        if isinstance(value1, dict) and isinstance(value2, dict):
+            nested_changes = self.dicts(value1, value2)
+            if nested_changes:
+                changes[key] = nested_changes
+        elif isinstance(value1, list) and isinstance(value2, list):
+            self.listas(changes, key, value1, value2)
+        else:
+            changes[key] = {"old": value1, "new": value2}
+
+    def listas(self, changes, key, lista1, lista2):
+        """Compara listas pela chave dos elementos ou, sem ela, como sequência.
+
+        Cada elemento alterado vira um registro próprio, com o caminho
+        `campo[id=...]`. Na comparação por sequência, um elemento alterado
+        fica em `campo[posição]` (na lista nova), um removido em
+        `campo[-posição]` (na lista antiga) e um incluído em `campo[+posição]`
+        (na lista nova), para que nenhum registro sobrescreva outro.
+        Elementos incluídos têm old None e os removidos, new None.
+        """
+        chave_lista = self._chave_lista(lista1, lista2)
+        if chave_lista:
+            antigos = {item[chave_lista]: item for item in lista1}
+            for item in lista2:
+                caminho = f"{key}[{chave_lista}={item[chave_lista]}]"
+                self.valor(changes, caminho, antigos.pop(item[chave_lista], None), item)
+            for chave_item, item in antigos.items():
+                changes[f"{key}[{chave_lista}={chave_item}]"] = {"old": item, "new": None}
+            return
+
+        hashes1 = [self.hash(item) for item in lista1]
+        hashes2 = [self.hash(item) for item in lista2]
+        matcher = difflib.SequenceMatcher(None, hashes1, hashes2, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            pares = min(i2 - i1, j2 - j1)
+            for k in range(pares):
+                self.valor(changes, f"{key}[{j1 + k}]", lista1[i1 + k], lista2[j1 + k])
+            for i in range(i1 + pares, i2):
+                changes[f"{key}[-{i}]"] = {"old": lista1[i], "new": None}
+            for j in range(j1 + pares, j2):
+                changes[f"{key}[+{j}]"] = {"old": None, "new": lista2[j]}
+
+    @staticmethod
+    def _chave_lista(lista1, lista2):
+        """Campo que identifica os elementos das duas listas, se todos forem dicts com ele único."""
+        for chave in LIST_KEYS:
+            for lista in (lista1, lista2):
+                if not all(isinstance(item, dict) and item.get(chave) is not None for item in lista):
+                    break
+                if len({item[chave] for item in lista}) != len(lista):
+                    break
+            else:
+                return chave
+        return None
+
+
+def _campos_iguais(dict1, dict2):
+    """Campos com o mesmo hash gravado nos dois registros (vazio se algum não tiver os hashes)."""
+    hashes1, hashes2 = dict1.get(HASHES_FIELD), dict2.get(HASHES_FIELD)
+    if not isinstance(hashes1, dict) or not isinstance(hashes2, dict):
+        return ()
+    return {chave for chave, valor in hashes1.items() if hashes2.get(chave) == valor}
+
+
+def _dumps_escalar(valor):
+    # repr distingue tipos ("1" e 1) e é bem mais barato que serializar em JSON
+    return repr(valor).encode("utf-8", "backslashreplace")
+
+
+def compare_dicts(dict1, dict2, ignore_fields=None):
+    """Diferenças entre dois registros como um dict aninhado de {"old", "new"}.
+
+    Subárvores iguais (pelos hashes gravados ou pela comparação nativa) são
+    puladas sem percorrê-las; listas de dicts com `id` são pareadas pelo id
+    (reordenar os bens não gera alteração) e as demais por um diff de
+    sequência, inclusive listas de valores simples.
+    """
+    return _Comparador(ignore_fields).dicts(dict1, dict2)
+
+
+def _folhas(changes, prefixo=""):
+    for campo, valores in changes.items():
+        if not isinstance(valores, dict):
+            continue
+        if "old" in valores and "new" in valores:
+            yield f"{prefixo}{campo}", valores["old"], valores["new"]
+        else:
+            yield from _folhas(valores, f"{prefixo}{campo}.")
+
+
+def registros_alteracoes(changes):
+    """Alterações do compare_dicts como a lista gravada no change-log.
+
+    Cada registro é {"caminho", "old", "new"}, com o caminho do campo alterado
+    (ex.: "processo.orgaoJulgador.nome" ou "bensALeiloar[id=7].valor") como
+    valor, e não como chave, para que possa ser consultado e indexado.
+    """
+    return [{"caminho": caminho, "old": old, "new": new} for caminho, old, new in _folhas(changes)]
+
+
+def linhas_alteracoes(alteracoes):
+    """Linhas (caminho, antigo, novo) de uma alteração gravada.
+
+    Aceita a lista de registros e o dict aninhado das alterações gravadas
+    antes dela (histórico embutido ou eventos antigos do change-log).
+    """
+    if isinstance(alteracoes, dict):
+        return list(_folhas(alteracoes))
+    return [(registro["caminho"], registro.get("old"), registro.get("new")) for registro in alteracoes or []]
+
+
+def check_for_changes(existing, new, ignore_fields=None, hashes_desatualizados=None, eventos=None):
+    """Compara os lotes existentes com os novos usando um índice por id.
+
+    Lotes cujo hash de conteúdo não mudou são descartados sem passar pelo
+    compare_dicts. Quando `hashes_desatualizados` é informado, recebe as tuplas
+    (id, hash, hashes dos campos) dos lotes sem alteração cujo hash salvo está
+    ausente ou desatualizado, para que possam ser gravados e pulados na
+    próxima vez.
+
+    Cada lote alterado recebe `ultima_alteracao`. Quando `eventos` é informado,
+    a alteração é acrescentada a essa lista como um evento do change-log
+    ({lote_id, dataAlteracao, alteracoes}, com os registros de
+    `registros_alteracoes`); sem ela, o evento é embutido em
+    `historico_alteracoes`, como no formato antigo.
+    """
+    if ignore_fields is None:
+        ignore_fields = []
+
+    changes = []
+    unset_data = {}
+
+    # Índice id -> registro, montado uma única vez
+    new_by_id = {}
+    for item in new:
+        new_by_id.setdefault(item['id'], item)
+
+    for existing_item in existing:
+        matching_item = new_by_id.get(existing_item['id'])
+        if not matching_item:
+            continue
+
+        new_hash = matching_item.get(FINGERPRINT_FIELD) or fingerprint(matching_item, ignore_fields)
+        stored_hash = existing_item.get(FINGERPRINT_FIELD)
+        if stored_hash == new_hash:
+            continue
+
+        item_changes = compare_dicts(existing_item, matching_item, ignore_fields)  # Verifica se houve mudança
+        if not item_changes:
+            if hashes_desatualizados is not None:
+                hashes = matching_item.get(HASHES_FIELD) or hashes_campos(matching_item, ignore_fields)
+                hashes_desatualizados.append((existing_item['id'], new_hash, hashes))
+            continue
+
+        # Cria uma cópia do matching_item para evitar alteração no original
+        updated_item = matching_item.copy()
+        updated_item[FINGERPRINT_FIELD] = new_hash
+
+        data_alteracao = datetime.now(fuso_horario_brasil).isoformat()
+        updated_item[LAST_CHANGE_FIELD] = data_alteracao
+        registros = registros_alteracoes(item_changes)
+
+        if eventos is not None:
+            eventos.append({
+                'lote_id': existing_item['id'],
+                'dataAlteracao': data_alteracao,
+                'alteracoes': registros
+            })
+        else:
+            # Verifica se o existing_item já possui historico_alteracoes
+            if 'historico_alteracoes' in existing_item:
+                updated_item['historico_alteracoes'] = existing_item['historico_alteracoes']
+            else:
+                updated_item['historico_alteracoes'] = []
+
+            # Adiciona as mudanças no histórico
+            updated_item['historico_alteracoes'].append({
+                'dataAlteracao': data_alteracao,
+                'alteracoes': registros
+            })
+
+        # Identifica os campos removidos
+        for key in existing_item:
+            if key not in matching_item and key not in ignore_fields:
+                unset_data[key] = ""  # Marca o campo para remoção
+
+        # Adiciona o item atualizado ao resultado
+        changes.append(updated_item)
+
+    # Retorna tanto as alterações quanto os itens removidos
+    return changes, unset_data
@@ -0,0 +1,159 @@
+"""Exportação dos lotes filtrados em CSV e Parquet, gerada em blocos.
+
+Os documentos são achatados em colunas fixas (os caminhos de origem, como
+"processo.numeroProcessoFormatado"), com uma linha por lote ou uma por bem.
+Os lotes são lidos de um iterador e escritos de `EXPORTACAO_BLOCO` em
+`EXPORTACAO_BLOCO` linhas, então a memória não cresce com o tamanho da base.
+Na interface o Streamlit precisa do arquivo inteiro em bytes: ele é gerado
+em um arquivo temporário em disco e só o resultado final vai para a memória.
+"""
+import csv
+import io
+import tempfile
+from itertools import islice
+
+from leiloes.config import EXPORTACAO_BLOCO
+from leiloes.metricas import metricas
+
+FORMATOS = ("csv", "parquet")
+
+TIPOS_MIME = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+COLUNAS_LOTE = [
+    "id",
+    "status",
+    "tipoDeLeilao",
+    "primeiraHasta",
+    "segundaHasta",
+    "valorTotalBens",
+    "justificativaCancelamentoSuspensao",
+    "ultima_alteracao",
+    "processo.numeroProcessoFormatado",
+    "processo.dataCriacao",
+    "processo.poloAtivo",
+    "processo.poloPassivo",
+    "processo.orgaoJulgador.nome",
+    "leiloeiro.localRealizacao",
+]
+COLUNAS_BEM = ["bensALeiloar.id", "bensALeiloar.descricao", "bensALeiloar.valor"]
+COLUNAS_RESUMO_BENS = ["bensALeiloar.quantidade", "bensALeiloar.descricao"]
+
+# Colunas numéricas no Parquet; as demais são texto. Os ids ficam como texto
+# porque a API também devolve ids não inteiros, e o schema vale para o arquivo todo
+TIPOS_PARQUET = {
+    "valorTotalBens": "float64",
+    "bensALeiloar.valor": "float64",
+    "bensALeiloar.quantidade": "int64",
+}
+
+# Só os campos exportados são lidos do armazenamento
+PROJECAO_EXPORTACAO = {"_id": 0, **{coluna: 1 for coluna in COLUNAS_LOTE}, "bensALeiloar": 1}
+
+SEPARADOR_BENS = " | "
+
+
+def colunas(por_bem=False):
+    return COLUNAS_LOTE + (COLUNAS_BEM if por_bem else COLUNAS_RESUMO_BENS)
+
+
+def _valor(doc, caminho):
+    for parte in caminho.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(parte)
+    return doc
+
+
+def linhas(lotes, por_bem=False):
+    """Linhas (tuplas na ordem de `colunas`) dos lotes achatados."""
+    for lote in lotes:
+        base = tuple(_valor(lote, coluna) for coluna in COLUNAS_LOTE)
+        bens = lote.get("bensALeiloar") or []
+        if por_bem:
+            # Um lote sem bens ainda sai, com as colunas do bem vazias
+            for bem in bens or [{}]:
+                yield base + (bem.get("id"), bem.get("descricao"), bem.get("valor"))
+        else:
+            descricoes = SEPARADOR_BENS.join(bem.get("descricao") or "" for bem in bens)
+            yield base + (len(bens), descricoes)
+
+
+def _blocos(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def gerar_csv(lotes, por_bem=False, tamanho_bloco=EXPORTACAO_BLOCO):
+    """Gera o CSV em pedaços de bytes, um por bloco de linhas (UTF-8 com BOM, para o Excel)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(colunas(por_bem))
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    for bloco in _blocos(linhas(lotes, por_bem), tamanho_bloco):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(bloco)
+        metricas.contar("linhas_exportadas", len(bloco))
+        yield buffer.getvalue().encode("utf-8")
+
+
+def escrever_csv(lotes, destino, por_bem=False, tamanho_bloco=EXPORTACAO_BLOCO):
+    """Escreve o CSV em um arquivo binário aberto."""
+    for pedaco in gerar_csv(lotes, por_bem, tamanho_bloco):
+        destino.write(pedaco)
+
+
+def escrever_parquet(lotes, destino, por_bem=False, tamanho_bloco=EXPORTACAO_BLOCO):
+    """Escreve o Parquet em um caminho ou arquivo binário, um row group por bloco de linhas."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    nomes = colunas(por_bem)
+    schema = pa.schema([(nome, TIPOS_PARQUET.get(nome, "string")) for nome in nomes])
+    texto = [campo.type == pa.string() for campo in schema]
+
+    with pq.ParquetWriter(destino, schema, compression="zstd") as writer:
+        for bloco in _blocos(linhas(lotes, por_bem), tamanho_bloco):
+            arrays = []
+            for valores, campo, e_texto in zip(zip(*bloco), schema, texto):
+                if e_texto:
+                    valores = [None if valor is None else str(valor) for valor in valores]
+                arrays.append(pa.array(valores, type=campo.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            metricas.contar("linhas_exportadas", len(bloco))
+
+
+def exportar(lotes, formato, destino, por_bem=False, tamanho_bloco=EXPORTACAO_BLOCO):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato!r} (use {', '.join(FORMATOS)})")
+    with metricas.span(f"exportacao.{formato}"):
+        if formato == "csv":
+            escrever_csv(lotes, destino, por_bem, tamanho_bloco)
+        else:
+            escrever_parquet(lotes, destino, por_bem, tamanho_bloco)
+
+
+def conteudo_exportado(lotes, formato, por_bem=False):
+    """Bytes do arquivo exportado, gerado em um arquivo temporário em disco."""
+    with tempfile.TemporaryFile() as arquivo:
+        exportar(lotes, formato, arquivo, por_bem)
+        arquivo.seek(0)
+        return arquivo.read()
+
+
+def iter_lotes_por_ids(storage, ids, tamanho_bloco=EXPORTACAO_BLOCO):
+    """Documentos completos dos ids informados, na mesma ordem, lidos em blocos."""
+    for inicio in range(0, len(ids), tamanho_bloco):
+        bloco = ids[inicio:inicio + tamanho_bloco]
+        docs = storage.carregar_docs(bloco)
+        for lote_id in bloco:
+            if lote_id in docs:
+                yield docs[lote_id]
@@ -0,0 +1,276 @@
+"""Busca paginada e concorrente da API do Leilojus."""
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from leiloes.config import (
+    API_URL,
+    DEFAULT_PARAMS,
+    FETCH_BACKOFF,
+    FETCH_MAX_RETRIES,
+    FETCH_MAX_WORKERS,
+    FETCH_RATE_LIMIT,
+    FETCH_TIMEOUT,
+    HTTP_CACHE_MODO,
+)
+from leiloes.cache_http import criar_cache_http, hash_conteudo
+from leiloes.diff import FINGERPRINT_FIELD, IGNORE_FIELDS, add_fingerprints
+from leiloes.metricas import contexto_atual, metricas
+
+# Respostas que valem uma nova tentativa (limite de taxa e falhas do servidor)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """Falha definitiva ao buscar uma página da API."""
+
+    def __init__(self, page, cause):
+        super().__init__(f"página {page}: {cause}")
+        self.page = page
+        self.cause = cause
+
+
+class RateLimiter:
+    """Espaça as requisições de todas as threads para respeitar um limite por segundo."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PaginaCacheada:
+    """Página igual à última resposta guardada no cache HTTP.
+
+    Traz os pares (id, hash) dos registros, gravados junto com a resposta,
+    para que a sincronização decida sem decodificar o JSON; os registros
+    só são lidos do disco se alguém percorrer a página.
+    """
+
+    def __init__(self, registros, carregar):
+        self.registros = registros
+        self._carregar = carregar
+        self._dados = None
+
+    def dados(self):
+        if self._dados is None:
+            self._dados = self._carregar()
+        return self._dados
+
+    def __len__(self):
+        return len(self.registros)
+
+    def __iter__(self):
+        return iter(self.dados())
+
+    def __getitem__(self, indice):
+        return self.dados()[indice]
+
+
+def criar_sessao(pool_size=FETCH_MAX_WORKERS):
+    """Cria uma sessão HTTP com pool de conexões dimensionado para as threads de busca."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PageFetcher:
+    """Busca páginas da API reaproveitando conexões, com retentativas e limite de taxa.
+
+    No máximo `max_workers` requisições ficam em andamento ao mesmo tempo,
+    mesmo com várias buscas (partições) usando o mesmo fetcher.
+    """
+
+    def __init__(
+        self,
+        max_workers=FETCH_MAX_WORKERS,
+        max_retries=FETCH_MAX_RETRIES,
+        backoff=FETCH_BACKOFF,
+        rate_limit=FETCH_RATE_LIMIT,
+        timeout=FETCH_TIMEOUT,
+        session=None,
+        api_url=API_URL,
+        cache=None,
+        replay=False,
+    ):
+        self.max_workers = max(int(max_workers), 1)
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.api_url = api_url
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.session = session or criar_sessao(self.max_workers)
+        self._vagas = threading.BoundedSemaphore(self.max_workers)
+        self.cache = cache
+        self.replay = replay
+        if replay and cache is None:
+            raise ValueError("O modo replay precisa de um cache HTTP.")
+
+    def build_params(self, page, additional_params=None):
+        params = DEFAULT_PARAMS.copy()
+        if additional_params:
+            params.update(additional_params)
+        params["page"] = page
+        return params
+
+    def fetch_page(self, page, additional_params=None):
+        """Busca uma página, passando pelo cache HTTP quando ele está configurado.
+
+        Sem cache devolve a lista de registros. Com cache, uma resposta ainda
+        dentro do TTL, confirmada pela API (304) ou com o corpo idêntico ao
+        guardado volta como PaginaCacheada; só respostas novas são decodificadas.
+        """
+        params = self.build_params(page, additional_params)
+        if self.cache is None:
+            return self._decodificar(self._requisitar(page, params))
+
+        chave = self.cache.chave(self.api_url, params)
+        entrada = self.cache.consultar(chave)
+        if self.replay:
+            if entrada is None:
+                metricas.contar("falhas_busca")
+                raise FetchError(page, "página não gravada no cache HTTP (modo replay)")
+            return self._pagina_cacheada(page, params, entrada, "cache_http_replay")
+        if entrada is not None and self.cache.fresca(entrada):
+            return self._pagina_cacheada(page, params, entrada, "cache_http_frescas")
+
+        response = self._requisitar(page, params, self.cache.cabecalhos_condicionais(entrada))
+        if entrada is not None:
+            if response.status_code == 304:
+                revalidada = self.cache.revalidar(entrada, response.headers)
+                if revalidada is not None:
+                    return self._pagina_cacheada(page, params, revalidada, "cache_http_304")
+                # O corpo foi descartado do cache depois da consulta; o 304 não traz outro
+                metricas.contar("cache_http_descartadas")
+                response = self._requisitar(page, params)
+            elif hash_conteudo(response.content) == entrada["conteudo"]:
+                revalidada = self.cache.revalidar(entrada, response.headers)
+                if revalidada is not None:
+                    return self._pagina_cacheada(page, params, revalidada, "cache_http_iguais")
+                metricas.contar("cache_http_descartadas")
+
+        return self._gravar_resposta(chave, params, response, self._decodificar(response))
+
+    def _gravar_resposta(self, chave, params, response, leiloes_data):
+        # Os hashes calculados aqui são reaproveitados pela sincronização
+        add_fingerprints(leiloes_data or [], IGNORE_FIELDS)
+        registros = [[leilao["id"], leilao[FINGERPRINT_FIELD]] for leilao in leiloes_data or []]
+        self.cache.gravar(chave, self.api_url, params, response.content, response.headers, registros)
+        return leiloes_data
+
+    def _pagina_cacheada(self, page, params, entrada, contador):
+        metricas.contar(contador)
+        metricas.contar("registros", len(entrada["registros"]))
+        return PaginaCacheada(entrada["registros"], lambda: self._ler_cacheada(page, params, entrada))
+
+    def _ler_cacheada(self, page, params, entrada):
+        """Registros da página guardada; se o corpo já saiu do cache, busca de novo na API."""
+        corpo = self.cache.ler(entrada)
+        if corpo is not None:
+            return json.loads(corpo)
+        metricas.contar("cache_http_descartadas")
+        if self.replay:
+            metricas.contar("falhas_busca")
+            raise FetchError(page, "página descartada do cache HTTP (modo replay)")
+        response = self._requisitar(page, params)
+        return self._gravar_resposta(entrada["chave"], params, response, response.json())
+
+    def _decodificar(self, response):
+        leiloes_data = response.json()
+        metricas.contar("registros", len(leiloes_data or []))
+        return leiloes_data
+
+    def _requisitar(self, page, params, headers=None):
+        """Faz a requisição, tentando novamente com backoff exponencial em falhas transitórias."""
+        for tentativa in range(self.max_retries + 1):
+            with metricas.span("fetch.limite_taxa"):
+                self.rate_limiter.wait()
+            try:
+                with self._vagas, metricas.span("fetch.pagina"):
+                    response = self.session.get(self.api_url, params=params, headers=headers, timeout=self.timeout)
+                    response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                status = getattr(e.response, "status_code", None)
+                transitoria = status is None or status in RETRY_STATUS
+                if not transitoria or tentativa == self.max_retries:
+                    metricas.contar("falhas_busca")
+                    raise FetchError(page, e) from e
+                metricas.contar("retentativas")
+                time.sleep(self.backoff * (2 ** tentativa))
+            else:
+                metricas.contar("paginas")
+                metricas.contar("bytes_recebidos", len(response.content))
+                return response
+
+    def iter_pages(self, additional_params=None, on_error=None):
+        """Gera as páginas em ordem, mantendo até `max_workers` requisições em andamento.
+
+        A API não informa o total de páginas, então a busca avança numa janela
+        deslizante e para na primeira página vazia. Uma falha definitiva encerra
+        a busca (como o laço sequencial fazia) e é repassada para `on_error`.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pendentes = deque()
+            proxima = 0
+            # Cada página roda no contexto de quem iniciou a busca, para que os
+            # spans das threads entrem na mesma execução das métricas
+            for _ in range(self.max_workers):
+                pendentes.append(executor.submit(contexto_atual().run, self.fetch_page, proxima, additional_params))
+                proxima += 1
+
+            try:
+                while pendentes:
+                    try:
+                        leiloes_data = pendentes.popleft().result()
+                    except FetchError as e:
+                        if on_error:
+                            on_error(e)
+                        break
+
+                    if not leiloes_data:
+                        break
+
+                    yield leiloes_data
+                    pendentes.append(executor.submit(contexto_atual().run, self.fetch_page, proxima, additional_params))
+                    proxima += 1
+            finally:
+                # Descarta as páginas além do fim que ainda não começaram
+                for future in pendentes:
+                    future.cancel()
+
+    def fetch_all(self, additional_params=None, on_error=None):
+        """Busca todas as páginas e devolve os registros na mesma ordem da busca sequencial."""
+        all_leiloes = []
+        for leiloes_data in self.iter_pages(additional_params, on_error):
+            all_leiloes.extend(leiloes_data)
+        return all_leiloes
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Devolve o PageFetcher compartilhado pelo processo (e seu pool de conexões)."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = PageFetcher(cache=criar_cache_http(), replay=HTTP_CACHE_MODO == "replay")
+        return _fetcher
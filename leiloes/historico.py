@@ -0,0 +1,94 @@
+"""Migração do histórico embutido nos lotes para o change-log de alterações."""
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+
+from leiloes.bulk import print_batch
+from leiloes.config import BULK_BATCH_SIZE
+from leiloes.diff import LAST_CHANGE_FIELD, linhas_alteracoes
+from leiloes.storage import get_storage
+
+# Armazenamentos (por id) já migrados neste processo
+_migrados = set()
+
+
+def eventos_do_historico(lote):
+    """Converte o `historico_alteracoes` embutido de um lote em eventos do change-log."""
+    return [
+        {
+            "lote_id": lote["id"],
+            "dataAlteracao": alteracao["dataAlteracao"],
+            "alteracoes": [
+                {"caminho": caminho, "old": old, "new": new}
+                for caminho, old, new in linhas_alteracoes(alteracao.get("alteracoes"))
+            ],
+        }
+        for alteracao in lote.get("historico_alteracoes") or []
+        if alteracao.get("dataAlteracao")
+    ]
+
+
+def migrar_historico(storage=None, tamanho_bloco=BULK_BATCH_SIZE):
+    """Move o histórico embutido de todos os lotes para o change-log.
+
+    Os lotes são lidos em blocos; para cada bloco os eventos são gravados no
+    change-log e, em seguida, o `historico_alteracoes` é removido do lote e a
+    data mais recente vai para `ultima_alteracao`. Lotes já migrados não têm
+    mais o campo e são ignorados, então a rotina pode ser executada de novo.
+    Devolve (lotes migrados, eventos gravados).
+    """
+    storage = storage or get_storage()
+    ids = list(storage.ids_com_historico_embutido())
+    lotes_migrados = eventos_gravados = 0
+
+    for inicio in range(0, len(ids), tamanho_bloco):
+        docs = storage.carregar_docs(ids[inicio:inicio + tamanho_bloco])
+        eventos = []
+        with storage.writer(on_batch=print_batch) as writer:
+            for lote in docs.values():
+                if "historico_alteracoes" not in lote:
+                    continue
+
+                eventos_lote = eventos_do_historico(lote)
+                datas = [evento["dataAlteracao"] for evento in eventos_lote]
+                if lote.get(LAST_CHANGE_FIELD):
+                    datas.append(lote[LAST_CHANGE_FIELD])
+
+                update_query = {"$unset": {"historico_alteracoes": ""}}
+                if datas:
+                    update_query["$set"] = {LAST_CHANGE_FIELD: max(datas)}
+                writer.update({"id": lote["id"]}, update_query)
+
+                eventos.extend(eventos_lote)
+                lotes_migrados += 1
+
+            # Os eventos entram antes de o histórico ser removido dos lotes
+            storage.registrar_alteracoes(eventos)
+            eventos_gravados += len(eventos)
+
+    return lotes_migrados, eventos_gravados
+
+
+def migrar_historico_pendente(storage=None, validade_min=30):
+    """Migra, uma vez por processo, o histórico que ainda estiver embutido nos lotes.
+
+    Chamada ao abrir a aplicação e no início de cada sincronização, dispensa
+    rodar o `migrar-historico` à mão numa base antiga. Uma trava no
+    armazenamento impede que dois processos gravem os mesmos eventos; quem
+    não a obtém tenta de novo na próxima chamada. Devolve (lotes migrados,
+    eventos gravados).
+    """
+    storage = storage or get_storage()
+    if id(storage) in _migrados:
+        return 0, 0
+
+    dono = f"{socket.gethostname()}:{os.getpid()}"
+    agora = datetime.now(timezone.utc)
+    if not storage.adquirir_trava("migracao_historico", dono, agora, agora + timedelta(minutes=validade_min)):
+        return 0, 0
+    try:
+        resultado = migrar_historico(storage)
+    finally:
+        storage.liberar_trava("migracao_historico", dono)
+    _migrados.add(id(storage))
+    return resultado
@@ -0,0 +1,178 @@
+"""Spans de tempo e contadores das sincronizações e da renderização da página.
+
+Os valores são acumulados no processo (para o painel e o formato do
+Prometheus) e também por execução: cada `execucao()` (por exemplo, uma
+sincronização) junta os spans e contadores registrados enquanto está
+ativa, inclusive nas threads de busca, e ao terminar entra no histórico
+recente e, se METRICAS_JSONL estiver configurado, vira uma linha JSON.
+"""
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from leiloes.config import METRICAS_JSONL, agora_formatado
+
+PREFIXO = "leiloes"
+
+_execucao_atual = contextvars.ContextVar("execucao_metricas", default=None)
+
+
+class _Agregado:
+    """Quantidade, soma e máximo das durações de um span."""
+
+    __slots__ = ("n", "total", "maximo")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, duracao):
+        self.n += 1
+        self.total += duracao
+        self.maximo = max(self.maximo, duracao)
+
+    def como_dict(self):
+        return {"n": self.n, "total_s": round(self.total, 4), "max_s": round(self.maximo, 4)}
+
+
+class Execucao:
+    """Spans e contadores de uma execução (por exemplo, uma sincronização)."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.inicio = agora_formatado()
+        self.duracao = None
+        self.spans = {}
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    def registrar_span(self, nome, duracao):
+        with self._lock:
+            self.spans.setdefault(nome, _Agregado()).registrar(duracao)
+
+    def somar(self, nome, valor):
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                "execucao": self.nome,
+                "inicio": self.inicio,
+                "duracao_s": round(self.duracao, 4) if self.duracao is not None else None,
+                "spans": {nome: agregado.como_dict() for nome, agregado in self.spans.items()},
+                "contadores": dict(self.contadores),
+            }
+
+    def resumo(self):
+        """Linha legível com o tempo de cada fase, da mais demorada para a mais rápida."""
+        with self._lock:
+            fases = sorted(self.spans.items(), key=lambda item: item[1].total, reverse=True)
+            partes = [f"{nome} {agregado.total:.2f}s ({agregado.n}x)" for nome, agregado in fases]
+            contadores = [f"{nome}={valor}" for nome, valor in sorted(self.contadores.items())]
+        texto = f"Tempo por fase: {', '.join(partes) or '-'}"
+        if contadores:
+            texto += f"\nContadores: {', '.join(contadores)}"
+        return texto
+
+
+class Metricas:
+    """Registro dos spans e contadores do processo, com as últimas execuções."""
+
+    def __init__(self, arquivo_jsonl=METRICAS_JSONL, max_execucoes=50):
+        self.arquivo_jsonl = arquivo_jsonl
+        self.spans = {}
+        self.contadores = {}
+        self.execucoes = deque(maxlen=max_execucoes)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self._lock:
+                self.spans.setdefault(nome, _Agregado()).registrar(duracao)
+            execucao = _execucao_atual.get()
+            if execucao is not None:
+                execucao.registrar_span(nome, duracao)
+
+    def contar(self, nome, valor=1):
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + valor
+        execucao = _execucao_atual.get()
+        if execucao is not None:
+            execucao.somar(nome, valor)
+
+    @contextmanager
+    def execucao(self, nome):
+        """Agrupa os spans e contadores registrados dentro do bloco (e das threads iniciadas nele)."""
+        execucao = Execucao(nome)
+        token = _execucao_atual.set(execucao)
+        inicio = time.perf_counter()
+        try:
+            yield execucao
+        finally:
+            execucao.duracao = time.perf_counter() - inicio
+            _execucao_atual.reset(token)
+            with self._lock:
+                self.execucoes.append(execucao)
+            self._gravar_jsonl(execucao)
+
+    def _gravar_jsonl(self, execucao):
+        if not self.arquivo_jsonl:
+            return
+        try:
+            with open(self.arquivo_jsonl, "a", encoding="utf-8") as f:
+                f.write(json.dumps(execucao.como_dict(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Erro ao gravar métricas em {self.arquivo_jsonl}: {e}")
+
+    def exportar_dict(self):
+        """Totais do processo: spans e contadores."""
+        with self._lock:
+            return {
+                "spans": {nome: agregado.como_dict() for nome, agregado in self.spans.items()},
+                "contadores": dict(self.contadores),
+            }
+
+    def ultimas_execucoes(self, nome=None):
+        with self._lock:
+            execucoes = list(self.execucoes)
+        return [execucao.como_dict() for execucao in reversed(execucoes) if nome is None or execucao.nome == nome]
+
+    def exportar_prometheus(self):
+        """Spans (como summary) e contadores no formato texto do Prometheus."""
+        totais = self.exportar_dict()
+        spans, contadores = totais["spans"], totais["contadores"]
+
+        linhas = [
+            f"# HELP {PREFIXO}_span_segundos Duração das fases da sincronização e da página.",
+            f"# TYPE {PREFIXO}_span_segundos summary",
+        ]
+        for nome, agregado in sorted(spans.items()):
+            linhas.append(f'{PREFIXO}_span_segundos_count{{span="{nome}"}} {agregado["n"]}')
+            linhas.append(f'{PREFIXO}_span_segundos_sum{{span="{nome}"}} {agregado["total_s"]}')
+        for nome, valor in sorted(contadores.items()):
+            metrica = f"{PREFIXO}_{nome}_total"
+            linhas.append(f"# TYPE {metrica} counter")
+            linhas.append(f"{metrica} {valor}")
+        return "\n".join(linhas) + "\n"
+
+    def exportar_jsonl(self):
+        """As últimas execuções, uma por linha em JSON."""
+        return "".join(json.dumps(execucao, ensure_ascii=False) + "\n" for execucao in reversed(self.ultimas_execucoes()))
+
+
+metricas = Metricas()
+
+
+def contexto_atual():
+    """Cópia do contexto atual, para que threads de trabalho registrem na mesma execução."""
+    return contextvars.copy_context()
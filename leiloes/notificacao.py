@@ -0,0 +1,306 @@
+"""Formatação e envio dos e-mails de novos leilões e alterações."""
+import io
+import queue
+import threading
+import time
+
+from leiloes.assinaturas import IndiceAssinaturas, listar_assinaturas
+from leiloes.config import (
+    COURIER_API_TOKEN,
+    EMAIL_BACKOFF,
+    EMAIL_DESTINATARIOS,
+    EMAIL_MAX_CHARS,
+    EMAIL_MAX_DESTINATARIOS,
+    EMAIL_MAX_RETRIES,
+    SITE_URL,
+)
+from leiloes.diff import linhas_alteracoes
+from leiloes.metricas import metricas
+
+
+ASSUNTO_ALERTA = 'Leilões Judiciais DF - Novos Imóveis Adicionados!'
+SEPARADOR_LOTE = "\n" + ("=" * 40) + "\n\n"
+SECAO_NOVOS = '\n\n>>>>> Novos Imóveis <<<<<\n\n'
+SECAO_ALTERACOES = '\n\n>>>>> Alterações <<<<<\n\n'
+
+
+def _escrever_novo_imovel(out, imovel):
+    leiloeiro = imovel.get("leiloeiro", {})
+    processo = imovel.get("processo", {})
+    bens = imovel.get("bensALeiloar", [])
+
+    out.write(
+        f"\nID do Leilão: {imovel.get('id')}\n"
+        f"Tipo de Leilão: {imovel.get('tipoDeLeilao')}\n"
+        f"Primeira Hasta: {imovel.get('primeiraHasta')}\n"
+        f"Segunda Hasta: {imovel.get('segundaHasta')}\n"
+        f"Status: {imovel.get('status')}\n"
+        f"Justificativa (se houver): {imovel.get('justificativaCancelamentoSuspensao', 'N/A')}\n"
+        f"Valor Total dos Bens: R$ {imovel.get('valorTotalBens', 0):,.2f}\n"
+        f"----- PROCESSO -----\n"
+        f"Número do Processo: {processo.get('numeroProcessoFormatado')}\n"
+        f"Polo Ativo: {processo.get('poloAtivo')}\n"
+        f"Polo Passivo: {processo.get('poloPassivo')}\n"
+        f"Órgão Julgador: {processo.get('orgaoJulgador', {}).get('nome', 'N/A')}\n"
+        f"--- LEILOEIRO ---\n"
+        f"Site: {leiloeiro.get('localRealizacao')}\n"
+    )
+
+    out.write("----- BENS A LEILOAR -----\n")
+    for bem in bens:
+        out.write(
+            f"Descrição: {bem.get('descricao', 'N/A')}\n"
+            f"Valor: R$ {bem.get('valor', 0):,.2f}\n"
+            "-----------------------\n"
+        )
+
+    out.write(SEPARADOR_LOTE)
+
+
+def _escrever_alteracao(out, imovel, historico):
+    out.write(f"\nID do Leilão: {imovel.get('id')}\n"
+              f"Tipo de Leilão: {imovel.get('tipoDeLeilao')}\n"
+              f"Primeira Hasta: {imovel.get('primeiraHasta')}\n"
+              f"Segunda Hasta: {imovel.get('segundaHasta')}\n"
+              f"Status: {imovel.get('status')}\n"
+              f"Justificativa (se houver): {imovel.get('justificativaCancelamentoSuspensao', 'N/A')}\n"
+              f"Valor Total dos Bens: R$ {imovel.get('valorTotalBens', 0):,.2f}\n"
+              f"----- ALTERAÇÕES -----\n")
+
+    for alteracao in historico:
+        out.write(f"Data da Alteração: {alteracao.get('dataAlteracao', 'N/A')}\n")
+        for campo, valor_antigo, valor_novo in linhas_alteracoes(alteracao.get("alteracoes")):
+            out.write(f"{campo}: {valor_antigo} -> {valor_novo}\n")
+        out.write("-----------------------\n")
+
+    out.write(SEPARADOR_LOTE)
+
+
+def _historico_da_sync(changes, eventos):
+    """Alterações de cada lote registradas nesta sincronização, por id.
+
+    Sem `eventos` (lotes com o histórico embutido), vale só a entrada mais
+    recente, que é a gravada pela sincronização.
+    """
+    if eventos is None:
+        return {imovel.get('id'): (imovel.get('historico_alteracoes') or [])[-1:] for imovel in changes}
+
+    por_lote = {}
+    for evento in eventos:
+        por_lote.setdefault(evento["lote_id"], []).append(evento)
+    return por_lote
+
+
+def _blocos(new_data, changes, eventos):
+    """Texto de cada lote do digest, na ordem do e-mail; o título da seção vai junto do primeiro."""
+    secao = SECAO_NOVOS
+    for imovel in new_data:
+        out = io.StringIO()
+        out.write(secao)
+        secao = ""
+        _escrever_novo_imovel(out, imovel)
+        yield out.getvalue()
+    if secao:
+        yield secao
+
+    historicos = _historico_da_sync(changes, eventos)
+    secao = SECAO_ALTERACOES
+    for imovel in changes:
+        out = io.StringIO()
+        out.write(secao)
+        secao = ""
+        _escrever_alteracao(out, imovel, historicos.get(imovel.get('id'), []))
+        yield out.getvalue()
+    if secao:
+        yield secao
+
+
+def montar_mensagens(new_data, changes, eventos=None, max_chars=EMAIL_MAX_CHARS, assunto=ASSUNTO_ALERTA,
+                     total_novos=None, total_alterados=None):
+    """Monta o digest da sincronização em mensagens de até `max_chars` caracteres.
+
+    O texto é gerado lote a lote e as mensagens são fechadas sem quebrar um
+    lote ao meio; um lote maior que o limite sai sozinho. Devolve uma lista
+    de (assunto, corpo). Com `max_chars` None tudo vai em uma mensagem.
+    Quando `new_data` e `changes` são só uma amostra, os totais informados
+    vão no cabeçalho.
+    """
+    alert_subject = assunto
+    total_novos = len(new_data) if total_novos is None else total_novos
+    total_alterados = len(changes) if total_alterados is None else total_alterados
+    cabecalho = f'Foram adicionados {total_novos} novos imóveis e {total_alterados} atualizados. Verifique a lista para mais detalhes:\n\n'
+    if (total_novos, total_alterados) != (len(new_data), len(changes)):
+        cabecalho += f'Abaixo estão os primeiros {len(new_data)} novos e {len(changes)} atualizados.\n\n'
+    rodape = f'\n\nConfira em: {SITE_URL}\n\n'
+    limite = max_chars - len(cabecalho) - len(rodape) if max_chars else None
+
+    corpos = []
+    with metricas.span("email.formatacao"):
+        atual, tamanho = io.StringIO(), 0
+        for bloco in _blocos(new_data, changes, eventos):
+            if limite and tamanho and tamanho + len(bloco) > limite:
+                corpos.append(atual.getvalue())
+                atual, tamanho = io.StringIO(), 0
+            atual.write(bloco)
+            tamanho += len(bloco)
+        corpos.append(atual.getvalue())
+
+    total = len(corpos)
+    return [
+        (alert_subject if total == 1 else f"{alert_subject} ({parte}/{total})", cabecalho + corpo + rodape)
+        for parte, corpo in enumerate(corpos, start=1)
+    ]
+
+
+class EnvioEmails:
+    """Fila de envio de e-mails processada por uma thread em segundo plano.
+
+    Quem chama `enviar` não espera a entrega: as mensagens são enviadas em
+    ordem, com os destinatários divididos em grupos de `max_destinatarios`
+    e novas tentativas (com espera exponencial) quando o envio falha.
+    """
+
+    def __init__(
+        self,
+        auth_token=COURIER_API_TOKEN,
+        destinatarios=EMAIL_DESTINATARIOS,
+        max_destinatarios=EMAIL_MAX_DESTINATARIOS,
+        max_retries=EMAIL_MAX_RETRIES,
+        backoff=EMAIL_BACKOFF,
+        client=None,
+    ):
+        self.auth_token = auth_token
+        self.destinatarios = destinatarios
+        self.max_destinatarios = max(int(max_destinatarios), 1)
+        self.max_retries = max(int(max_retries), 0)
+        self.backoff = backoff
+        self.client = client
+        self.fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enviar(self, mensagens, destinatarios=None):
+        """Coloca as mensagens (assunto, corpo) na fila e retorna imediatamente.
+
+        Sem `destinatarios`, vão para a lista configurada em EMAIL_DESTINATARIOS.
+        """
+        for subject, body in mensagens:
+            self.fila.put((subject, body, destinatarios))
+        self._iniciar()
+
+    def aguardar(self):
+        """Bloqueia até que todas as mensagens da fila tenham sido processadas."""
+        self.fila.join()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="envio-emails", daemon=True)
+                self._thread.start()
+
+    def _executar(self):
+        while True:
+            subject, body, destinatarios = self.fila.get()
+            try:
+                self.enviar_agora(subject, body, destinatarios)
+            except Exception as e:
+                # A thread continua atendendo a fila mesmo que uma mensagem quebre
+                print(f"Erro ao enviar e-mail: {str(e)}")
+            finally:
+                self.fila.task_done()
+
+    def enviar_agora(self, subject, body, destinatarios=None):
+        """Envia uma mensagem de forma síncrona; devolve False se algum grupo falhou."""
+        # Cria a lista de destinatários
+        to_list = [{"email": email.strip()} for email in destinatarios or self.destinatarios if email.strip()]
+        if not to_list:
+            print("Nenhum destinatário válido encontrado.")
+            return False
+
+        if self.client is None:
+            # O Courier só é carregado quando há um e-mail para enviar
+            from trycourier import Courier
+            self.client = Courier(auth_token=self.auth_token)
+
+        ok = True
+        for inicio in range(0, len(to_list), self.max_destinatarios):
+            grupo = to_list[inicio:inicio + self.max_destinatarios]
+            ok = self._enviar_grupo(grupo, subject, body) and ok
+        return ok
+
+    def _enviar_grupo(self, to_list, subject, body):
+        for tentativa in range(self.max_retries + 1):
+            try:
+                with metricas.span("email.envio"):
+                    response = self.client.send_message(
+                        message={
+                            "to": to_list,
+                            "content": {
+                                "title": subject,
+                                "body": body,
+                            }
+                        }
+                    )
+                print(response)
+                metricas.contar("emails_enviados")
+                metricas.contar("email_bytes", len(body.encode("utf-8")))
+                return True
+            except Exception as e:
+                if tentativa == self.max_retries:
+                    # Imprimir o erro depois da última tentativa
+                    print(f"Erro ao enviar e-mail: {str(e)}")
+                    metricas.contar("falhas_email")
+                    return False
+                metricas.contar("email_retentativas")
+                time.sleep(self.backoff * (2 ** tentativa))
+
+
+envio_emails = EnvioEmails()
+
+
+def send_email(subject, body):
+    """Envia um e-mail imediatamente (bloqueante), com novas tentativas."""
+    return envio_emails.enviar_agora(subject, body)
+
+
+def notificar_assinantes(new_data, changes, eventos=None, storage=None):
+    """Envia a cada assinante só os lotes que casam com as suas buscas salvas.
+
+    Devolve quantos e-mails receberam um digest.
+    """
+    if not (new_data or changes):
+        return 0
+    assinaturas = listar_assinaturas(storage)
+    if not assinaturas:
+        return 0
+
+    with metricas.span("assinaturas.casamento"):
+        por_email = IndiceAssinaturas(assinaturas).distribuir(new_data, changes)
+
+    nomes = {}
+    for assinatura in assinaturas:
+        nomes.setdefault(assinatura["email"], []).append(assinatura["nome"])
+    for email, (novos, alterados) in por_email.items():
+        buscas = nomes[email]
+        assunto = f"Leilões Judiciais DF - {buscas[0] if len(buscas) == 1 else f'{len(buscas)} buscas salvas'}"
+        envio_emails.enviar(montar_mensagens(novos, alterados, eventos, assunto=assunto), [email])
+    metricas.contar("assinantes_notificados", len(por_email))
+    return len(por_email)
+
+
+def notificar(new_data, changes, eventos=None, total_novos=None, total_alterados=None):
+    """Coloca o digest na fila de envio quando a sincronização encontrou novidades.
+
+    O digest completo vai para EMAIL_DESTINATARIOS e cada assinante recebe o
+    seu, só com os lotes das suas buscas salvas. Não bloqueia: use
+    `aguardar_envios` antes de encerrar o processo.
+    """
+    if new_data or changes:
+        envio_emails.enviar(montar_mensagens(
+            new_data, changes, eventos, total_novos=total_novos, total_alterados=total_alterados
+        ))
+        notificar_assinantes(new_data, changes, eventos)
+
+
+def aguardar_envios():
+    envio_emails.aguardar()
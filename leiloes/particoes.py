@@ -0,0 +1,218 @@
+"""Busca particionada: tipo de bem × status × janela de datas do 1º leilão.
+
+Cada partição é uma busca paginada independente na API, com os próprios
+parâmetros. As partições vencidas rodam em paralelo, dividindo o limite de
+requisições simultâneas do PageFetcher, e as páginas chegam à sincronização
+por uma fila, numa única thread. Um lote que aparece em mais de uma
+partição só é processado na primeira vez.
+
+O estado de cada partição (a marca d'água) fica no armazenamento:
+
+    {"IMOVEL|AGENDADO": {"buscada_em": "2024-05-01T13:00:00+00:00",
+                         "paginas": 1, "registros": 812, "erro": None}}
+
+e só avança quando a partição é percorrida até o fim sem erro. Assim os
+status que mudam muito (AGENDADO) podem ser buscados a cada poucos minutos
+e os encerrados uma vez por dia.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from leiloes.config import (
+    CRAWL_INTERVALO_PADRAO,
+    CRAWL_INTERVALOS,
+    CRAWL_JANELA_DIAS,
+    CRAWL_JANELA_FIM,
+    CRAWL_JANELA_INICIO,
+    CRAWL_PARAM_DATA_FIM,
+    CRAWL_PARAM_DATA_INICIO,
+    CRAWL_PARTICOES_PARALELAS,
+    CRAWL_STATUS,
+    CRAWL_TIPOS_BEM,
+)
+from leiloes.fetch import PaginaCacheada
+from leiloes.metricas import contexto_atual, metricas
+
+
+def ler_intervalos(texto=CRAWL_INTERVALOS):
+    """Converte "AGENDADO=15,ENCERRADO=1440" em {status: minutos}."""
+    intervalos = {}
+    for item in texto.split(","):
+        if not item.strip():
+            continue
+        status, separador, minutos = item.partition("=")
+        if not separador:
+            raise ValueError(f"CRAWL_INTERVALOS inválido: {item!r} (use STATUS=MINUTOS)")
+        intervalos[status.strip()] = float(minutos)
+    return intervalos
+
+
+def janelas(inicio=CRAWL_JANELA_INICIO, fim=CRAWL_JANELA_FIM, dias=CRAWL_JANELA_DIAS):
+    """Janelas [de, até] consecutivas de `dias` dias cobrindo o período; vazio sem janelas."""
+    if not dias:
+        return []
+    if not inicio or not fim:
+        raise ValueError("CRAWL_JANELA_DIAS exige CRAWL_JANELA_INICIO e CRAWL_JANELA_FIM.")
+    de, fim = date.fromisoformat(inicio), date.fromisoformat(fim)
+    resultado = []
+    while de <= fim:
+        ate = min(de + timedelta(days=dias - 1), fim)
+        resultado.append((de, ate))
+        de = ate + timedelta(days=1)
+    return resultado
+
+
+class Particao:
+    """Uma fatia da busca, com os parâmetros que a API recebe e o intervalo entre buscas."""
+
+    def __init__(self, tipo_bem, status="", janela=None, intervalo_min=0):
+        self.tipo_bem = tipo_bem
+        self.status = status
+        self.janela = janela
+        self.intervalo = timedelta(minutes=intervalo_min)
+
+    @property
+    def chave(self):
+        partes = [self.tipo_bem, self.status or "*"]
+        if self.janela:
+            partes.append(f"{self.janela[0].isoformat()}_{self.janela[1].isoformat()}")
+        return "|".join(partes)
+
+    @property
+    def params(self):
+        params = {"tiposDeBemALeiloar": self.tipo_bem, "status": self.status}
+        if self.janela:
+            params[CRAWL_PARAM_DATA_INICIO] = self.janela[0].isoformat()
+            params[CRAWL_PARAM_DATA_FIM] = self.janela[1].isoformat()
+        return params
+
+    def vencida(self, estado, agora):
+        """Sem busca completa registrada, ou com a última mais antiga que o intervalo."""
+        if not estado or estado.get("erro") or not estado.get("buscada_em"):
+            return True
+        return datetime.fromisoformat(estado["buscada_em"]) + self.intervalo <= agora
+
+    def __repr__(self):
+        return f"Particao({self.chave})"
+
+
+def planejar(tipos_bem=None, status=None, intervalos=None):
+    """Partições de todas as combinações configuradas (tipo de bem × status × janela)."""
+    tipos_bem = tipos_bem or CRAWL_TIPOS_BEM
+    status = status or CRAWL_STATUS or [""]
+    intervalos = ler_intervalos() if intervalos is None else intervalos
+    return [
+        Particao(tipo_bem, situacao, janela, intervalos.get(situacao, CRAWL_INTERVALO_PADRAO))
+        for tipo_bem in tipos_bem
+        for situacao in status
+        for janela in janelas() or [None]
+    ]
+
+
+def vencidas(particoes, estados, agora=None):
+    agora = agora or datetime.now(timezone.utc)
+    return [particao for particao in particoes if particao.vencida(estados.get(particao.chave), agora)]
+
+
+def deduplicar(pagina, vistos):
+    """Tira da página os lotes já vistos nesta busca (em outra partição); None se não sobrar nenhum."""
+    if isinstance(pagina, PaginaCacheada):
+        ids = [lote_id for lote_id, _ in pagina.registros]
+        if vistos.isdisjoint(ids):
+            vistos.update(ids)
+            return pagina
+        # Página guardada com repetidos: só então os registros são decodificados
+        pagina = pagina.dados()
+
+    unicos = []
+    for lote in pagina:
+        if lote["id"] not in vistos:
+            vistos.add(lote["id"])
+            unicos.append(lote)
+    metricas.contar("lotes_duplicados", len(pagina) - len(unicos))
+    return unicos or None
+
+
+class BuscaParticionada:
+    """Percorre várias partições em paralelo e entrega as páginas numa única thread.
+
+    Até `paralelas` partições ficam abertas ao mesmo tempo; as requisições de
+    todas passam pelo mesmo PageFetcher, cujo limite de conexões e de taxa é
+    compartilhado. Ao final, `estados` traz o resultado de cada partição.
+    """
+
+    def __init__(self, fetcher, particoes, paralelas=CRAWL_PARTICOES_PARALELAS):
+        self.fetcher = fetcher
+        self.particoes = list(particoes)
+        self.paralelas = max(min(int(paralelas), len(self.particoes)), 1)
+        self.estados = {}
+
+    def paginas(self, on_error=None):
+        """Gera (partição, página) na ordem em que chegam; os erros vão para `on_error` nesta thread."""
+        fila = queue.Queue(maxsize=2 * self.paralelas)
+        parar = threading.Event()
+
+        def colocar(item):
+            while not parar.is_set():
+                try:
+                    fila.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def buscar(particao):
+            if parar.is_set():
+                return
+            erros, falha = [], None
+            paginas = self.fetcher.iter_pages(particao.params, on_error=erros.append)
+            try:
+                for pagina in paginas:
+                    if not colocar(("pagina", particao, pagina)):
+                        return
+            except Exception as e:
+                falha = e
+            finally:
+                paginas.close()
+            colocar(("fim", particao, (erros, falha)))
+
+        with ThreadPoolExecutor(max_workers=self.paralelas) as executor:
+            futuros = [executor.submit(contexto_atual().run, buscar, particao) for particao in self.particoes]
+            restantes = len(futuros)
+            finalizadas = set()
+            try:
+                while restantes:
+                    tipo, particao, dados = fila.get()
+                    estado = self.estados.setdefault(particao.chave, {"paginas": 0, "registros": 0, "erro": None})
+                    if tipo == "pagina":
+                        estado["paginas"] += 1
+                        estado["registros"] += len(dados)
+                        yield particao, dados
+                        continue
+
+                    restantes -= 1
+                    finalizadas.add(particao.chave)
+                    erros, falha = dados
+                    if falha is not None:
+                        raise falha
+                    if erros:
+                        estado["erro"] = "; ".join(str(e.cause) for e in erros)
+                        metricas.contar("particoes_com_erro")
+                        if on_error:
+                            for erro in erros:
+                                on_error(erro)
+                    metricas.contar("particoes")
+            finally:
+                # Interrompida (ou com falha), libera as partições que ainda buscam
+                parar.set()
+                for futuro in futuros:
+                    futuro.cancel()
+                for chave, estado in self.estados.items():
+                    if chave not in finalizadas and not estado["erro"]:
+                        estado["erro"] = "busca interrompida"
+
+    def completas(self):
+        """Chaves das partições percorridas até o fim sem erro."""
+        return [chave for chave, estado in self.estados.items() if not estado["erro"]]
@@ -0,0 +1,103 @@
+"""Reconciliação dos lotes que deixaram de aparecer na API.
+
+A busca só revela lotes novos e alterados; um lote retirado da API ficaria
+na base para sempre. Ao fim da sincronização, em cada escopo buscado por
+completo (um status, ou todos, numa janela de datas, em todos os tipos de
+bem), os ids guardados são comparados com os ids vistos na busca, como
+arrays ordenados. Só entram no escopo os lotes buscados nos tipos de bem
+configurados (TIPO_BEM_FIELD), de modo que tirar um tipo de CRAWL_TIPOS_BEM
+não arquiva os lotes dele. Os que faltam recebem a marca AUSENTE_FIELD, em
+lote, saem da listagem e dos totais, e voltam se reaparecerem em qualquer
+partição. Passada a carência, os ainda ausentes vão para 'lotes_arquivados'
+e saem da coleção principal.
+
+A carência cobre o lote que muda de status: ele some do escopo do status
+antigo antes que a partição do novo status seja buscada de novo.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from leiloes.config import CRAWL_TIPOS_BEM, RECONCILIACAO_CARENCIA_MIN
+from leiloes.metricas import metricas
+
+
+_MENOR_ID, _MAIOR_ID = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+
+def ids_ordenados(ids, invalidos=None):
+    """Array ordenado e sem repetidos dos ids inteiros informados.
+
+    A API usa ids inteiros; qualquer outro fica de fora (e vai para a lista
+    `invalidos`, se informada), sem ser marcado nem interromper a reconciliação.
+    """
+    validos = []
+    for lote_id in ids:
+        if isinstance(lote_id, (int, np.integer)) and not isinstance(lote_id, bool) \
+                and _MENOR_ID <= lote_id <= _MAIOR_ID:
+            validos.append(lote_id)
+        elif invalidos is not None:
+            invalidos.append(lote_id)
+    return np.unique(np.array(validos, dtype=np.int64))
+
+
+def escopos_completos(busca, tipos_bem=None):
+    """Filtros (status e janela) dos escopos buscados até o fim em todos os tipos de bem."""
+    tipos_bem = set(tipos_bem or CRAWL_TIPOS_BEM)
+    completas = set(busca.completas())
+    tipos_por_escopo, registros_por_escopo = {}, {}
+    for particao in busca.particoes:
+        escopo = (particao.status, particao.janela)
+        tipos = tipos_por_escopo.setdefault(escopo, set())
+        if particao.chave in completas:
+            tipos.add(particao.tipo_bem)
+            registros = busca.estados[particao.chave]["registros"]
+            registros_por_escopo[escopo] = registros_por_escopo.get(escopo, 0) + registros
+
+    return [
+        {
+            "status": status,
+            "data_inicio": janela[0] if janela else None,
+            "data_fim": janela[1] if janela else None,
+            "tipos_bem": sorted(tipos_bem),
+        }
+        for (status, janela), tipos in tipos_por_escopo.items()
+        # Uma busca sem nenhum registro (API devolvendo listas vazias) não esvazia o escopo
+        if tipos >= tipos_bem and registros_por_escopo.get((status, janela))
+    ]
+
+
+def reconciliar(storage, busca, vistos, particoes=(), agora=None, carencia_min=RECONCILIACAO_CARENCIA_MIN):
+    """Marca os ausentes, desmarca os que voltaram e arquiva os vencidos.
+
+    `vistos` são os ids de todas as partições desta busca e `particoes`, todas
+    as planejadas (o maior intervalo entre buscas entra na carência). Devolve
+    os ids marcados e desmarcados, os documentos arquivados e os ids
+    ignorados por não serem inteiros (como repr, sem repetidos).
+    """
+    agora = agora or datetime.now(timezone.utc)
+    invalidos = []
+    vistos = ids_ordenados(vistos, invalidos)
+
+    reaparecidos = np.intersect1d(ids_ordenados(storage.ids_ausentes(), invalidos), vistos, assume_unique=True)
+    storage.limpar_ausentes(reaparecidos.tolist())
+
+    ausentes = np.empty(0, dtype=np.int64)
+    for filtros in escopos_completos(busca):
+        guardados = ids_ordenados(storage.ids_no_escopo(filtros), invalidos)
+        ausentes = np.union1d(ausentes, np.setdiff1d(guardados, vistos, assume_unique=True))
+    storage.marcar_ausentes(ausentes.tolist(), agora.isoformat())
+
+    carencia = max([carencia_min] + [particao.intervalo / timedelta(minutes=1) for particao in particoes])
+    arquivados = storage.arquivar_ausentes((agora - timedelta(minutes=carencia)).isoformat())
+
+    metricas.contar("lotes_ausentes", len(ausentes))
+    metricas.contar("lotes_reaparecidos", len(reaparecidos))
+    metricas.contar("lotes_arquivados", len(arquivados))
+    metricas.contar("ids_invalidos", len(invalidos))
+    return {
+        "ausentes": ausentes.tolist(),
+        "reaparecidos": reaparecidos.tolist(),
+        "arquivados": arquivados,
+        "invalidos": list(dict.fromkeys(repr(lote_id) for lote_id in invalidos)),
+    }
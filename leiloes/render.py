@@ -0,0 +1,156 @@
+"""Fragmentos HTML dos cards de resultado, montados uma vez por versão de cada lote."""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+from leiloes.config import RENDER_CACHE_MAX
+from leiloes.diff import FINGERPRINT_FIELD, LAST_CHANGE_FIELD, fingerprint, linhas_alteracoes
+
+# Troca os separadores do formato americano (1,234.56) pelos brasileiros (1.234,56)
+_SEPARADORES_BR = str.maketrans({",": ".", ".": ","})
+
+ESTILO_CARD = (
+    "border: 1px solid rgba(49, 51, 63, 0.2); border-radius: 0.5rem; "
+    "padding: calc(1em - 1px); margin-bottom: 1rem;"
+)
+
+
+@lru_cache(maxsize=4096)
+def formatar_data(date_str):
+    """Formata datas no padrão dd/mm/yyyy hh:mm."""
+    if not date_str:
+        return ""
+    try:
+        data = datetime.fromisoformat(date_str)
+    except ValueError:
+        # Formatos fora do ISO 8601 ficam com o parser do pandas
+        import pandas as pd
+        data = pd.to_datetime(date_str)
+    return data.strftime('%d/%m/%Y %H:%M')
+
+
+def formatar_moeda(valor):
+    return '{:,.2f}'.format(valor).translate(_SEPARADORES_BR)
+
+
+def html_esqueleto(quantidade=3):
+    """Cards vazios exibidos enquanto os dados da página carregam."""
+    barra = '<div style="height: {altura}; width: {largura}; margin: 0.6rem 0; border-radius: 0.25rem; background: rgba(49, 51, 63, 0.1);"></div>'
+    card = (
+        f'<div style="{ESTILO_CARD}">'
+        + barra.format(altura="1.6rem", largura="60%")
+        + barra.format(altura="1rem", largura="35%")
+        + barra.format(altura="1rem", largura="80%")
+        + barra.format(altura="1rem", largura="50%")
+        + "</div>"
+    )
+    return card * quantidade
+
+
+def _html_bens(bens):
+    itens = "".join(
+        f"""
+                <li style="margin-bottom: 5px;">
+                    <strong>Descrição:</strong> {bem['descricao']}<br>
+                    <strong>Valor: R${formatar_moeda(bem['valor'])}</strong>
+                </li>
+                </br>
+                """
+        for bem in bens
+    )
+    return f"""
+         <p><strong>Bens a Leiloar:</strong></p>
+            <ul style="list-style-type: disc; margin-left: 50px;">
+                {itens}
+            </ul>
+        """
+
+
+def html_card(leilao):
+    """Card completo do lote: dados do processo, do leilão e a lista de bens."""
+    processo = leilao['processo']
+    local = leilao['leiloeiro']['localRealizacao']
+    return f"""
+        <div style="{ESTILO_CARD}">
+            <h3>Processo: {processo['numeroProcessoFormatado']}</h3>
+            <span><strong>Data de Criação:</strong> {formatar_data(processo['dataCriacao'])}</span>
+            <p><strong>Status:</strong> {leilao['status']}</p>
+            <p>
+                <span style="margin-right: 3rem;"><strong>1º Leilão:</strong> {formatar_data(leilao.get('primeiraHasta', ''))}</span>
+                <span><strong>2º Leilão:</strong> {formatar_data(leilao.get('segundaHasta', ''))}</span>
+            </p>
+            <p><strong>Valor Total:</strong> R${formatar_moeda(leilao['valorTotalBens'])}</p>
+            <p><strong>Leiloeiro:</strong>
+                <a target="_blank" style="text-transform: lowercase; color: #837bf3" href="https://{local}">
+                    {local}
+                </a>
+            </p>
+            {_html_bens(leilao['bensALeiloar'])}
+        </div>
+        """
+
+
+def agrupar_alteracoes(historico):
+    """Agrupa as alterações por data (mais recente primeiro) em linhas (campo, antigo, novo)."""
+    grouped_changes = {}
+
+    for alteracao in historico:
+        data_alteracao = alteracao.get('dataAlteracao', 'Data desconhecida')
+        linhas = grouped_changes.setdefault(data_alteracao, [])
+        linhas.extend(
+            (campo, old_value, new_value)
+            for campo, old_value, new_value in linhas_alteracoes(alteracao.get('alteracoes'))
+            if old_value != new_value
+        )
+
+    return [(data, grouped_changes[data]) for data in sorted(grouped_changes, reverse=True)]
+
+
+def markdown_historico(historico):
+    """Alterações agrupadas por data em um único bloco de markdown."""
+    blocos = []
+    for data, linhas in agrupar_alteracoes(historico):
+        texto = f"**DATA DA ALTERAÇÃO:** {formatar_data(data)}"
+        texto += "".join(f"\n\n  **{campo}:**  {old_value} ➡️ {new_value}" for campo, old_value, new_value in linhas)
+        blocos.append(texto)
+    return "\n\n---\n\n".join(blocos)
+
+
+class CacheRenderizacao:
+    """Cache LRU de fragmentos renderizados, por (tipo, id do lote, versão).
+
+    A versão do card é o hash de conteúdo do lote e a do histórico é a data
+    da última alteração, então um fragmento só é refeito quando o lote muda.
+    """
+
+    def __init__(self, max_entradas=RENDER_CACHE_MAX):
+        self.max_entradas = max(int(max_entradas), 1)
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, montar):
+        with self._lock:
+            valor = self._entradas.get(chave)
+            if valor is not None:
+                self._entradas.move_to_end(chave)
+                return valor
+
+        valor = montar()
+        with self._lock:
+            self._entradas[chave] = valor
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def card(self, leilao):
+        versao = leilao.get(FINGERPRINT_FIELD) or fingerprint(leilao)
+        return self.obter(("card", leilao['id'], versao), lambda: html_card(leilao))
+
+    def historico(self, leilao, carregar_historico):
+        """Markdown do histórico; `carregar_historico` só é chamado quando não está em cache."""
+        versao = leilao.get(LAST_CHANGE_FIELD)
+        return self.obter(("historico", leilao['id'], versao), lambda: markdown_historico(carregar_historico()))
+
+
+cache_render = CacheRenderizacao()
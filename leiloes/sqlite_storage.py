@@ -0,0 +1,549 @@
+"""Armazenamento local dos lotes em SQLite, alternativo ao MongoDB."""
+import json
+import sqlite3
+import threading
+
+from leiloes.agregados import aplicar_incrementos
+from leiloes.bulk import BatchResult, print_batch, registrar_batch, somar_batches
+from leiloes.config import BULK_BATCH_SIZE, agora_formatado
+from leiloes.busca import normalizar, texto_do_lote
+from leiloes.consulta import PROJECAO_LISTAGEM, TIPO_BEM_LEGADO, aplicar_projecao
+from leiloes.diff import (
+    AUSENTE_FIELD,
+    BUSCA_FIELD,
+    FINGERPRINT_FIELD,
+    IGNORE_FIELDS,
+    LAST_CHANGE_FIELD,
+    TIPO_BEM_FIELD,
+    add_fingerprints,
+)
+from leiloes.metricas import metricas
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lotes (
+    id PRIMARY KEY,
+    status TEXT,
+    primeira_hasta TEXT,
+    data_criacao TEXT,
+    ultima_alteracao TEXT,
+    descricoes TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lotes_status_hasta ON lotes (status, primeira_hasta, id);
+CREATE INDEX IF NOT EXISTS idx_lotes_hasta ON lotes (primeira_hasta, id);
+CREATE INDEX IF NOT EXISTS idx_lotes_status_criacao ON lotes (status, data_criacao, id);
+CREATE INDEX IF NOT EXISTS idx_lotes_criacao ON lotes (data_criacao, id);
+CREATE INDEX IF NOT EXISTS idx_lotes_alteracao ON lotes (ultima_alteracao, data_criacao, id);
+CREATE INDEX IF NOT EXISTS idx_lotes_ausente ON lotes (json_extract(doc, '$.ausente_desde'))
+    WHERE json_extract(doc, '$.ausente_desde') IS NOT NULL;
+CREATE TABLE IF NOT EXISTS lotes_arquivados (
+    id PRIMARY KEY,
+    arquivado_em TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alteracoes (
+    lote_id NOT NULL,
+    data_alteracao TEXT NOT NULL,
+    alteracoes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alteracoes_lote ON alteracoes (lote_id, data_alteracao DESC);
+CREATE TABLE IF NOT EXISTS dados_gerais (
+    chave TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assinaturas (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    ativa INTEGER NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS travas (
+    nome TEXT PRIMARY KEY,
+    dono TEXT NOT NULL,
+    expira_em TEXT NOT NULL
+);
+"""
+
+UPSERT_LOTE = """
+INSERT INTO lotes (id, status, primeira_hasta, data_criacao, ultima_alteracao, descricoes, doc)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    status = excluded.status,
+    primeira_hasta = excluded.primeira_hasta,
+    data_criacao = excluded.data_criacao,
+    ultima_alteracao = excluded.ultima_alteracao,
+    descricoes = excluded.descricoes,
+    doc = excluded.doc
+"""
+
+# Versão do arquivo, para as migrações de _migrar
+VERSAO_SCHEMA = 1
+
+SQL_AUSENTES = f"SELECT id FROM lotes WHERE json_extract(doc, '$.{AUSENTE_FIELD}') IS NOT NULL"
+
+SORT_SQL = {
+    "Data 1º Leilão, Crescente": "primeira_hasta ASC, id ASC",
+    "Data 1º Leilão, Decrescente": "primeira_hasta DESC, id DESC",
+    "Data de Criação, Crescente": "data_criacao ASC, id ASC",
+    "Data de Criação, Decrescente": "data_criacao DESC, id DESC",
+    # NULL é o menor valor no SQLite, então lotes sem alteração ficam por último
+    "Data de Atualização, Decrescente": "ultima_alteracao DESC, data_criacao DESC, id DESC",
+}
+DEFAULT_SORT_SQL = SORT_SQL["Data 1º Leilão, Crescente"]
+
+
+def _dumps(valor):
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _linha(doc):
+    """Colunas indexadas extraídas do lote, seguidas do documento compacto."""
+    ultima_alteracao = doc.get(LAST_CHANGE_FIELD)
+    if not ultima_alteracao:
+        # Lotes ainda não migrados para o change-log guardam o histórico embutido
+        historico = [h.get("dataAlteracao") for h in doc.get("historico_alteracoes") or [] if h.get("dataAlteracao")]
+        ultima_alteracao = max(historico) if historico else None
+    return (
+        doc["id"],
+        doc.get("status"),
+        doc.get("primeiraHasta"),
+        (doc.get("processo") or {}).get("dataCriacao"),
+        ultima_alteracao,
+        # O texto de busca fica só na coluna, fora do JSON
+        texto_do_lote(doc),
+        _dumps({k: v for k, v in doc.items() if k not in ("_id", BUSCA_FIELD)}),
+    )
+
+
+def _definir(doc, caminho, valor):
+    partes = caminho.split(".")
+    for parte in partes[:-1]:
+        doc = doc.setdefault(parte, {})
+    doc[partes[-1]] = valor
+
+
+def _remover(doc, caminho):
+    partes = caminho.split(".")
+    for parte in partes[:-1]:
+        doc = doc.get(parte)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(partes[-1], None)
+
+
+class SQLiteWriter:
+    """Equivalente ao BulkWriter para o SQLite: aplica inserts e $set/$unset em lotes.
+
+    Cada lote é uma transação; se ela falhar, o lote é contado como falha e
+    os próximos continuam sendo gravados.
+    """
+
+    def __init__(self, storage, batch_size=BULK_BATCH_SIZE, on_batch=None):
+        self.storage = storage
+        self.batch_size = max(int(batch_size), 1)
+        self.on_batch = on_batch
+        self.batches = []
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def add(self, operation):
+        self._pending.append(operation)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def insert(self, document):
+        self.add(("insert", document))
+
+    def update(self, filtro, update_query, upsert=False):
+        if update_query:  # Garante que não será feita uma operação vazia
+            self.add(("update", filtro["id"], update_query, upsert))
+
+    def flush(self):
+        if not self._pending:
+            return None
+
+        operations, self._pending = self._pending, []
+        numero = len(self.batches) + 1
+        inseridos = upserts = modificados = falhas = 0
+        erros = []
+
+        conn = self.storage.conexao()
+        try:
+            with metricas.span("gravacao.lote"), conn:
+                ids = [op[1]["id"] if op[0] == "insert" else op[1] for op in operations]
+                docs = self.storage.carregar_docs(ids)
+                alterados = {}
+                for op in operations:
+                    if op[0] == "insert":
+                        documento = op[1]
+                        if documento["id"] in docs:
+                            falhas += 1
+                            erros.append(f"id duplicado: {documento['id']}")
+                            continue
+                        docs[documento["id"]] = alterados[documento["id"]] = dict(documento)
+                        inseridos += 1
+                        continue
+
+                    _, lote_id, update_query, upsert = op
+                    documento = docs.get(lote_id)
+                    if documento is None:
+                        if not upsert:
+                            continue
+                        documento = {"id": lote_id}
+                        upserts += 1
+                    else:
+                        modificados += 1
+                    for caminho, valor in update_query.get("$set", {}).items():
+                        _definir(documento, caminho, valor)
+                    for caminho in update_query.get("$unset", {}):
+                        _remover(documento, caminho)
+                    docs[lote_id] = alterados[lote_id] = documento
+
+                conn.executemany(UPSERT_LOTE, [_linha(doc) for doc in alterados.values()])
+        except sqlite3.Error as e:
+            batch = BatchResult(numero, len(operations), 0, 0, 0, len(operations), [str(e)])
+        else:
+            batch = BatchResult(numero, len(operations), inseridos, upserts, modificados, falhas, erros)
+
+        registrar_batch(batch)
+        self.batches.append(batch)
+        if self.on_batch:
+            self.on_batch(batch)
+        return batch
+
+    def totals(self):
+        """Soma as contagens de todos os lotes já enviados."""
+        return somar_batches(self.batches)
+
+
+class SQLiteStorage:
+    """Armazenamento embutido em um arquivo SQLite, com a mesma interface do MongoStorage.
+
+    Os lotes ficam como JSON compacto, com as colunas usadas em filtros e
+    ordenações extraídas e indexadas. Cada thread usa sua própria conexão.
+    """
+
+    nome = "sqlite"
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+
+    def conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._migrar(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrar(conn):
+        """Atualiza um arquivo criado por uma versão anterior (PRAGMA user_version)."""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= VERSAO_SCHEMA:
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                # 1: a coluna de busca passa a ter as descrições normalizadas (sem acentos)
+                linhas = conn.execute("SELECT id, doc FROM lotes").fetchall()
+                textos = [(texto_do_lote(json.loads(doc)), lote_id) for lote_id, doc in linhas]
+                conn.executemany("UPDATE lotes SET descricoes = ? WHERE id = ?", textos)
+            conn.execute(f"PRAGMA user_version = {VERSAO_SCHEMA}")
+
+    def indice_hashes(self):
+        """Índice compacto id -> hash de conteúdo de todos os lotes salvos."""
+        cursor = self.conexao().execute(f"SELECT id, json_extract(doc, '$.{FINGERPRINT_FIELD}') FROM lotes")
+        return dict(cursor)
+
+    def carregar_docs(self, ids):
+        """Documentos dos ids informados, consultados em blocos."""
+        docs = {}
+        ids = list(dict.fromkeys(ids))
+        conn = self.conexao()
+        for inicio in range(0, len(ids), 500):
+            bloco = ids[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(bloco))
+            for lote_id, doc in conn.execute(f"SELECT id, doc FROM lotes WHERE id IN ({marcadores})", bloco):
+                docs[lote_id] = json.loads(doc)
+        return docs
+
+    # -------------------- Reconciliação --------------------
+    def ids_no_escopo(self, filtros):
+        """Ids dos lotes presentes que atendem aos filtros e foram buscados nos `tipos_bem` do escopo."""
+        filtros = dict(filtros)
+        tipos_bem = list(filtros.pop("tipos_bem"))
+        where, params = self._where(**filtros)
+        tipo = f"json_extract(doc, '$.{TIPO_BEM_FIELD}')"
+        clausula = f"{tipo} IN ({','.join('?' * len(tipos_bem))})"
+        if TIPO_BEM_LEGADO in tipos_bem:
+            clausula = f"({clausula} OR {tipo} IS NULL)"
+        where = f"{where} AND {clausula}"
+        params += tipos_bem
+        return (lote_id for (lote_id,) in self.conexao().execute(f"SELECT id FROM lotes{where}", params))
+
+    def ids_ausentes(self):
+        cursor = self.conexao().execute(SQL_AUSENTES)
+        return (lote_id for (lote_id,) in cursor)
+
+    def _atualizar_docs(self, sql, ids, params=()):
+        ids = list(ids)
+        with self.conexao() as conn:
+            for inicio in range(0, len(ids), 500):
+                bloco = ids[inicio:inicio + 500]
+                conn.execute(sql.format(marcadores=",".join("?" * len(bloco))), [*params, *bloco])
+
+    def marcar_ausentes(self, ids, quando):
+        self._atualizar_docs(
+            f"UPDATE lotes SET doc = json_set(doc, '$.{AUSENTE_FIELD}', ?) WHERE id IN ({{marcadores}})", ids, (quando,)
+        )
+
+    def limpar_ausentes(self, ids):
+        self._atualizar_docs(
+            f"UPDATE lotes SET doc = json_remove(doc, '$.{AUSENTE_FIELD}') WHERE id IN ({{marcadores}})", ids
+        )
+
+    def arquivar_ausentes(self, limite):
+        """Move para 'lotes_arquivados' os lotes ausentes desde `limite` (ou antes) e os devolve."""
+        conn = self.conexao()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            linhas = conn.execute(
+                f"SELECT id, doc FROM lotes WHERE json_extract(doc, '$.{AUSENTE_FIELD}') <= ?", (limite,)
+            ).fetchall()
+            arquivado_em = agora_formatado()
+            conn.executemany(
+                "INSERT INTO lotes_arquivados (id, arquivado_em, doc) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET arquivado_em = excluded.arquivado_em, doc = excluded.doc",
+                [(lote_id, arquivado_em, doc) for lote_id, doc in linhas],
+            )
+            conn.executemany("DELETE FROM lotes WHERE id = ?", [(lote_id,) for lote_id, _ in linhas])
+        return [json.loads(doc) for _, doc in linhas]
+
+    # -------------------- Dados gerais --------------------
+    def load_dados_gerais(self):
+        linha = self.conexao().execute("SELECT doc FROM dados_gerais WHERE chave = 'dados_gerais'").fetchone()
+        return json.loads(linha[0]) if linha else {}
+
+    def marcar_atualizacao(self):
+        """Registra a data da última atualização e a devolve."""
+        dados_gerais = {"_id": "dados_gerais", "data_atualizacao": agora_formatado()}
+        with self.conexao() as conn:
+            conn.execute(
+                "INSERT INTO dados_gerais (chave, doc) VALUES ('dados_gerais', ?) "
+                "ON CONFLICT(chave) DO UPDATE SET doc = excluded.doc",
+                (_dumps(dados_gerais),),
+            )
+        return dados_gerais["data_atualizacao"]
+
+    # -------------------- Agregados --------------------
+    def carregar_agregados(self):
+        linha = self.conexao().execute("SELECT doc FROM dados_gerais WHERE chave = 'agregados'").fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def salvar_agregados(self, agregados):
+        with self.conexao() as conn:
+            conn.execute(
+                "INSERT INTO dados_gerais (chave, doc) VALUES ('agregados', ?) "
+                "ON CONFLICT(chave) DO UPDATE SET doc = excluded.doc",
+                (_dumps(agregados),),
+            )
+
+    def aplicar_agregados(self, incrementos):
+        """Soma os deltas de uma sincronização ao documento de agregados."""
+        if not incrementos:
+            return
+        conn = self.conexao()
+        with conn:
+            # Leitura e escrita na mesma transação, como o $inc do MongoDB
+            conn.execute("BEGIN IMMEDIATE")
+            linha = conn.execute("SELECT doc FROM dados_gerais WHERE chave = 'agregados'").fetchone()
+            agregados = aplicar_incrementos(json.loads(linha[0]) if linha else {}, incrementos)
+            conn.execute(
+                "INSERT INTO dados_gerais (chave, doc) VALUES ('agregados', ?) "
+                "ON CONFLICT(chave) DO UPDATE SET doc = excluded.doc",
+                (_dumps(agregados),),
+            )
+
+    # -------------------- Partições da busca --------------------
+    def carregar_particoes(self):
+        linha = self.conexao().execute("SELECT doc FROM dados_gerais WHERE chave = 'particoes'").fetchone()
+        return json.loads(linha[0]) if linha else {}
+
+    def salvar_particoes(self, estados):
+        """Atualiza o estado das partições informadas, mantendo o das demais."""
+        if not estados:
+            return
+        conn = self.conexao()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            linha = conn.execute("SELECT doc FROM dados_gerais WHERE chave = 'particoes'").fetchone()
+            particoes = {**(json.loads(linha[0]) if linha else {}), **estados}
+            conn.execute(
+                "INSERT INTO dados_gerais (chave, doc) VALUES ('particoes', ?) "
+                "ON CONFLICT(chave) DO UPDATE SET doc = excluded.doc",
+                (_dumps(particoes),),
+            )
+
+    # -------------------- Lotes --------------------
+    def save(self, data):
+        """Grava (upsert) todos os lotes informados."""
+        self.marcar_atualizacao()
+
+        add_fingerprints(data, IGNORE_FIELDS)
+        with self.writer(on_batch=print_batch) as writer:
+            for item in data:
+                writer.update({"id": item["id"]}, {"$set": item}, upsert=True)
+
+        return writer.totals()
+
+    def load(self, projecao=None):
+        """Carrega os dados gerais e todos os lotes."""
+        return {
+            "dados_gerais": self.load_dados_gerais(),
+            "lotes": list(self.iter_lotes(projecao))
+        }
+
+    def iter_lotes(self, projecao=None):
+        """Lê os lotes em blocos, decodificando um documento por vez."""
+        cursor = self.conexao().execute("SELECT doc FROM lotes")
+        while True:
+            linhas = cursor.fetchmany(500)
+            if not linhas:
+                break
+            for (doc,) in linhas:
+                yield aplicar_projecao(json.loads(doc), projecao)
+
+    def writer(self, on_batch=None):
+        return SQLiteWriter(self, on_batch=on_batch)
+
+    def total_lotes(self):
+        return self.conexao().execute("SELECT COUNT(*) FROM lotes").fetchone()[0]
+
+    # -------------------- Change-log --------------------
+    def ids_com_historico_embutido(self):
+        """Ids dos lotes que ainda guardam o `historico_alteracoes` (não migrados)."""
+        sql = "SELECT id FROM lotes WHERE json_extract(doc, '$.historico_alteracoes') IS NOT NULL"
+        cursor = self.conexao().execute(sql)
+        return [lote_id for (lote_id,) in cursor]
+
+    def registrar_alteracoes(self, eventos):
+        """Acrescenta eventos ao change-log; os registros existentes nunca são reescritos."""
+        if not eventos:
+            return
+        with self.conexao() as conn:
+            conn.executemany(
+                "INSERT INTO alteracoes (lote_id, data_alteracao, alteracoes) VALUES (?, ?, ?)",
+                [(e["lote_id"], e["dataAlteracao"], _dumps(e["alteracoes"])) for e in eventos],
+            )
+
+    def carregar_historico(self, ids):
+        """Eventos do change-log dos lotes informados, do mais recente ao mais antigo."""
+        historico = {lote_id: [] for lote_id in ids}
+        lotes_ids = list(historico)
+        conn = self.conexao()
+        for inicio in range(0, len(lotes_ids), 500):
+            bloco = lotes_ids[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(bloco))
+            cursor = conn.execute(
+                "SELECT lote_id, data_alteracao, alteracoes FROM alteracoes "
+                f"WHERE lote_id IN ({marcadores}) ORDER BY lote_id, data_alteracao DESC",
+                bloco,
+            )
+            for lote_id, data_alteracao, alteracoes in cursor:
+                historico[lote_id].append(
+                    {"lote_id": lote_id, "dataAlteracao": data_alteracao, "alteracoes": json.loads(alteracoes)}
+                )
+        return historico
+
+    # -------------------- Assinaturas --------------------
+    def listar_assinaturas(self, somente_ativas=True):
+        sql = "SELECT doc FROM assinaturas" + (" WHERE ativa = 1" if somente_ativas else "")
+        return [json.loads(doc) for (doc,) in self.conexao().execute(sql)]
+
+    def salvar_assinatura(self, assinatura):
+        with self.conexao() as conn:
+            conn.execute(
+                "INSERT INTO assinaturas (id, email, ativa, doc) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET email = excluded.email, ativa = excluded.ativa, doc = excluded.doc",
+                (assinatura["id"], assinatura["email"], int(assinatura.get("ativa", True)), _dumps(assinatura)),
+            )
+
+    def remover_assinatura(self, assinatura_id):
+        with self.conexao() as conn:
+            return conn.execute("DELETE FROM assinaturas WHERE id = ?", (assinatura_id,)).rowcount > 0
+
+    # -------------------- Consulta da listagem --------------------
+    def ensure_indexes(self):
+        # Os índices são criados junto com o schema, na abertura da conexão
+        self.conexao()
+
+    def _where(self, status=None, data_inicio=None, data_fim=None, endereco=None):
+        clausulas, params = [], []
+        if status:
+            clausulas.append("status = ?")
+            params.append(status)
+        if data_inicio:
+            clausulas.append("primeira_hasta >= ?")
+            params.append(data_inicio.isoformat())
+        if data_fim:
+            clausulas.append("primeira_hasta <= ?")
+            params.append(f"{data_fim.isoformat()}T00:00:00")
+        if endereco:
+            termo = normalizar(endereco).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clausulas.append("descricoes LIKE ? ESCAPE '\\'")
+            params.append(f"%{termo}%")
+        # Os lotes marcados como ausentes da API ficam fora da listagem durante a carência;
+        # a subconsulta usa o índice parcial, sem ler o JSON de todas as linhas
+        clausulas.append(f"id NOT IN ({SQL_AUSENTES})")
+        return f" WHERE {' AND '.join(clausulas)}", params
+
+    def contar_lotes(self, filtros):
+        where, params = self._where(**filtros)
+        return self.conexao().execute(f"SELECT COUNT(*) FROM lotes{where}", params).fetchone()[0]
+
+    def buscar_pagina(self, filtros, selected_sort, page_size=None, current_page=1):
+        where, params = self._where(**filtros)
+        sql = f"SELECT doc FROM lotes{where} ORDER BY {SORT_SQL.get(selected_sort, DEFAULT_SORT_SQL)}"
+        if page_size:
+            sql += " LIMIT ? OFFSET ?"
+            params += [page_size, (current_page - 1) * page_size]
+        return [aplicar_projecao(json.loads(doc), PROJECAO_LISTAGEM) for (doc,) in self.conexao().execute(sql, params)]
+
+    def iter_filtrados(self, filtros, selected_sort, projecao=None):
+        """Percorre todos os lotes filtrados na ordem escolhida, lendo o cursor em blocos."""
+        where, params = self._where(**filtros)
+        cursor = self.conexao().execute(
+            f"SELECT doc FROM lotes{where} ORDER BY {SORT_SQL.get(selected_sort, DEFAULT_SORT_SQL)}", params
+        )
+        while True:
+            linhas = cursor.fetchmany(500)
+            if not linhas:
+                break
+            for (doc,) in linhas:
+                yield aplicar_projecao(json.loads(doc), projecao)
+
+    # -------------------- Trava de sincronização --------------------
+    def adquirir_trava(self, nome, dono, agora, expira_em):
+        with self.conexao() as conn:
+            conn.execute(
+                "INSERT INTO travas (nome, dono, expira_em) VALUES (?, ?, ?) "
+                "ON CONFLICT(nome) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em "
+                "WHERE travas.expira_em < ?",
+                (nome, dono, expira_em.isoformat(), agora.isoformat()),
+            )
+            atual = conn.execute("SELECT dono FROM travas WHERE nome = ?", (nome,)).fetchone()
+        return bool(atual) and atual[0] == dono
+
+    def liberar_trava(self, nome, dono):
+        with self.conexao() as conn:
+            conn.execute("DELETE FROM travas WHERE nome = ? AND dono = ?", (nome, dono))
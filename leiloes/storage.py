@@ -0,0 +1,21 @@
+"""Seleção do backend de armazenamento dos lotes (MongoDB ou SQLite)."""
+import threading
+
+from leiloes.config import SQLITE_PATH, STORAGE_BACKEND
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Devolve o backend configurado em STORAGE_BACKEND, compartilhado pelo processo."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "sqlite":
+                from leiloes.sqlite_storage import SQLiteStorage
+                _storage = SQLiteStorage(SQLITE_PATH)
+            else:
+                from leiloes.db import mongo_storage
+                _storage = mongo_storage
+        return _storage
@@ -0,0 +1,352 @@
+"""Sincronização dos lotes: busca na API, comparação, gravação e aviso."""
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+
+from leiloes.agregados import DeltaAgregados, recalcular_agregados
+from leiloes.bulk import print_batch
+from leiloes.busca import texto_do_lote
+from leiloes.cache import cache_dados
+from leiloes.config import BULK_BATCH_SIZE, SYNC_AMOSTRA_MAX, SYNC_LOCK_TTL_MIN
+from leiloes.diff import (
+    AUSENTE_FIELD,
+    BUSCA_FIELD,
+    FINGERPRINT_FIELD,
+    HASHES_FIELD,
+    IGNORE_FIELDS,
+    TIPO_BEM_FIELD,
+    add_fingerprints,
+    check_for_changes,
+)
+from leiloes.fetch import PaginaCacheada, get_fetcher
+from leiloes.historico import migrar_historico_pendente
+from leiloes.metricas import metricas
+from leiloes.particoes import BuscaParticionada, deduplicar, planejar, vencidas
+from leiloes.reconciliacao import reconciliar
+from leiloes.storage import get_storage
+
+
+class SyncEmAndamento(Exception):
+    """Outra sincronização está com a trava ativa."""
+
+
+class SyncLock:
+    """Trava no armazenamento que impede sincronizações simultâneas.
+
+    Vale entre processos e máquinas (página do Streamlit e cron) e expira
+    sozinha após SYNC_LOCK_TTL_MIN minutos caso o dono morra sem liberá-la.
+    """
+
+    def __init__(self, storage=None, nome="sync_lock", validade_min=SYNC_LOCK_TTL_MIN):
+        self.storage = storage or get_storage()
+        self.nome = nome
+        self.validade = timedelta(minutes=validade_min)
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+
+    def adquirir(self):
+        agora = datetime.now(timezone.utc)
+        return self.storage.adquirir_trava(self.nome, self.dono, agora, agora + self.validade)
+
+    def liberar(self):
+        self.storage.liberar_trava(self.nome, self.dono)
+
+    def __enter__(self):
+        if not self.adquirir():
+            raise SyncEmAndamento("Uma sincronização já está em andamento.")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.liberar()
+        return False
+
+
+class Novidades:
+    """Lotes novos e alterados de uma sincronização.
+
+    Os ids são todos guardados; os documentos (e os eventos dos alterados)
+    só até `max_amostra`, para o e-mail, de modo que uma carga grande não
+    mantenha a base inteira em memória.
+    """
+
+    def __init__(self, max_amostra=SYNC_AMOSTRA_MAX):
+        self.max_amostra = max_amostra
+        self.ids_novos = []
+        self.ids_alterados = []
+        self.novos = []
+        self.alterados = []
+        self.eventos = []
+
+    def registrar(self, novos, alterados, eventos):
+        self.ids_novos.extend(leilao["id"] for leilao in novos)
+        self.ids_alterados.extend(leilao["id"] for leilao in alterados)
+
+        vagas = max(self.max_amostra - len(self.novos), 0)
+        self.novos.extend(novos[:vagas])
+        vagas = max(self.max_amostra - len(self.alterados), 0)
+        if vagas:
+            amostra = alterados[:vagas]
+            ids = {leilao["id"] for leilao in amostra}
+            self.alterados.extend(amostra)
+            self.eventos.extend(evento for evento in eventos if evento["lote_id"] in ids)
+
+
+class ResultadoSync:
+    """Resumo de uma sincronização.
+
+    `new_data`, `changes` e `eventos` são a amostra guardada para o e-mail;
+    `total_novos` e `total_alterados` contam todos os lotes.
+    """
+
+    def __init__(self, novidades, escrita, data_atualizacao, erros_busca, execucao=None,
+                 particoes=None, reconciliacao=None):
+        self.new_data = novidades.novos
+        self.changes = novidades.alterados
+        self.eventos = novidades.eventos
+        self.total_novos = len(novidades.ids_novos)
+        self.total_alterados = len(novidades.ids_alterados)
+        self.escrita = escrita
+        self.data_atualizacao = data_atualizacao
+        self.erros_busca = erros_busca
+        self.execucao = execucao
+        self.particoes = particoes or {}
+        self.reconciliacao = reconciliacao
+
+    @property
+    def ok(self):
+        return not self.erros_busca and not self.escrita["falhas"]
+
+    def resumo(self):
+        linhas = [
+            f"Sincronização em {self.data_atualizacao}: "
+            f"{self.total_novos} novos leilões e {self.total_alterados} leilões atualizados.",
+            f"Gravações: {self.escrita['operacoes']} operações em {self.escrita['lotes']} lotes, "
+            f"{self.escrita['falhas']} falhas.",
+        ]
+        if self.particoes:
+            linhas.append("Partições: " + ", ".join(
+                f"{chave} {estado['registros']} registros" + (" (com erro)" if estado["erro"] else "")
+                for chave, estado in self.particoes.items()
+            ) + ".")
+        if self.reconciliacao and any(self.reconciliacao.values()):
+            linhas.append(
+                f"Reconciliação: {len(self.reconciliacao['ausentes'])} lotes ausentes da API, "
+                f"{len(self.reconciliacao['reaparecidos'])} reapareceram e "
+                f"{len(self.reconciliacao['arquivados'])} foram arquivados."
+            )
+            invalidos = self.reconciliacao["invalidos"]
+            if invalidos:
+                linhas.append(
+                    f"Reconciliação: {len(invalidos)} ids não inteiros ignorados ({', '.join(invalidos[:10])})."
+                )
+        linhas += [f"Erro ao buscar dados: {erro}" for erro in self.erros_busca]
+        if self.execucao is not None:
+            linhas.append(self.execucao.resumo())
+        return "\n".join(linhas)
+
+
+def processar_pagina(pagina, indice, storage, writer, novidades, agregados=None, tipo_bem=None):
+    """Compara uma página da API com o índice de hashes e envia as gravações ao writer.
+
+    `indice` (id -> hash salvo) é atualizado com os registros da página, de
+    modo que um id repetido em páginas seguintes não é processado de novo.
+    Cada lote alterado gera um evento no change-log do armazenamento e, se
+    `agregados` (DeltaAgregados) é informado, a diferença entra nos totais.
+    Os lotes novos e alterados são gravados com o `tipo_bem` da partição e o
+    texto da busca por endereço, e registrados em `novidades`.
+
+    Uma página igual à guardada no cache HTTP, cujos hashes já constam do
+    índice, é descartada sem ser decodificada nem comparada.
+    """
+    if isinstance(pagina, PaginaCacheada):
+        if all(indice.get(lote_id) == hash_conteudo for lote_id, hash_conteudo in pagina.registros):
+            metricas.contar("paginas_sem_diff")
+            return
+        pagina = pagina.dados()
+
+    with metricas.span("sync.diff"):
+        if tipo_bem:
+            for leilao in pagina:
+                leilao[TIPO_BEM_FIELD] = tipo_bem
+        # As páginas que passaram pelo cache HTTP já chegam com o hash
+        add_fingerprints([leilao for leilao in pagina if FINGERPRINT_FIELD not in leilao], IGNORE_FIELDS)
+
+        novos, candidatos = [], []
+        for leilao in pagina:
+            lote_id = leilao['id']
+            if lote_id not in indice:
+                novos.append(leilao)
+            elif indice[lote_id] != leilao[FINGERPRINT_FIELD]:
+                candidatos.append(leilao)
+            indice[lote_id] = leilao[FINGERPRINT_FIELD]
+
+        # Só os lotes com hash diferente são lidos por completo do armazenamento
+        hashes_desatualizados = []
+        alterados, unset_data, eventos_pagina = [], {}, []
+        existentes = {}
+        if candidatos:
+            existentes = storage.carregar_docs([leilao['id'] for leilao in candidatos])
+            alterados, unset_data = check_for_changes(
+                list(existentes.values()), candidatos, IGNORE_FIELDS, hashes_desatualizados, eventos_pagina
+            )
+
+        if agregados is not None:
+            for leilao in novos:
+                agregados.adicionar(leilao)
+            for leilao in alterados:
+                antigo = existentes[leilao['id']]
+                if antigo.get(AUSENTE_FIELD):
+                    # Um ausente já saiu dos totais: volta com a versão nova
+                    agregados.adicionar(leilao)
+                else:
+                    agregados.alterar(antigo, leilao)
+
+    metricas.contar("lotes_novos", len(novos))
+    metricas.contar("lotes_alterados", len(alterados))
+    metricas.contar("lotes_candidatos", len(candidatos))
+
+    with metricas.span("gravacao.alteracoes"):
+        storage.registrar_alteracoes(eventos_pagina)
+
+    # Grava o hash dos lotes sem alteração para que a próxima busca os pule
+    for lote_id, hash_conteudo, hashes in hashes_desatualizados:
+        writer.update({"id": lote_id}, {"$set": {FINGERPRINT_FIELD: hash_conteudo, HASHES_FIELD: hashes}})
+
+    for leilao in novos + alterados:
+        leilao[BUSCA_FIELD] = texto_do_lote(leilao)
+
+    # Atualiza apenas os leilões modificados
+    for leilao in alterados:
+        update_data = dict(leilao)
+
+        # Remove do unset_data qualquer campo que esteja no update_data
+        unset_data_filtered = {key: "" for key in unset_data if key not in update_data}
+
+        update_query = {"$set": update_data}
+        if unset_data_filtered:
+            update_query["$unset"] = unset_data_filtered
+
+        writer.update({"id": leilao["id"]}, update_query)
+
+    for leilao in novos:
+        writer.insert(leilao)
+
+    novidades.registrar(novos, alterados, eventos_pagina)
+
+
+def _aplicar_no_dataset(dataset, storage, ids, removidos, tamanho_bloco=BULK_BATCH_SIZE):
+    """Leva ao conjunto em cache os lotes gravados, relidos do armazenamento em blocos."""
+    dataset.aplicar(removidos=removidos)
+    for inicio in range(0, len(ids), tamanho_bloco):
+        dataset.aplicar(alterados=storage.carregar_docs(ids[inicio:inicio + tamanho_bloco]).values())
+
+
+def sincronizar(status="", on_error=None, storage=None, fetcher=None, particoes=None, forcar=False):
+    """Busca os leilões da API, grava novos e alterados e devolve um ResultadoSync.
+
+    A busca é dividida nas partições de `planejar` (ou nas informadas), e só
+    as vencidas são buscadas, a menos que `forcar` seja verdadeiro; `status`
+    restringe as partições a esse status.
+
+    As páginas são processadas à medida que chegam: cada registro é comparado
+    com um índice compacto (id -> hash de conteúdo) e as gravações saem em
+    lotes pelo writer. A memória fica limitada às páginas em andamento e a
+    um lote de gravação, e não ao tamanho da base: dos lotes novos e
+    alterados ficam os ids e uma amostra (SYNC_AMOSTRA_MAX) para o e-mail,
+    e o conjunto em cache relê do armazenamento, em blocos, os que mudaram.
+    """
+    storage = storage or get_storage()
+    fetcher = fetcher or get_fetcher()
+    erros_busca = []
+
+    # Uma base antiga ainda pode ter o histórico embutido nos lotes
+    migrar_historico_pendente(storage)
+
+    inicio = datetime.now(timezone.utc)
+    # Versão dos dados que o delta desta sincronização atualiza
+    versao_anterior = storage.load_dados_gerais().get("data_atualizacao")
+    planejadas = particoes or planejar(status=[status] if status else None)
+    particoes = planejadas if forcar else vencidas(planejadas, storage.carregar_particoes(), inicio)
+    busca = BuscaParticionada(fetcher, particoes)
+
+    def registrar_erro(e):
+        erros_busca.append(str(e.cause))
+        if on_error:
+            on_error(e)
+
+    with metricas.execucao("sync") as execucao:
+        with metricas.span("sync.indice"):
+            indice = storage.indice_hashes()
+        base_vazia = not indice
+        novidades = Novidades()
+        agregados = DeltaAgregados()
+        vistos = set()
+
+        with storage.writer(on_batch=print_batch) as writer:
+            for particao, pagina in busca.paginas(on_error=registrar_erro):
+                # Um lote que aparece em mais de uma partição só conta na primeira
+                pagina = deduplicar(pagina, vistos)
+                if pagina:
+                    processar_pagina(
+                        pagina, indice, storage, writer, novidades, agregados, particao.tipo_bem
+                    )
+        del indice
+
+        # Lotes que sumiram dos escopos buscados por completo: marca e, após a carência, arquiva
+        with metricas.span("sync.reconciliacao"):
+            reconciliacao = reconciliar(storage, busca, vistos, planejadas, inicio)
+        del vistos
+
+        # Os marcados saem dos totais e da listagem; os que voltaram sem alteração
+        # entram de novo (os alterados já entraram pelo processar_pagina). Os
+        # arquivados já tinham saído quando foram marcados
+        alterados = set(novidades.ids_alterados)
+        voltaram = [lote_id for lote_id in reconciliacao["reaparecidos"] if lote_id not in alterados]
+        del alterados
+        if voltaram:
+            for lote in storage.carregar_docs(voltaram).values():
+                agregados.adicionar(lote)
+        if reconciliacao["ausentes"]:
+            for lote in storage.carregar_docs(reconciliacao["ausentes"]).values():
+                agregados.remover(lote)
+        removidos = reconciliacao["ausentes"] + [lote["id"] for lote in reconciliacao["arquivados"]]
+
+        # A marca d'água só avança nas partições buscadas até o fim e gravadas sem
+        # falhas; as demais ficam com o erro e voltam a ser buscadas na próxima vez
+        falhas = writer.totals()["falhas"]
+        estados = {}
+        for chave, estado in busca.estados.items():
+            if falhas and not estado["erro"]:
+                estado["erro"] = f"{falhas} gravações falharam"
+            estados[chave] = estado if estado["erro"] else {**estado, "buscada_em": inicio.isoformat()}
+        storage.salvar_particoes(estados)
+
+        with metricas.span("sync.agregados"):
+            # Sem o documento (primeira vez) ou com gravações perdidas, os deltas
+            # não batem com a base: os totais são refeitos a partir dos lotes
+            if writer.totals()["falhas"] or storage.carregar_agregados() is None:
+                recalcular_agregados(storage)
+            else:
+                storage.aplicar_agregados(agregados.compactar())
+
+        data_atualizacao = storage.marcar_atualizacao()
+
+        # Atualiza o conjunto em cache (e seu índice de endereços) com o que mudou,
+        # em vez de recarregar todos os lotes na nova versão. Se o conjunto em cache
+        # não é o da versão anterior, ou numa carga inicial (mudou tudo), ele é
+        # descartado e montado de novo na próxima leitura
+        with metricas.span("sync.cache"):
+            if base_vazia:
+                cache_dados.invalidar("dataset")
+            else:
+                cache_dados.atualizar(
+                    "dataset",
+                    data_atualizacao,
+                    lambda dataset: _aplicar_no_dataset(
+                        dataset, storage, novidades.ids_novos + novidades.ids_alterados + voltaram, removidos
+                    ),
+                    versao_base=versao_anterior,
+                )
+
+    return ResultadoSync(
+        novidades, writer.totals(), data_atualizacao, erros_busca, execucao, busca.estados, reconciliacao
+    )
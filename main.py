@@ -1,367 +1,76 @@
 import streamlit as st
-import requests
-import pandas as pd
 import time
-import os
-import json
-import time
-from datetime import datetime
-from trycourier import Courier
-from dotenv import load_dotenv
-import pytz
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
-
-fuso_horario_brasil = pytz.timezone('America/Sao_Paulo')
-
-# Carregar variáveis de ambiente
-load_dotenv()
-
-# Obter variáveis de ambiente
-MONGO_URI = os.getenv('MONGO_URI')
-COURIER_API_TOKEN = os.getenv('COURIER_API_TOKEN')
-EMAIL_DESTINATARIOS = os.getenv('EMAIL_DESTINATARIOS').split(',')
-
-# Conectar ao cliente MongoDB
-client = MongoClient(MONGO_URI, server_api=ServerApi('1'))
-
-db = client["leiloes_judiciais"]
-dados_gerais_collection = db["dados_gerais"]
-lotes_collection = db["lotes"]
+from leiloes.agregados import carregar_agregados, contagem_por_mes, contagem_por_status
+from leiloes.assinaturas import nova_assinatura, salvar_assinatura
+from leiloes.cache import cache_dados
+from leiloes.config import MODO_CONSULTA
+from leiloes.consulta import PROJECAO_LISTAGEM
+from leiloes.diff import LAST_CHANGE_FIELD
+from leiloes.exportacao import PROJECAO_EXPORTACAO, TIPOS_MIME, conteudo_exportado, iter_lotes_por_ids
+from leiloes.historico import migrar_historico_pendente
+from leiloes.metricas import metricas
+from leiloes.notificacao import notificar
+from leiloes.render import cache_render, formatar_data, formatar_moeda, html_esqueleto
+from leiloes.storage import get_storage
+
+# numpy/pandas (dataset) e requests (busca/sincronização) são importados só
+# quando usados, para a primeira renderização não esperar por eles
 
 # -------------------- Configurações Iniciais --------------------
-API_URL = "https://leilojus-api.tjdft.jus.br/public/leiloes"
-DEFAULT_PARAMS = {
-    "tiposDeBemALeiloar": "IMOVEL",
-    "size": 1000,  # Página inicial com 10 itens por página
-    "sort": "primeiraHasta,asc",
-}
-JSON_FILE = "leiloes_data.json"
+storage = get_storage()
 
 # -------------------- Funções Auxiliares --------------------
 def fetch_leiloes(page=0, additional_params=None):
     """Busca dados da API com paginação e filtros."""
-    params = DEFAULT_PARAMS.copy()
-    if additional_params:
-        params.update(additional_params)
-    params["page"] = page
+    from leiloes.fetch import FetchError, get_fetcher
 
     try:
-        response = requests.get(API_URL, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Erro ao buscar dados: {e}")
+        return get_fetcher().fetch_page(page, additional_params)
+    except FetchError as e:
+        st.error(f"Erro ao buscar dados: {e.cause}")
         return None
 
-def save_to_json(data, filename):
-    """Salva dados em arquivo JSON, incluindo informações gerais."""
-    dados_gerais = {
-        "data_atualizacao": datetime.now(fuso_horario_brasil).strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    # Adiciona a seção de dados gerais e os lotes
-    final_data = {
-        "dados_gerais": dados_gerais,
-        "lotes": data
-    }
+def _montar_dataset():
+    from leiloes.dataset import LotesDataset
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=4)
-        
-        
+    with metricas.span("dados.carga"):
+        # Lidos do cursor em blocos: a lista completa de documentos nunca existe
+        return LotesDataset(storage.iter_lotes(PROJECAO_LISTAGEM))
 
-def load_from_json(filename):
-    """Carrega dados de arquivo JSON."""
-    if os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
-
-def save_to_mongo(data):
-    
-    dados_gerais = {
-        "data_atualizacao": datetime.now(fuso_horario_brasil).strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    dados_gerais_collection.update_one(
-        {"_id": "dados_gerais"}, 
-        {"$set": dados_gerais}, 
-        upsert=True
-    )
-    
-    # Salva os lotes na collection 'lotes'
-    for item in data:
-        lotes_collection.update_one(
-            {"id": item["id"]}, 
-            {"$set": item}, 
-            upsert=True
-        )
-        
-def load_from_mongo():
-    """Carrega dados das collections 'dados_gerais' e 'lotes' do MongoDB."""
-    
-    # Carrega os dados gerais da collection 'dados_gerais'
-    dados_gerais = dados_gerais_collection.find_one({"_id": "dados_gerais"})
-    
-    # Carrega os lotes da collection 'lotes'
-    lotes = list(lotes_collection.find())
-    
-    return {
-        "dados_gerais": dados_gerais if dados_gerais else {},
-        "lotes": lotes if lotes else []
-    }
+def carregar_dataset(versao):
+    """Carrega os lotes em formato colunar uma única vez por versão, compartilhados entre as sessões."""
+    return cache_dados.obter("dataset", versao, _montar_dataset)
 
+def carregar_totais(versao):
+    """Agregados por status e mês, lidos uma vez por versão dos dados."""
+    return cache_dados.obter("agregados", versao, lambda: carregar_agregados(storage))
 
-def format_date(date_str):
-    """Formata datas no padrão dd/mm/yyyy hh:mm."""
-    if date_str:
-        return pd.to_datetime(date_str).strftime('%d/%m/%Y %H:%M')
-    return ""
-
-def compare_dicts(dict1, dict2, ignore_fields=None):
-    if ignore_fields is None:
-        ignore_fields = []
-        
-    changes = {}
-
-    # Verificar as chaves de ambos os dicionários
-    for key in dict1:
-        # Ignorar campos especificados
-        if key in ignore_fields:
-            continue
-        
-        value1 = dict1[key]
-        value2 = dict2.get(key, None)  # Se a chave não existe em dict2, o valor é None
-
-        # Se ambos os valores são dicionários, chama recursivamente
-        if isinstance(value1, dict) and isinstance(value2, dict):
-            nested_changes = compare_dicts(value1, value2, ignore_fields)
-            if nested_changes:  # Se houver mudanças, adiciona ao dicionário de mudanças
-                changes[key] = nested_changes
-        # Se ambos os valores são listas, chama recursivamente
-        elif isinstance(value1, list) and isinstance(value2, list):
-            # Compara listas, elemento por elemento
-            if len(value1) != len(value2):
-                changes[key] = {"old": value1, "new": value2}
-            else:
-                for i in range(len(value1)):
-                    nested_changes = compare_dicts(value1[i], value2[i], ignore_fields)
-                    if nested_changes:
-                        changes[key] = nested_changes
-        # Caso contrário, compara os valores diretamente
-        elif value1 != value2:
-            changes[key] = {"old": value1, "new": value2}
-    
-    return changes
-
-def check_for_changes(existing, new, ignore_fields=None):
-    changes = []
-    unset_data = {}
-    
-    for existing_item in existing:
-        matching_item = next((item for item in new if item['id'] == existing_item['id']), None)
-        if matching_item:
-            item_changes = compare_dicts(existing_item, matching_item, ignore_fields)  # Verifica se houve mudança
-            if item_changes:  # Se houver mudanças, adiciona ao resultado
-                # Cria uma cópia do matching_item para evitar alteração no original
-                updated_item = matching_item.copy()
-
-                # Verifica se o existing_item já possui historico_alteracoes
-                if 'historico_alteracoes' in existing_item:
-                    updated_item['historico_alteracoes'] = existing_item['historico_alteracoes']
-                else:
-                    updated_item['historico_alteracoes'] = []
-
-                # Adiciona as mudanças no histórico
-                updated_item['historico_alteracoes'].append({
-                    'dataAlteracao': datetime.now(fuso_horario_brasil).isoformat(),
-                    'alteracoes': item_changes
-                })
-
-                # Identifica os campos removidos
-                
-                for key in existing_item:
-                    if key not in matching_item and key not in ignore_fields:
-                        unset_data[key] = ""  # Marca o campo para remoção
-
-                # Adiciona o item atualizado ao resultado
-                changes.append(updated_item)
-    
-    # Retorna tanto as alterações quanto os itens removidos
-    return changes, unset_data
 
 def buscarDados():
-    st.info("Buscando novos leilões, por favor aguarde...")
-    
-    # Reinicia os dados para buscar toda a base
-    new_data = []
-    all_leiloes = []
-    page = 0
-
-    while True:
-        leiloes_data = fetch_leiloes(page, additional_params={"status": selected_status})
-        if not leiloes_data:
-            break
-
-        all_leiloes.extend(leiloes_data)        
-        page += 1
-
-    # Filtra os novos leilões que não estão na lista existente
-    existing_data_ids = {leilao['id'] for leilao in lotes}
-    new_data = [leilao for leilao in all_leiloes if leilao['id'] not in existing_data_ids]
-
-    # Verifica mudanças nos imóveis existentes
-    ignore_fields = ["_id","data_atualizacao_api", "historico_alteracoes"] 
-    changes, unset_data  = check_for_changes(lotes, all_leiloes, ignore_fields)
-    
-    # Atualiza apenas os leilões modificados
-    for leilao in changes:
-        update_data = {}
-
-        for key, value in leilao.items():
-            update_data[key] = value  # Atualiza o campo normalmente
-
-        # Remove do unset_data qualquer campo que esteja no update_data
-        unset_data_filtered = {key: "" for key in unset_data if key not in update_data}
-
-        update_query = {}
-        if update_data:
-            update_query["$set"] = update_data
-        if unset_data_filtered:
-            update_query["$unset"] = unset_data_filtered  # Remove campos com None
-
-        if update_query:  # Garante que não será feita uma operação vazia
-            print(f"Atualizando {leilao['id']} com {update_query}")
-            lotes_collection.update_one(
-                {"id": leilao["id"]}, 
-                update_query
-            )
-
-    if new_data:
-        lotes_collection.insert_many(new_data)
-        
-    dados_gerais = {
-        "data_atualizacao": datetime.now(fuso_horario_brasil).strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    dados_gerais_collection.update_one(
-        {"_id": "dados_gerais"}, 
-        {"$set": dados_gerais}, 
-        upsert=True
-    )
-
-    return new_data, changes
-
+    from leiloes.sync import SyncEmAndamento, SyncLock, sincronizar
 
+    st.info("Buscando novos leilões, por favor aguarde...")
 
-def formatar_novos_imoveis_email(json_data):
-    formatted_string = ""
-    
-    for imovel in json_data:
-        leiloeiro = imovel.get("leiloeiro", {})
-        processo = imovel.get("processo", {})
-        bens = imovel.get("bensALeiloar", [])
-        
-        formatted_string += (
-            f"\nID do Leilão: {imovel.get('id')}\n"
-            f"Tipo de Leilão: {imovel.get('tipoDeLeilao')}\n"
-            f"Primeira Hasta: {imovel.get('primeiraHasta')}\n"
-            f"Segunda Hasta: {imovel.get('segundaHasta')}\n"
-            f"Status: {imovel.get('status')}\n"
-            f"Justificativa (se houver): {imovel.get('justificativaCancelamentoSuspensao', 'N/A')}\n"
-            f"Valor Total dos Bens: R$ {imovel.get('valorTotalBens', 0):,.2f}\n"
-            f"----- PROCESSO -----\n"
-            f"Número do Processo: {processo.get('numeroProcessoFormatado')}\n"
-            f"Polo Ativo: {processo.get('poloAtivo')}\n"
-            f"Polo Passivo: {processo.get('poloPassivo')}\n"
-            f"Órgão Julgador: {processo.get('orgaoJulgador', {}).get('nome', 'N/A')}\n"
-            f"--- LEILOEIRO ---\n"
-            f"Site: {leiloeiro.get('localRealizacao')}\n"
-        )
-        
-        formatted_string += "----- BENS A LEILOAR -----\n"
-        for bem in bens:
-            formatted_string += (
-                f"Descrição: {bem.get('descricao', 'N/A')}\n"
-                f"Valor: R$ {bem.get('valor', 0):,.2f}\n"
-                "-----------------------\n"
+    try:
+        with SyncLock(storage):
+            resultado = sincronizar(
+                selected_status,
+                on_error=lambda e: st.error(f"Erro ao buscar dados: {e.cause}"),
+                storage=storage,
+                forcar=True
             )
-        
-        formatted_string += "\n" + ("=" * 40) + "\n\n"
+    except SyncEmAndamento as e:
+        st.warning(str(e))
+        return None
 
-    return formatted_string
-
-def formatar_alteracoes_imoveis_email(changes):
-    formatted_string = ""
-    
-    for imovel in changes:
-        formatted_string += (f"\nID do Leilão: {imovel.get('id')}\n"
-                             f"Tipo de Leilão: {imovel.get('tipoDeLeilao')}\n"
-                             f"Primeira Hasta: {imovel.get('primeiraHasta')}\n"
-                             f"Segunda Hasta: {imovel.get('segundaHasta')}\n"
-                             f"Status: {imovel.get('status')}\n"
-                             f"Justificativa (se houver): {imovel.get('justificativaCancelamentoSuspensao', 'N/A')}\n"
-                             f"Valor Total dos Bens: R$ {imovel.get('valorTotalBens', 0):,.2f}\n"
-                             f"----- ALTERAÇÕES -----\n")
-        
-        historico = imovel.get('historico_alteracoes', [])
-        
-        for alteracao in historico:
-            data_alteracao = alteracao.get("dataAlteracao", "N/A")
-            formatted_string += f"Data da Alteração: {data_alteracao}\n"
-                
-            alteracoes = alteracao.get("alteracoes", {})
-            
-            def extrair_valores(campo, valores, prefixo=""):
-                nonlocal formatted_string
-                if isinstance(valores, dict) and "old" in valores and "new" in valores:
-                    valor_antigo = valores.get("old", "N/A")
-                    valor_novo = valores.get("new", "N/A")
-                    formatted_string += f"{prefixo}{campo}: {valor_antigo} -> {valor_novo}\n"
-                else:
-                    for subcampo, subvalores in valores.items():
-                        extrair_valores(subcampo, subvalores, f"{prefixo}{campo}.")
-
-            for campo, valores in alteracoes.items():
-                extrair_valores(campo, valores)
-
-            formatted_string += "-----------------------\n"
-        
-        formatted_string += "\n" + ("=" * 40) + "\n\n"
-    
-    return formatted_string
+    print(resultado.resumo())
+    totais = resultado.escrita
+    if totais["falhas"]:
+        st.warning(f"{totais['falhas']} de {totais['operacoes']} gravações falharam; as demais foram salvas.")
 
+    return resultado
 
 
-def send_email(subject, body):
-    try:
-        # Configurar Courier
-        client = Courier(auth_token=COURIER_API_TOKEN)
-        
-         # Cria a lista de destinatários
-        to_list = [{"email": email.strip()} for email in EMAIL_DESTINATARIOS if email.strip()]
-
-        if not to_list:
-            print("Nenhum destinatário válido encontrado.")
-            return
-        response = client.send_message(
-            message={
-                "to": to_list,
-                "content": {
-                    "title": subject,
-                    "body": body,
-                }
-            }
-        )
-        
-        print(response)
-
-    except Exception as e:
-        print(e)
-        # Imprimir o erro em caso de exceção
-        print(f"Erro ao enviar e-mail: {str(e)}")
-
 # -------------------- Layout da Aplicação --------------------
 
 st.set_page_config(
@@ -371,41 +80,71 @@ st.set_page_config(
 
 st.title("Leilojus - Busca de Leilões")
 
-# -------------------- Carregamento de Dados --------------------
-existing_data = load_from_mongo()
+# Cards provisórios enquanto a conexão com o banco e os dados são carregados
+esqueleto = st.empty()
+esqueleto.html(html_esqueleto())
 
-if not existing_data:
-    st.info("Carregando dados iniciais, por favor aguarde...")
+# -------------------- Carregamento de Dados --------------------
+storage.ensure_indexes()
 
-    all_leiloes = []
-    page = 0
+# Numa base antiga, o histórico embutido nos lotes vai para o change-log
+# antes da primeira listagem (só uma vez por processo)
+migrar_historico_pendente(storage)
 
-    while True:
-        leiloes_data = fetch_leiloes(page)
-        if not leiloes_data:
-            break
+if storage.total_lotes() == 0:
+    from leiloes.sync import SyncEmAndamento, SyncLock, sincronizar
 
-        all_leiloes.extend(leiloes_data)
-        page += 1
+    st.info("Carregando dados iniciais, por favor aguarde...")
 
-    if all_leiloes:
-        all_leiloes = {"lotes": all_leiloes}  # Estrutura de lotes
-        # save_to_json(all_leiloes, JSON_FILE)
-        save_to_mongo(all_leiloes['lotes'])
-        st.success(f"Dados iniciais carregados com {len(all_leiloes['lotes'])} registros.")
+    # A carga inicial é uma sincronização com a base vazia: as páginas são
+    # gravadas à medida que chegam, sem acumular todos os lotes em memória
+    try:
+        with SyncLock(storage):
+            resultado = sincronizar(
+                on_error=lambda e: st.error(f"Erro ao buscar dados: {e.cause}"),
+                storage=storage,
+                forcar=True
+            )
+    except SyncEmAndamento as e:
+        st.warning(str(e))
     else:
-        st.warning("Nenhum dado inicial encontrado.")
-
-# existing_data = load_from_json(JSON_FILE)
-
-
-dados_gerais = existing_data['dados_gerais']
-lotes = existing_data['lotes']
+        if resultado.total_novos:
+            st.success(f"Dados iniciais carregados com {resultado.total_novos} registros.")
+        else:
+            st.warning("Nenhum dado inicial encontrado.")
+
+dados_gerais = storage.load_dados_gerais()
+
+st.text(f"Última atualização: {formatar_data(dados_gerais.get('data_atualizacao'))}h")
+
+agregados = carregar_totais(dados_gerais.get("data_atualizacao"))
+
+# Contagens exibidas ao lado de cada status. No modo memória são facetas dos
+# demais filtros (lidos do estado da sessão, pois os campos vêm depois);
+# no modo banco são os totais materializados da base
+if MODO_CONSULTA == "memoria":
+    dataset = carregar_dataset(dados_gerais.get("data_atualizacao"))
+    with dataset.lock, metricas.span("consulta.facetas"):
+        facetas = dataset.facetas(
+            st.session_state.get("status_filtro"),
+            st.session_state.get("data_inicio"),
+            st.session_state.get("data_fim"),
+            st.session_state.get("endereco_filtro"),
+        )
+    contagens_status = facetas["status"]
+    contagens_mes = facetas["mes"]
+else:
+    contagens_status = contagem_por_status(agregados)
+    contagens_mes = contagem_por_mes(agregados)
 
-st.text(f"Última atualização: {format_date(dados_gerais['data_atualizacao'])}h")
+def rotulo_status(status):
+    if not status:
+        return f"Todos ({sum(contagens_status.values())})"
+    return f"{status} ({contagens_status.get(status, 0)})"
 
 # -------------------- Menu Lateral (Filtros e Paginação) --------------------
-st.sidebar.write(f"Dados existentes: {len(lotes)} registros")
+# Sem filtros: os lotes presentes, sem os marcados como ausentes da API (como na listagem)
+st.sidebar.write(f"Dados existentes: {storage.contar_lotes({})} registros")
 st.sidebar.header("Filtros de Busca")
 selected_sort = st.sidebar.selectbox(
     "Ordenar por", [
@@ -416,10 +155,37 @@ selected_sort = st.sidebar.selectbox(
         "Data de Atualização, Decrescente",
     ], index=3
 )
-selected_status = st.sidebar.selectbox("Status do Leilão", ["", "HASTA2_REPORTADA", "HASTA3_REPORTADA", "SUSPENSO", "CANCELADO", "ENCERRADO", "AGENDADO", "HASTA1_NAO_REALIZADA", "ANALISAR_SUSPENSAO_CANCELAMENTO"])
-data_inicio = st.sidebar.date_input("Data de início", format="DD/MM/YYYY", value=None)
-data_fim = st.sidebar.date_input("Data de fim", format="DD/MM/YYYY", value=None)
-endereco_filtro = st.sidebar.text_input("Buscar por Endereço")
+selected_status = st.sidebar.selectbox("Status do Leilão", ["", "HASTA2_REPORTADA", "HASTA3_REPORTADA", "SUSPENSO", "CANCELADO", "ENCERRADO", "AGENDADO", "HASTA1_NAO_REALIZADA", "ANALISAR_SUSPENSAO_CANCELAMENTO"], format_func=rotulo_status, key="status_filtro")
+data_inicio = st.sidebar.date_input("Data de início", format="DD/MM/YYYY", value=None, key="data_inicio")
+data_fim = st.sidebar.date_input("Data de fim", format="DD/MM/YYYY", value=None, key="data_fim")
+endereco_filtro = st.sidebar.text_input("Buscar por Endereço", key="endereco_filtro")
+
+with st.sidebar.expander("Resumo"):
+    st.table([
+        {"status": status, "lotes": dados["n"], "valor total (R$)": formatar_moeda(dados["valor"])}
+        for status, dados in sorted(agregados.get("por_status", {}).items(), key=lambda item: -item[1]["n"])
+        if dados["n"]
+    ])
+    if contagens_mes:
+        st.caption("Lotes por mês do 1º leilão")
+        st.bar_chart(contagens_mes)
+
+with st.sidebar.expander("Alertas por e-mail"):
+    st.caption("Receba por e-mail os leilões novos e alterados que atendem aos filtros acima.")
+    email_alerta = st.text_input("E-mail", key="email_alerta")
+    nome_alerta = st.text_input("Nome da busca", key="nome_alerta")
+    valor_min_alerta = st.number_input("Valor mínimo (R$)", min_value=0.0, value=None, step=10000.0)
+    valor_max_alerta = st.number_input("Valor máximo (R$)", min_value=0.0, value=None, step=10000.0)
+    if st.button("Salvar busca"):
+        try:
+            salvar_assinatura(nova_assinatura(
+                email_alerta, nome_alerta, selected_status, data_inicio, data_fim, endereco_filtro,
+                valor_min_alerta, valor_max_alerta,
+            ), storage)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success("Busca salva. Você receberá os próximos alertas por e-mail.")
 
 st.sidebar.header("Paginação")
 page_size = st.sidebar.selectbox("Tamanho da Página", [10, 20, 50, 100, "Todos"], index=1)
@@ -430,46 +196,37 @@ if 'current_page' not in st.session_state:
 current_page = st.session_state.current_page
 
 # -------------------- Aplicar Filtros --------------------
-filtered_data = lotes
-if endereco_filtro:
-    filtered_data = [
-        d for d in filtered_data
-        if any(
-            endereco_filtro.lower() in bem["descricao"].lower()
-            for bem in d.get("bensALeiloar", [])
-        )
-    ]
-if selected_status:
-    filtered_data = [d for d in filtered_data if d.get("status") == selected_status]
-if data_inicio:
-    filtered_data = [
-        d for d in filtered_data
-        if pd.to_datetime(data_inicio) <= pd.to_datetime(d.get("primeiraHasta"))
-    ]
-if data_fim:
-    filtered_data = [
-        d for d in filtered_data
-        if pd.to_datetime(d.get("primeiraHasta")) <= pd.to_datetime(data_fim)
-    ]
-
-if selected_sort == "Data 1º Leilão, Decrescente":
-    filtered_data.sort(key=lambda x: pd.to_datetime(x["primeiraHasta"]), reverse=True)
-elif selected_sort == "Data 1º Leilão, Crescente":
-    filtered_data.sort(key=lambda x: pd.to_datetime(x["primeiraHasta"]))
-elif selected_sort == "Data de Criação, Crescente":
-    filtered_data.sort(key=lambda x: pd.to_datetime(x["processo"]["dataCriacao"]))
-elif selected_sort == "Data de Criação, Decrescente":
-    filtered_data.sort(key=lambda x: pd.to_datetime(x["processo"]["dataCriacao"]), reverse=True)
-elif selected_sort == "Data de Atualização, Decrescente":
-    filtered_data.sort(key=lambda x: (
-        max((pd.to_datetime(h["dataAlteracao"]).tz_localize(None) for h in x.get("historico_alteracoes", [])), default=pd.Timestamp.min),
-        pd.to_datetime(x["processo"]["dataCriacao"]).tz_localize(None)
-    ), reverse=True)
-
+if MODO_CONSULTA == "memoria":
+    with dataset.lock:
+        with metricas.span("consulta.filtro"):
+            indices_filtrados = dataset.filtrar(selected_status, data_inicio, data_fim, endereco_filtro)
+        with metricas.span("consulta.ordenacao"):
+            indices_filtrados = dataset.ordenar(indices_filtrados, selected_sort)
+    total_items = len(indices_filtrados)
 else:
-    filtered_data.sort(key=lambda x: pd.to_datetime(x["primeiraHasta"]))
+    filtros = {
+        "status": selected_status,
+        "data_inicio": data_inicio,
+        "data_fim": data_fim,
+        "endereco": endereco_filtro,
+    }
+    with metricas.span("consulta.contagem"):
+        total_items = storage.contar_lotes(filtros)
+
+def carregar_pagina(page_size=None, current_page=1):
+    """Devolve os lotes da página atual a partir do modo de consulta configurado."""
+    if MODO_CONSULTA == "memoria":
+        if page_size:
+            start_idx = (current_page - 1) * page_size
+            indices_filtrados_pagina = indices_filtrados[start_idx:start_idx + page_size]
+        else:
+            indices_filtrados_pagina = indices_filtrados
+        with dataset.lock:
+            return dataset.linhas(indices_filtrados_pagina)
+    with metricas.span("consulta.pagina"):
+        return storage.buscar_pagina(filtros, selected_sort, page_size, current_page)
+
 # -------------------- Paginação --------------------
-total_items = len(filtered_data)
 if page_size != "Todos":
     page_size = int(page_size)
     total_pages = (total_items // page_size) + (1 if total_items % page_size > 0 else 0)
@@ -483,129 +240,95 @@ if page_size != "Todos":
         )
     else:
         current_page = 1
-    start_idx = (current_page - 1) * page_size
-    end_idx = start_idx + page_size
-    page_data = filtered_data[start_idx:end_idx]
+    page_data = carregar_pagina(page_size, current_page)
 else:
     total_pages = 1
-    page_data = filtered_data
+    page_data = carregar_pagina()
 
 st.text(f"Página {current_page} de {total_pages}")
 st.subheader(f"Leilões Encontrados: {total_items}")
 
+# -------------------- Exportação --------------------
+def lotes_para_exportar():
+    """Todos os lotes da seleção atual (não só a página), lidos em blocos do armazenamento."""
+    if MODO_CONSULTA == "memoria":
+        with dataset.lock:
+            ids = dataset.ids[indices_filtrados].tolist()
+        return iter_lotes_por_ids(storage, ids)
+    return storage.iter_filtrados(filtros, selected_sort, PROJECAO_EXPORTACAO)
+
+if total_items:
+    with st.expander("Exportar resultados"):
+        formato_exportacao = st.radio("Formato", ["csv", "parquet"], horizontal=True, format_func=str.upper)
+        por_bem = st.checkbox("Uma linha por bem", help="Sem marcar, cada lote ocupa uma linha com os bens resumidos.")
+        # O arquivo só é gerado quando o botão é clicado
+        st.download_button(
+            "Baixar",
+            lambda: conteudo_exportado(lotes_para_exportar(), formato_exportacao, por_bem),
+            f"leiloes.{formato_exportacao}",
+            TIPOS_MIME[formato_exportacao],
+        )
+
 # -------------------- Atualizar Dados --------------------
 if st.sidebar.button("Buscar Novos Leilões"):
-    new_data, changes = buscarDados()
-    if(new_data or changes):
-        st.success(f"{len(new_data)} novos leilões e {len(changes)} leilões atualizados encontrados!")
+    resultado = buscarDados()
+    if resultado and (resultado.total_novos or resultado.total_alterados):
+        st.success(f"{resultado.total_novos} novos leilões e {resultado.total_alterados} leilões atualizados encontrados!")
     else:
         st.info("Nenhum novo leilão ou atualização encontrados.")
     time.sleep(3)
     st.rerun()
 
 if st.query_params.get("buscar") == "true":
-    new_data, changes = buscarDados()
-    if(new_data or changes):
-        st.success(f"{len(new_data)} novos leilões e {len(changes)} leilões atualizados encontrados!")
+    resultado = buscarDados()
+    if resultado and (resultado.total_novos or resultado.total_alterados):
+        st.success(f"{resultado.total_novos} novos leilões e {resultado.total_alterados} leilões atualizados encontrados!")
     else:
         st.info("Nenhum novo leilão ou atualização encontrados.")
     
-    if(new_data or changes):
-        alert_subject = 'Leilões Judiciais DF - Novos Imóveis Adicionados!'
-        alert_body = f'Foram adicionados {len(new_data)} novos imóveis e {len(changes)} atualizados. Verifique a lista para mais detalhes:\n\n'
-        alert_body += '\n\n>>>>> Novos Imóveis <<<<<\n\n'
-        alert_body += formatar_novos_imoveis_email(new_data)
-        alert_body += '\n\n>>>>> Alterações <<<<<\n\n'
-        alert_body += formatar_alteracoes_imoveis_email(changes)
-        alert_body += '\n\nConfira em: https://leiloesjusdf.streamlit.app/\n\n'
-        send_email(alert_subject, alert_body)
+    if resultado:
+        notificar(
+            resultado.new_data, resultado.changes, resultado.eventos, resultado.total_novos, resultado.total_alterados
+        )
 
 # -------------------- Exibição de Resultados --------------------
-if page_data:
-    for leilao in page_data:
-        primeira_hasta = format_date(leilao.get('primeiraHasta', ''))
-        segunda_hasta = format_date(leilao.get('segundaHasta', ''))
-
-        c = st.container(border=True)
-        # Gerar o card HTML
-        card_html = f"""
-        <div>
-            <h3>Processo: {leilao['processo']['numeroProcessoFormatado']}</h3>
-            <span><strong>Data de Criação:</strong> {format_date(leilao['processo']['dataCriacao'])}</span>
-            <p><strong>Status:</strong> {leilao['status']}</p>
-            <p>
-                <span style="margin-right: 3rem;"><strong>1º Leilão:</strong> {primeira_hasta}</span>
-                <span><strong>2º Leilão:</strong> {segunda_hasta}</span>
-            </p>
-            <p><strong>Valor Total:</strong> R${'{:,.2f}'.format(leilao['valorTotalBens']).replace(',', 'x').replace('.', ',').replace('x', '.')}</p>
-            <p><strong>Leiloeiro:</strong> 
-                <a target="_blank" style="text-transform: lowercase; color: #837bf3" href="https://{leilao['leiloeiro']['localRealizacao']}">
-                    {leilao['leiloeiro']['localRealizacao']}
-                </a>
-            </p>
-        </div>
-        """
-        # Renderizar no Streamlit
-        c.html(card_html)
-        
-        lista_bens = f"""
-         <p><strong>Bens a Leiloar:</strong></p>
-            <ul style="list-style-type: disc; margin-left: 50px;">
-                {''.join(f"""
-                <li style="margin-bottom: 5px;">
-                    <strong>Descrição:</strong> {bem['descricao']}<br>
-                    <strong>Valor: R${'{:,.2f}'.format(bem['valor']).replace(',', 'x').replace('.', ',').replace('x', '.')}</strong>
-                </li>
-                </br>
-                """ for bem in leilao['bensALeiloar'])}
-            </ul>
-        """
-        
-        c.html(lista_bens)
-
-        # Exibir alterações
-        with c:
-            if 'historico_alteracoes' in leilao and leilao['historico_alteracoes']:
-                grouped_changes = {}
-
-                # Agrupar alterações por data
-                for alteracao in leilao['historico_alteracoes']:
-                    data_alteracao = alteracao.get('dataAlteracao', 'Data desconhecida')
-                    if data_alteracao not in grouped_changes:
-                        grouped_changes[data_alteracao] = []
-
-                    # Processar alterações, incluindo campos aninhados
-                    def process_changes(prefix, changes):
-                        for campo, valores in changes.items():
-                            # Se os valores forem um dicionário, verificar 'old' e 'new'
-                            if isinstance(valores, dict):
-                                if 'old' in valores and 'new' in valores:
-                                    old_value = valores['old']
-                                    new_value = valores['new']
-                                    if old_value != new_value:
-                                        campo_completo = f"{prefix}{campo}" if prefix else campo
-                                        grouped_changes[data_alteracao].append((campo_completo, old_value, new_value))
-                                else:
-                                    # Explorar níveis mais profundos de aninhamento
-                                    process_changes(f"{prefix}{campo}.", valores)
-                            else:
-                                # Caso inesperado, ignorar ou logar
-                                continue
-
-                    process_changes("", alteracao.get('alteracoes', {}))
-
-                sorted_dates = sorted(grouped_changes.keys(), reverse=True)
-
-                # Exibir as alterações agrupadas por data
-                with st.expander("Alterações"):
-                    if grouped_changes:
-                        for data in sorted_dates:
-                            st.write(f"**DATA DA ALTERAÇÃO:** {format_date(data)}")
-                            for campo, old_value, new_value in grouped_changes[data]:
-                                st.write(f"  **{campo}:**  {old_value} ➡️ {new_value}")
-                            st.divider()
-
-
+esqueleto.empty()
 
+if page_data:
+    with metricas.span("render.pagina"):
+        # Cards sem histórico saem juntos em uma única chamada; os alterados ganham
+        # um botão que só busca e renderiza o histórico quando é ligado
+        cards_pendentes = []
+        for leilao in page_data:
+            cards_pendentes.append(cache_render.card(leilao))
+            if not leilao.get(LAST_CHANGE_FIELD):
+                continue
+
+            st.html("".join(cards_pendentes))
+            cards_pendentes = []
+            if st.toggle("Alterações", key=f"alteracoes_{leilao['id']}"):
+                st.markdown(cache_render.historico(
+                    leilao,
+                    lambda: storage.carregar_historico([leilao['id']])[leilao['id']]
+                ))
+                st.divider()
+
+        if cards_pendentes:
+            st.html("".join(cards_pendentes))
 else:
     st.info("Nenhum leilão encontrado para os filtros selecionados.")
+
+# -------------------- Painel de Métricas (?admin=true) --------------------
+if st.query_params.get("admin") == "true":
+    with st.sidebar.expander("Métricas", expanded=True):
+        spans = metricas.exportar_dict()["spans"]
+        st.table([
+            {"fase": nome, "n": s["n"], "total (s)": s["total_s"], "média (s)": round(s["total_s"] / s["n"], 4),
+             "máx (s)": s["max_s"]}
+            for nome, s in sorted(spans.items(), key=lambda item: item[1]["total_s"], reverse=True)
+        ])
+        for execucao in metricas.ultimas_execucoes("sync")[:5]:
+            st.write(f"**Sincronização de {execucao['inicio']}** ({execucao['duracao_s']}s)")
+            st.json(execucao, expanded=False)
+        st.download_button("Prometheus", metricas.exportar_prometheus(), "leiloes.prom", "text/plain")
+        st.download_button("JSON-lines", metricas.exportar_jsonl(), "leiloes_metricas.jsonl", "application/x-ndjson")
@@ -0,0 +1,122 @@
+import random
+from datetime import date
+
+import pytest
+
+from leiloes.assinaturas import INFINITO, ArvoreIntervalos, IndiceAssinaturas, nova_assinatura
+from leiloes.busca import normalizar
+
+STATUS = ["AGENDADO", "ENCERRADO", "SUSPENSO"]
+BAIRROS = ["Águas Claras", "Guará", "Sobradinho", "Taguatinga", "Asa Sul"]
+
+
+def _aceita(assinatura, lote):
+    """Critérios da assinatura conferidos um a um, sem índice."""
+    if assinatura["status"] and lote.get("status") not in assinatura["status"]:
+        return False
+    hasta = (lote.get("primeiraHasta") or "")[:10] or None
+    if assinatura["data_inicio"] and (hasta is None or hasta < assinatura["data_inicio"]):
+        return False
+    if assinatura["data_fim"] and (hasta is None or hasta > assinatura["data_fim"]):
+        return False
+    valor = lote.get("valorTotalBens")
+    if assinatura["valor_min"] is not None and (valor is None or valor < assinatura["valor_min"]):
+        return False
+    if assinatura["valor_max"] is not None and (valor is None or valor > assinatura["valor_max"]):
+        return False
+    texto = " ".join(normalizar(bem["descricao"]) for bem in lote.get("bensALeiloar") or [])
+    return all(termo in texto for termo in assinatura["termos"])
+
+
+def _assinatura(rng, numero):
+    inicio = rng.choice([None, date(2024, rng.randint(1, 12), 1)])
+    fim = rng.choice([None, date(2025, rng.randint(1, 12), 1)])
+    minimo = rng.choice([None, float(rng.randint(0, 5) * 100000)])
+    maximo = rng.choice([None, None if minimo is None else minimo + rng.randint(1, 5) * 100000])
+    return nova_assinatura(
+        f"pessoa{numero % 7}@exemplo.com",
+        status=rng.sample(STATUS, rng.randint(0, 2)),
+        data_inicio=inicio,
+        data_fim=fim,
+        termos=rng.sample(BAIRROS, rng.randint(0, 1)) + rng.choice([[], ["ga"]]),
+        valor_min=minimo,
+        valor_max=maximo,
+    )
+
+
+def _lote(rng, lote_id):
+    hasta = rng.choice([None, f"{rng.randint(2023, 2026)}-{rng.randint(1, 12):02d}-15T10:00:00"])
+    return {
+        "id": lote_id,
+        "status": rng.choice(STATUS),
+        "primeiraHasta": hasta,
+        "valorTotalBens": rng.choice([None, float(rng.randint(0, 1000000))]),
+        "bensALeiloar": [{"descricao": f"Casa em {rng.choice(BAIRROS)}"}],
+    }
+
+
+def test_arvore_devolve_os_intervalos_que_contem_o_ponto():
+    rng = random.Random(7)
+    intervalos = []
+    for chave in range(300):
+        inicio = rng.choice([-INFINITO, rng.randint(0, 100)])
+        fim = rng.choice([INFINITO, (0 if inicio == -INFINITO else inicio) + rng.randint(0, 30)])
+        intervalos.append((inicio, fim, chave))
+    arvore = ArvoreIntervalos(intervalos)
+
+    for ponto in list(range(-5, 140)) + [0.5, 99.5]:
+        esperado = {chave for inicio, fim, chave in intervalos if inicio <= ponto <= fim}
+        encontrados = arvore.contendo(ponto)
+        assert len(encontrados) == len(set(encontrados))
+        assert set(encontrados) == esperado
+
+
+def test_arvore_vazia():
+    assert ArvoreIntervalos([]).contendo(10) == []
+
+
+@pytest.mark.parametrize("quantidade", [3, 400])
+def test_casamento_igual_ao_conferido_um_a_um(quantidade):
+    # Poucas assinaturas: limites conferidos por candidato; muitas: árvores de intervalos
+    rng = random.Random(quantidade)
+    assinaturas = [_assinatura(rng, numero) for numero in range(quantidade)]
+    indice = IndiceAssinaturas(assinaturas)
+
+    for lote_id in range(300):
+        lote = _lote(rng, lote_id)
+        esperado = {assinatura["id"] for assinatura in assinaturas if _aceita(assinatura, lote)}
+        assert indice.casar(lote) == esperado
+
+
+def test_assinatura_inativa_nao_casa():
+    ativa = nova_assinatura("a@exemplo.com", termos=["guara"])
+    inativa = {**nova_assinatura("b@exemplo.com", termos=["guara"]), "ativa": False}
+    lote = {"id": 1, "status": "AGENDADO", "bensALeiloar": [{"descricao": "Casa no Guará"}]}
+
+    assert IndiceAssinaturas([ativa, inativa]).casar(lote) == {ativa["id"]}
+
+
+def test_distribuir_agrupa_por_email():
+    guara = nova_assinatura("a@exemplo.com", termos=["guara"])
+    agendados = nova_assinatura("a@exemplo.com", status=["AGENDADO"])
+    caros = nova_assinatura("b@exemplo.com", valor_min=500000)
+    novo = {"id": 1, "status": "AGENDADO", "valorTotalBens": 100.0, "bensALeiloar": [{"descricao": "Guará II"}]}
+    alterado = {"id": 2, "status": "ENCERRADO", "valorTotalBens": 900000.0, "bensALeiloar": []}
+
+    por_email = IndiceAssinaturas([guara, agendados, caros]).distribuir([novo], [alterado])
+
+    # Um lote aceito por duas buscas do mesmo e-mail vai uma vez só
+    assert por_email == {"a@exemplo.com": ([novo], []), "b@exemplo.com": ([], [alterado])}
+
+
+def test_nova_assinatura_valida_os_criterios():
+    with pytest.raises(ValueError):
+        nova_assinatura("sem-arroba")
+    with pytest.raises(ValueError):
+        nova_assinatura("a@exemplo.com", data_inicio="2024-05-01", data_fim="2024-04-01")
+    with pytest.raises(ValueError):
+        nova_assinatura("a@exemplo.com", valor_min=10, valor_max=5)
+
+    assinatura = nova_assinatura("a@exemplo.com", status="AGENDADO", termos=["Águas Claras", "aguas claras", " "])
+    assert assinatura["status"] == ["AGENDADO"]
+    assert assinatura["termos"] == ["aguas claras"]
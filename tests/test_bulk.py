@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from leiloes.bulk import BulkWriter
+
+
+class ColecaoFake:
+    """Registra cada bulk_write; `falhas` diz, por chamada, o que deve dar errado."""
+
+    def __init__(self, falhas=None):
+        self.falhas = dict(falhas or {})
+        self.chamadas = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.chamadas.append((list(operations), ordered))
+        falha = self.falhas.get(len(self.chamadas))
+        if falha == "conexao":
+            raise AutoReconnect("conexão perdida")
+        if falha == "duplicado":
+            raise BulkWriteError({
+                "nInserted": len(operations) - 1,
+                "nUpserted": 0,
+                "nModified": 0,
+                "writeErrors": [{"index": 0, "errmsg": "E11000 duplicate key"}],
+            })
+        inseridos = sum(1 for operacao in operations if type(operacao).__name__ == "InsertOne")
+        return SimpleNamespace(
+            inserted_count=inseridos, upserted_count=0, modified_count=len(operations) - inseridos
+        )
+
+
+def test_operacoes_saem_em_lotes_nao_ordenados():
+    colecao = ColecaoFake()
+    lotes = []
+
+    with BulkWriter(colecao, batch_size=3, on_batch=lotes.append) as writer:
+        for lote_id in range(5):
+            writer.insert({"id": lote_id})
+        writer.update({"id": 0}, {"$set": {"status": "SUSPENSO"}})
+        writer.update({"id": 1}, {})  # Operação vazia não é enviada
+
+    assert [len(operacoes) for operacoes, _ in colecao.chamadas] == [3, 3]
+    assert all(not ordered for _, ordered in colecao.chamadas)
+    assert [lote.lote for lote in lotes] == [1, 2]
+    assert writer.totals() == {
+        "lotes": 2, "operacoes": 6, "inseridos": 5, "upserts": 0, "modificados": 1, "falhas": 0,
+    }
+
+
+def test_falhas_parciais_sao_contadas_e_nao_interrompem_os_demais_lotes():
+    colecao = ColecaoFake(falhas={1: "duplicado", 2: "conexao"})
+
+    with BulkWriter(colecao, batch_size=2) as writer:
+        for lote_id in range(6):
+            writer.insert({"id": lote_id})
+
+    assert len(colecao.chamadas) == 3
+    duplicado, conexao, ok = writer.batches
+    assert (duplicado.inseridos, duplicado.falhas, duplicado.erros) == (1, 1, ["E11000 duplicate key"])
+    assert (conexao.inseridos, conexao.falhas) == (0, 2)
+    assert (ok.inseridos, ok.falhas) == (2, 0)
+    assert writer.totals()["falhas"] == 3
+    assert writer.totals()["inseridos"] == 3
@@ -0,0 +1,19 @@
+from leiloes.cache import CacheVersionado
+
+
+def test_atualizar_aplica_sobre_a_versao_base():
+    cache = CacheVersionado()
+    cache.obter("dataset", "v1", lambda: [1])
+
+    assert cache.atualizar("dataset", "v2", lambda valor: valor.append(2), versao_base="v1")
+    assert cache.obter("dataset", "v2", lambda: ["recarregado"]) == [1, 2]
+
+
+def test_atualizar_descarta_versao_diferente_da_base():
+    cache = CacheVersionado()
+    cache.obter("dataset", "v1", lambda: [1])
+
+    # Outro processo gravou a v2; o delta desta sincronização parte da v2
+    assert not cache.atualizar("dataset", "v3", lambda valor: valor.append(3), versao_base="v2")
+    assert cache.obter("dataset", "v3", lambda: ["recarregado"]) == ["recarregado"]
+    assert cache.obter("dataset", "v1", lambda: ["v1 de novo"]) == ["v1 de novo"]
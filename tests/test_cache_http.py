@@ -0,0 +1,75 @@
+import os
+
+from leiloes.cache_http import FRACAO_APOS_LIMPEZA, CacheHTTP
+
+
+def _gravar(cache, pagina, corpo):
+    chave = cache.chave("https://api", {"page": pagina})
+    return cache.gravar(chave, "https://api", {"page": pagina}, corpo, {"ETag": f'"{pagina}"'}, [[pagina, "h"]])
+
+
+def _arquivos(diretorio):
+    return len(os.listdir(diretorio))
+
+
+def test_resposta_gravada_e_lida(tmp_path):
+    cache = CacheHTTP(str(tmp_path), ttl=60)
+    entrada = _gravar(cache, 0, b'[{"id": 0}]')
+
+    consultada = cache.consultar(entrada["chave"])
+
+    assert consultada["registros"] == [[0, "h"]]
+    assert cache.cabecalhos_condicionais(consultada) == {"If-None-Match": '"0"'}
+    assert cache.ler(consultada) == b'[{"id": 0}]'
+
+
+def test_paginas_iguais_compartilham_o_corpo(tmp_path):
+    cache = CacheHTTP(str(tmp_path))
+    _gravar(cache, 0, b"[]")
+    _gravar(cache, 1, b"[]")
+
+    assert _arquivos(tmp_path / "entradas") == 2
+    assert _arquivos(tmp_path / "objetos") == 1
+
+
+def test_acima_do_limite_descarta_as_menos_usadas(tmp_path):
+    corpo = b"x" * 1000
+    cache = CacheHTTP(str(tmp_path), max_bytes=6000)
+    entradas = [_gravar(cache, pagina, corpo + bytes([pagina])) for pagina in range(4)]
+    # A página 0 foi usada agora: passa a ser a mais recente
+    cache.ler(cache.consultar(entradas[0]["chave"]))
+
+    _gravar(cache, 4, corpo + b"4")
+
+    restantes = {pagina for pagina in range(5) if cache.consultar(cache.chave("https://api", {"page": pagina}))}
+    assert 0 in restantes and 4 in restantes
+    assert 1 not in restantes
+    assert _arquivos(tmp_path / "objetos") == len(restantes)
+    tamanho = sum(
+        os.path.getsize(os.path.join(raiz, nome)) for raiz, _, nomes in os.walk(tmp_path) for nome in nomes
+    )
+    assert tamanho <= 6000 * FRACAO_APOS_LIMPEZA
+
+
+def test_corpo_substituido_sai_na_proxima_limpeza(tmp_path):
+    cache = CacheHTTP(str(tmp_path), max_bytes=3000)
+    for versao in range(5):
+        _gravar(cache, 0, bytes([versao]) * 1000)
+
+    assert _arquivos(tmp_path / "entradas") == 1
+    assert _arquivos(tmp_path / "objetos") <= 2
+
+
+def test_entrada_corrompida_ou_sem_corpo_e_ausencia(tmp_path):
+    cache = CacheHTTP(str(tmp_path))
+    corrompida = _gravar(cache, 0, b"[1]")
+    sem_corpo = _gravar(cache, 1, b"[2]")
+
+    with open(os.path.join(tmp_path, "entradas", f"{corrompida['chave']}.json"), "w") as f:
+        f.write("{nao e json")
+    os.remove(os.path.join(tmp_path, "objetos", f"{sem_corpo['conteudo']}.json"))
+
+    assert cache.consultar(corrompida["chave"]) is None
+    assert cache.consultar(sem_corpo["chave"]) is None
+    assert cache.ler(sem_corpo) is None
+    assert cache.revalidar(sem_corpo) is None
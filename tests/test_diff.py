@@ -0,0 +1,73 @@
+from leiloes.diff import (
+    HASHES_FIELD,
+    IGNORE_FIELDS,
+    add_fingerprints,
+    check_for_changes,
+    compare_dicts,
+    linhas_alteracoes,
+)
+
+
+def test_lista_sem_chave_nao_sobrescreve_remocoes_com_inclusoes():
+    changes = compare_dicts({"l": ["A", "D", "E", "B"]}, {"l": ["A", "B", "I", "J"]})
+
+    assert changes == {
+        "l[-1]": {"old": "D", "new": None},
+        "l[-2]": {"old": "E", "new": None},
+        "l[+2]": {"old": None, "new": "I"},
+        "l[+3]": {"old": None, "new": "J"},
+    }
+
+
+def test_lista_sem_chave_substituicao_usa_posicao_nova():
+    changes = compare_dicts({"l": ["A", "B", "C"]}, {"l": ["A", "X", "C"]})
+
+    assert changes == {"l[1]": {"old": "B", "new": "X"}}
+
+
+def test_bens_pareados_por_id():
+    antigo = {"bens": [{"id": 1, "valor": 10}, {"id": 2, "valor": 20}]}
+    novo = {"bens": [{"id": 2, "valor": 25}, {"id": 1, "valor": 10}, {"id": 3, "valor": 30}]}
+
+    assert compare_dicts(antigo, novo) == {
+        "bens[id=2]": {"valor": {"old": 20, "new": 25}},
+        "bens[id=3]": {"old": None, "new": {"id": 3, "valor": 30}},
+    }
+
+
+def test_campos_com_hash_gravado_igual_sao_pulados():
+    antigo, novo = add_fingerprints([
+        {"id": 1, "processo": {"numero": "1"}, "bens": [1, 2]},
+        {"id": 1, "processo": {"numero": "1"}, "bens": [1, 3]},
+    ], IGNORE_FIELDS)
+    assert antigo[HASHES_FIELD]["processo"] == novo[HASHES_FIELD]["processo"]
+    assert antigo[HASHES_FIELD]["bens"] != novo[HASHES_FIELD]["bens"]
+
+    # Com o hash igual, o campo não é percorrido (a diferença forjada não aparece)
+    antigo["processo"] = {"numero": "outro"}
+    changes = compare_dicts(antigo, novo, IGNORE_FIELDS)
+
+    assert changes == {"bens[1]": {"old": 2, "new": 3}}
+
+
+def test_evento_do_change_log_guarda_caminhos_como_valores():
+    existente = {"id": 1, "processo": {"orgao": {"nome": "A"}}, "bens": [{"id": 7, "valor": 10}]}
+    novo = {"id": 1, "processo": {"orgao": {"nome": "B"}}, "bens": [{"id": 7, "valor": 12}]}
+    eventos = []
+
+    alterados, _ = check_for_changes([existente], [novo], IGNORE_FIELDS, eventos=eventos)
+
+    assert len(alterados) == 1
+    assert eventos[0]["lote_id"] == 1
+    assert sorted(eventos[0]["alteracoes"], key=lambda registro: registro["caminho"]) == [
+        {"caminho": "bens[id=7].valor", "old": 10, "new": 12},
+        {"caminho": "processo.orgao.nome", "old": "A", "new": "B"},
+    ]
+
+
+def test_linhas_aceitam_registros_e_dict_aninhado_antigo():
+    registros = [{"caminho": "status", "old": "AGENDADO", "new": "SUSPENSO"}]
+    antigo = {"status": {"old": "AGENDADO", "new": "SUSPENSO"}, "processo": {"fase": {"old": 1, "new": 2}}}
+
+    assert linhas_alteracoes(registros) == [("status", "AGENDADO", "SUSPENSO")]
+    assert linhas_alteracoes(antigo) == [("status", "AGENDADO", "SUSPENSO"), ("processo.fase", 1, 2)]
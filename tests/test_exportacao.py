@@ -0,0 +1,54 @@
+import csv
+import io
+
+import pyarrow.parquet as pq
+
+from leiloes.exportacao import colunas, conteudo_exportado, exportar
+
+LOTES = [
+    {
+        "id": 10,
+        "status": "ABERTO",
+        "valorTotalBens": 1500.5,
+        "processo": {"numeroProcessoFormatado": "0001", "orgaoJulgador": {"nome": "1ª Vara"}},
+        "bensALeiloar": [{"id": 1, "descricao": "Casa", "valor": 1000}, {"id": 2, "descricao": "Carro", "valor": 500.5}],
+    },
+    {"id": "A-7", "status": "SUSPENSO", "bensALeiloar": [{"id": "B-1", "descricao": "Sala"}]},
+    {"id": 11, "status": "ABERTO"},
+]
+
+
+def test_csv_uma_linha_por_lote():
+    destino = io.BytesIO()
+    exportar(iter(LOTES), "csv", destino, tamanho_bloco=2)
+
+    texto = destino.getvalue().decode("utf-8")
+    assert texto.startswith("\ufeff")
+    linhas = list(csv.DictReader(io.StringIO(texto.lstrip("\ufeff"))))
+
+    assert [linha["id"] for linha in linhas] == ["10", "A-7", "11"]
+    assert linhas[0]["processo.orgaoJulgador.nome"] == "1ª Vara"
+    assert linhas[0]["bensALeiloar.descricao"] == "Casa | Carro"
+    assert linhas[0]["bensALeiloar.quantidade"] == "2"
+    assert linhas[2]["bensALeiloar.quantidade"] == "0"
+
+
+def test_parquet_uma_linha_por_bem_com_ids_nao_inteiros():
+    destino = io.BytesIO()
+    exportar(iter(LOTES), "parquet", destino, por_bem=True, tamanho_bloco=2)
+
+    destino.seek(0)
+    tabela = pq.read_table(destino)
+
+    assert tabela.column_names == colunas(por_bem=True)
+    assert tabela.column("id").to_pylist() == ["10", "10", "A-7", "11"]
+    assert tabela.column("bensALeiloar.id").to_pylist() == ["1", "2", "B-1", None]
+    assert tabela.column("bensALeiloar.valor").to_pylist() == [1000.0, 500.5, None, None]
+    assert tabela.column("valorTotalBens").to_pylist() == [1500.5, 1500.5, None, None]
+
+
+def test_conteudo_exportado_devolve_bytes():
+    conteudo = conteudo_exportado(iter(LOTES), "parquet")
+
+    assert isinstance(conteudo, bytes)
+    assert pq.read_table(io.BytesIO(conteudo)).num_rows == len(LOTES)
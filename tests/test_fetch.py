@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+
+import requests
+
+from leiloes.fetch import PageFetcher
+
+
+class RespostaFake:
+    def __init__(self, status_code, dados=None):
+        self.status_code = status_code
+        self.content = json.dumps(dados).encode("utf-8")
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}", response=self)
+
+
+class SessaoFake:
+    """Serve `total` páginas de 2 lotes; as primeiras demoram mais para responder."""
+
+    def __init__(self, total, falhas=None):
+        self.total = total
+        self.falhas = dict(falhas or {})  # página -> status das respostas com falha, em ordem
+        self.chamadas = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        page = params["page"]
+        with self._lock:
+            self.chamadas.append(page)
+            falhas = self.falhas.get(page)
+            status = falhas.pop(0) if falhas else None
+        if status:
+            return RespostaFake(status)
+        time.sleep(max(self.total - page, 0) * 0.005)
+        if page >= self.total:
+            return RespostaFake(200, [])
+        return RespostaFake(200, [{"id": page * 2}, {"id": page * 2 + 1}])
+
+
+def criar_fetcher(sessao, **kwargs):
+    return PageFetcher(max_workers=4, backoff=0, rate_limit=0, session=sessao, **kwargs)
+
+
+def test_paginas_voltam_na_ordem_mesmo_com_respostas_fora_de_ordem():
+    sessao = SessaoFake(6)
+
+    lotes = criar_fetcher(sessao).fetch_all()
+
+    assert [lote["id"] for lote in lotes] == list(range(12))
+    # Para na primeira página vazia, sem buscar além da janela em andamento
+    assert 6 in sessao.chamadas
+    assert max(sessao.chamadas) < 6 + 4
+
+
+def test_falha_transitoria_e_repetida():
+    sessao = SessaoFake(3, falhas={1: [503, 429]})
+
+    lotes = criar_fetcher(sessao, max_retries=2).fetch_all()
+
+    assert [lote["id"] for lote in lotes] == list(range(6))
+    assert sessao.chamadas.count(1) == 3
+
+
+def test_falha_definitiva_encerra_a_busca_e_avisa():
+    sessao = SessaoFake(5, falhas={2: [404]})
+    erros = []
+
+    lotes = criar_fetcher(sessao, max_retries=3).fetch_all(on_error=erros.append)
+
+    assert [lote["id"] for lote in lotes] == [0, 1, 2, 3]
+    assert [erro.page for erro in erros] == [2]
+    # Erro do cliente não é repetido
+    assert sessao.chamadas.count(2) == 1
+
+
+def test_retentativas_esgotadas_viram_erro():
+    sessao = SessaoFake(2, falhas={0: [503, 503]})
+    erros = []
+
+    lotes = criar_fetcher(sessao, max_retries=1).fetch_all(on_error=erros.append)
+
+    assert lotes == []
+    assert [erro.page for erro in erros] == [0]
+    assert sessao.chamadas.count(0) == 2
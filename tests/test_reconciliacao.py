@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from leiloes.diff import AUSENTE_FIELD, TIPO_BEM_FIELD
+from leiloes.particoes import Particao
+from leiloes.reconciliacao import escopos_completos, ids_ordenados, reconciliar
+from leiloes.sqlite_storage import SQLiteStorage
+
+INICIO = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class BuscaFake:
+    """Resultado de uma BuscaParticionada: cada partição com seus registros e erro."""
+
+    def __init__(self, particoes, registros=10, erro=None):
+        self.particoes = particoes
+        self.estados = {p.chave: {"paginas": 1, "registros": registros, "erro": erro} for p in particoes}
+
+    def completas(self):
+        return [chave for chave, estado in self.estados.items() if not estado["erro"]]
+
+
+def _lote(lote_id, status="AGENDADO"):
+    return {"id": lote_id, "status": status, "primeiraHasta": "2024-07-01T10:00:00", TIPO_BEM_FIELD: "IMOVEL"}
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def storage(request, tmp_path):
+    if request.param == "mongo":
+        mongomock = pytest.importorskip("mongomock")
+        from leiloes.db import MongoStorage
+        storage = MongoStorage(mongomock.MongoClient()["leiloes_teste"])
+    else:
+        storage = SQLiteStorage(str(tmp_path / "leiloes.db"))
+    storage.ensure_indexes()
+    storage.save([_lote(1), _lote(2), _lote(3), _lote(4, "ENCERRADO")])
+    return storage
+
+
+def test_ausente_reaparece_e_depois_e_arquivado(storage):
+    agendados = Particao("IMOVEL", "AGENDADO")
+
+    def reconciliar_em(minutos, vistos, **busca):
+        return reconciliar(
+            storage, BuscaFake([agendados], **busca), vistos, [agendados],
+            INICIO + timedelta(minutes=minutos), carencia_min=60,
+        )
+
+    # Só o escopo buscado é comparado: o lote 4 (ENCERRADO) não é marcado
+    resultado = reconciliar_em(0, {1, 2})
+    assert (resultado["ausentes"], resultado["reaparecidos"], resultado["arquivados"]) == ([3], [], [])
+    assert storage.contar_lotes({}) == 3
+    assert storage.carregar_docs([3])[3][AUSENTE_FIELD] == INICIO.isoformat()
+
+    resultado = reconciliar_em(10, {1, 2, 3})
+    assert (resultado["ausentes"], resultado["reaparecidos"]) == ([], [3])
+    assert AUSENTE_FIELD not in storage.carregar_docs([3])[3]
+    assert storage.contar_lotes({}) == 4
+
+    marcado_em = INICIO + timedelta(minutes=20)
+    assert reconciliar_em(20, {1})["ausentes"] == [2, 3]
+
+    # Uma busca com erro não completa o escopo: nada é marcado, e a carência ainda não passou
+    resultado = reconciliar_em(30, set(), erro="timeout")
+    assert (resultado["ausentes"], resultado["arquivados"]) == ([], [])
+
+    # Já marcados não são marcados de novo: a carência conta da primeira marca
+    resultado = reconciliar_em(79, {1})
+    assert (resultado["ausentes"], resultado["arquivados"]) == ([], [])
+    assert storage.carregar_docs([2])[2][AUSENTE_FIELD] == marcado_em.isoformat()
+
+    resultado = reconciliar_em(80, {1})
+    assert sorted(lote["id"] for lote in resultado["arquivados"]) == [2, 3]
+    assert storage.carregar_docs([1, 2, 3, 4]).keys() == {1, 4}
+    assert storage.total_lotes() == 2
+
+
+def test_busca_sem_registros_nao_esvazia_o_escopo(storage):
+    agendados = Particao("IMOVEL", "AGENDADO")
+
+    resultado = reconciliar(storage, BuscaFake([agendados], registros=0), set(), [agendados], INICIO)
+
+    assert resultado["ausentes"] == []
+    assert storage.contar_lotes({}) == 4
+
+
+def test_ids_nao_inteiros_sao_ignorados(storage):
+    agendados = Particao("IMOVEL", "AGENDADO")
+
+    resultado = reconciliar(storage, BuscaFake([agendados]), {1, 2, 3, "abc", 2.5}, [agendados], INICIO)
+
+    assert resultado["ausentes"] == []
+    assert sorted(resultado["invalidos"]) == ["'abc'", "2.5"]
+
+
+def test_escopo_so_completo_com_todos_os_tipos_de_bem():
+    imovel, veiculo = Particao("IMOVEL", "AGENDADO"), Particao("VEICULO", "AGENDADO")
+    busca = BuscaFake([imovel, veiculo])
+    busca.estados[veiculo.chave]["erro"] = "timeout"
+
+    assert escopos_completos(busca, ["IMOVEL", "VEICULO"]) == []
+    assert escopos_completos(busca, ["IMOVEL"]) == [
+        {"status": "AGENDADO", "data_inicio": None, "data_fim": None, "tipos_bem": ["IMOVEL"]},
+    ]
+
+
+def test_ids_ordenados_sem_repetidos():
+    invalidos = []
+
+    assert ids_ordenados([5, 1, 5, 2**70, "x", 3], invalidos).tolist() == [1, 3, 5]
+    assert invalidos == [2**70, "x"]
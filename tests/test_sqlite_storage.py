@@ -0,0 +1,100 @@
+from datetime import date
+
+import pytest
+
+from leiloes.consulta import SORT_OPTIONS
+from leiloes.diff import AUSENTE_FIELD, LAST_CHANGE_FIELD
+from leiloes.sqlite_storage import SQLiteStorage
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def _lote(lote_id, status, primeira_hasta, criacao, descricao, **extras):
+    return {
+        "id": lote_id,
+        "status": status,
+        "primeiraHasta": primeira_hasta,
+        "processo": {"dataCriacao": criacao, "numeroProcessoFormatado": f"000{lote_id}"},
+        "bensALeiloar": [{"id": lote_id * 10, "descricao": descricao, "valor": 1000.0 * lote_id}],
+        **extras,
+    }
+
+
+LOTES = [
+    _lote(1, "AGENDADO", "2024-03-10T10:00:00", "2023-01-05T00:00:00", "Casa em Águas Claras"),
+    _lote(2, "ENCERRADO", "2024-01-20T10:00:00", "2023-02-01T00:00:00", "Apartamento no Guará",
+          **{LAST_CHANGE_FIELD: "2024-02-01T12:00:00"}),
+    _lote(3, "AGENDADO", "2024-03-10T10:00:00", "2022-11-30T00:00:00", "Sala comercial, aguas claras"),
+    _lote(4, "SUSPENSO", "2024-05-02T10:00:00", "2023-01-05T00:00:00", "Terreno em Sobradinho",
+          **{LAST_CHANGE_FIELD: "2024-04-01T08:00:00"}),
+    _lote(5, "AGENDADO", "2024-02-15T10:00:00", "2023-03-10T00:00:00", "Lote no Guara II"),
+    # Marcado como ausente pela reconciliação: fora da listagem nos dois armazenamentos
+    _lote(6, "AGENDADO", "2024-03-01T10:00:00", "2023-01-01T00:00:00", "Casa em Águas Claras",
+          **{AUSENTE_FIELD: "2024-06-01T00:00:00"}),
+]
+
+FILTROS = [
+    {},
+    {"status": "AGENDADO"},
+    {"data_inicio": date(2024, 2, 1), "data_fim": date(2024, 3, 31)},
+    {"endereco": "AGUAS claras"},
+    {"endereco": "guará"},
+    {"status": "AGENDADO", "endereco": "aguas"},
+    {"endereco": "inexistente"},
+]
+
+
+@pytest.fixture
+def armazenamentos(tmp_path):
+    from leiloes.db import MongoStorage
+
+    mongo = MongoStorage(mongomock.MongoClient()["leiloes_teste"])
+    sqlite = SQLiteStorage(str(tmp_path / "leiloes.db"))
+    for storage in (mongo, sqlite):
+        storage.ensure_indexes()
+        storage.save([dict(lote) for lote in LOTES])
+    return mongo, sqlite
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_contagem_igual_nos_dois_armazenamentos(armazenamentos, filtros):
+    mongo, sqlite = armazenamentos
+
+    assert sqlite.contar_lotes(filtros) == mongo.contar_lotes(filtros)
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+@pytest.mark.parametrize("ordenacao", list(SORT_OPTIONS))
+def test_filtrados_na_mesma_ordem_nos_dois_armazenamentos(armazenamentos, filtros, ordenacao):
+    mongo, sqlite = armazenamentos
+
+    ids_mongo = [lote["id"] for lote in mongo.iter_filtrados(filtros, ordenacao, {"_id": 0, "id": 1})]
+    ids_sqlite = [lote["id"] for lote in sqlite.iter_filtrados(filtros, ordenacao, {"_id": 0, "id": 1})]
+
+    assert ids_sqlite == ids_mongo
+    assert 6 not in ids_sqlite
+
+
+def test_change_log_igual_nos_dois_armazenamentos(armazenamentos):
+    eventos = [
+        {"lote_id": 2, "dataAlteracao": "2024-01-01T10:00:00",
+         "alteracoes": [{"caminho": "status", "old": "AGENDADO", "new": "SUSPENSO"}]},
+        {"lote_id": 2, "dataAlteracao": "2024-02-01T12:00:00",
+         "alteracoes": [{"caminho": "status", "old": "SUSPENSO", "new": "ENCERRADO"}]},
+        {"lote_id": 4, "dataAlteracao": "2024-04-01T08:00:00",
+         "alteracoes": [{"caminho": "bensALeiloar[id=40].valor", "old": 3000.0, "new": 4000.0}]},
+    ]
+
+    historicos = []
+    for storage in armazenamentos:
+        storage.registrar_alteracoes(eventos[:2])
+        storage.registrar_alteracoes(eventos[2:])
+        historicos.append(storage.carregar_historico([2, 4, 5]))
+
+    historico_mongo, historico_sqlite = historicos
+    assert historico_sqlite == historico_mongo
+    assert [evento["dataAlteracao"] for evento in historico_sqlite[2]] == [
+        "2024-02-01T12:00:00", "2024-01-01T10:00:00",
+    ]
+    assert historico_sqlite[4][0]["alteracoes"] == eventos[2]["alteracoes"]
+    assert not historico_sqlite.get(5)